@@ -1,33 +1,90 @@
-import ollama
 import os
+import threading
+import metrics
+from change_detection import phash
+from ollama_backend import OllamaBackend
+
+DEFAULT_PROMPT = "Analyze this image objectively and strictly describe only what is clearly visible. Do not make assumptions, guesses, or hallucinations. If details are not clear, do not invent them.\n\nPlease output the description in the following fixed format:\n\n**1. Environment**\n- (Describe the surroundings, lighting, and location type briefly.)\n\n**2. Objects**\n- (List the main visible inanimate objects.)\n\n**3. People**\n(For each person visible, provide the following details. If no person is visible, state \"No people visible\".)\n- **Traits**: (Gender, Apparent Age Range, Hair Color)\n- **Appearance**: (Clothing Color/Type, Accessories/Glasses/Hat)\n- **Action/State**: (What they are doing, Body posture, Facial expression)\n\nKeep the descriptions concise and factual."
 
 class ImageAnalyzer:
-    def __init__(self, model_id="llava-phi3:3.8b", device=None):
+    def __init__(self, model_id="llava-phi3:3.8b", device=None, cache=None, backend=None, preprocessor=None):
         self.model_id = model_id
+        # Optional DescriptionCache; hits on recurring scenes skip the VLM
+        self.cache = cache
+        # Optional Preprocessor that sizes and encodes frames for the model's input
+        self.preprocessor = preprocessor
+        # One persistent client for the life of the process
+        self.backend = backend or OllamaBackend(model_id)
+        # Per thread, so concurrent analyze() calls each see their own result
+        self._local = threading.local()
         # device is ignored for ollama client, but kept for compatibility
         print(f"Initialized Ollama analyzer with model: {self.model_id}")
+
+    @property
+    def last_result(self):
+        # ChatResult of this thread's last analyze() call (latency, time to first token, ...),
+        # None if it made no VLM request (cache hit, missing file)
+        return getattr(self._local, "result", None)
+
+    def warm_up(self):
+        return self.backend.warm_up()
         
-    def analyze(self, image_path, prompt="Analyze this image objectively and strictly describe only what is clearly visible. Do not make assumptions, guesses, or hallucinations. If details are not clear, do not invent them.\n\nPlease output the description in the following fixed format:\n\n**1. Environment**\n- (Describe the surroundings, lighting, and location type briefly.)\n\n**2. Objects**\n- (List the main visible inanimate objects.)\n\n**3. People**\n(For each person visible, provide the following details. If no person is visible, state \"No people visible\".)\n- **Traits**: (Gender, Apparent Age Range, Hair Color)\n- **Appearance**: (Clothing Color/Type, Accessories/Glasses/Hat)\n- **Action/State**: (What they are doing, Body posture, Facial expression)\n\nKeep the descriptions concise and factual."):
-        if not os.path.exists(image_path):
-            return f"Error: Image file not found at {image_path}"
-            
-        try:
-            print(f"Sending request to Ollama ({self.model_id})...")
-            response = ollama.chat(
-                model=self.model_id,
-                messages=[{
-                    'role': 'user',
-                    'content': prompt,
-                    'images': [image_path]
-                }],
-                options={
-                    'num_ctx': 1024  # Further reduce context to 1024 for speed/stability
-                }
-            )
-            return response['message']['content']
-            
-        except Exception as e:
-            return f"Error during analysis: {e}. Ensure 'ollama serve' is running and model is pulled."
+    def analyze(self, image, prompt=DEFAULT_PROMPT, system=None):
+        # Accept an in-memory Frame, raw encoded bytes or a file path.
+        # In-memory images are sent as-is so the client does not re-read the file.
+        # A list of Frames (crops of one frame) goes out in a single request.
+        # An optional system prompt goes first, ahead of the image and prompt.
+        self._local.result = None
+        image_hash = None
+        cache_key = prompt if system is None else system + "\n\n" + prompt
+        if isinstance(image, (list, tuple)):
+            # Crops are already regions of the frame: skip the preprocessor's fixed crop
+            image_data = [self.preprocessor.process(crop, apply_crop=False) if self.preprocessor else crop.jpeg()
+                          for crop in image]
+        elif hasattr(image, "jpeg"):
+            if self.cache is not None:
+                image_hash = phash(image.thumbnail())
+                description, distance = self.cache.lookup(image_hash, self.model_id, cache_key)
+                if description is not None:
+                    metrics.CACHE_HITS.inc()
+                    print(f"Description cache hit (distance {distance}). Skipping VLM.")
+                    return description
+                metrics.CACHE_MISSES.inc()
+            image_data = self.preprocessor.process(image) if self.preprocessor else image.jpeg()
+        elif isinstance(image, (bytes, bytearray)):
+            image_data = bytes(image)
+        else:
+            if not os.path.exists(image):
+                return f"Error: Image file not found at {image}"
+            image_data = image
+
+        print(f"Sending request to Ollama ({self.model_id})...")
+        images = image_data if isinstance(image_data, list) else [image_data]
+        result = self.backend.chat(prompt, images=images, system=system)
+        self._local.result = result
+        metrics.VLM_SECONDS.observe(result.latency)
+        if result.ttft is not None:
+            metrics.VLM_TTFT_SECONDS.observe(result.ttft)
+        if result.eval_count:
+            metrics.VLM_TOKENS.inc(result.eval_count)
+
+        if result.error is not None:
+            metrics.VLM_FAILURES.inc()
+            return f"Error during analysis: {result.error}. Ensure 'ollama serve' is running and model is pulled."
+        if result.timed_out:
+            if not result.content:
+                metrics.VLM_FAILURES.inc()
+                return f"Error during analysis: no response within {result.latency:.1f}s."
+            print(f"VLM deadline reached after {result.latency:.1f}s. Using partial output.")
+            return result.content
+
+        if self.preprocessor is not None:
+            self.preprocessor.record_latency(result.latency)
+        if result.ttft is not None:
+            print(f"VLM latency {result.latency:.2f}s (first token after {result.ttft:.2f}s)")
+        if image_hash is not None:
+            self.cache.store(image_hash, self.model_id, cache_key, result.content, result.latency)
+        return result.content
 
 if __name__ == "__main__":
     # Test
@@ -0,0 +1,639 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import resource
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+import cv2
+import numpy as np
+
+from analyzer import ImageAnalyzer
+from delta_prompt import IncrementalAnalyzer, DELTA_REQUEST
+from camera import CameraSession, capture_frame, resize_for_vlm
+from change_detection import create_detector, DETECTORS
+from fake_servers import FakeIngestServer, FakeOllamaServer
+from image_utils import Frame, FramePool, calculate_image_difference
+from main import cleanup_old_images
+from ollama_backend import OllamaBackend
+from pipeline import Pipeline, FrameJob
+from poster import Poster, post_content
+from preprocess import Preprocessor, profile_for_model
+from retention import RetentionManager
+
+FAKE_DESCRIPTION = (
+    "**1. Environment**\n- An indoor office with even artificial lighting.\n\n"
+    "**2. Objects**\n- Desk, chair, monitor, shelf.\n\n"
+    "**3. People**\nNo people visible"
+)
+
+FAKE_PERSON = (
+    "- **Traits**: Male, 30-40, black hair\n- **Appearance**: Blue shirt\n"
+    "- **Action/State**: Walking toward the desk"
+)
+FAKE_DELTA = "**3. People**\n" + FAKE_PERSON
+
+def fake_vlm_reply(body):
+    """
+    Fake VLM: a full description for full prompts, only the People section
+    for delta prompts, like a scene where one person moves.
+    """
+    user = body.get("messages", [{}])[-1].get("content", "")
+    if user.startswith(DELTA_REQUEST.split("{", 1)[0]):
+        return FAKE_DELTA
+    return FAKE_DESCRIPTION.replace("No people visible", FAKE_PERSON)
+
+def percentile(values, p):
+    """
+    Nearest-rank percentile of a list of numbers (p in 0-100).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+def current_rss():
+    """
+    Resident set size of this process in bytes (Linux), or None.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class StageTimer:
+    """
+    Collects per-stage durations from any thread.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def summary(self, elapsed):
+        report = {}
+        with self._lock:
+            for stage, values in self.samples.items():
+                report[stage] = {
+                    "count": len(values),
+                    "p50_ms": round(percentile(values, 50) * 1000, 3),
+                    "p90_ms": round(percentile(values, 90) * 1000, 3),
+                    "p99_ms": round(percentile(values, 99) * 1000, 3),
+                    "max_ms": round(max(values) * 1000, 3),
+                    "per_sec": round(len(values) / elapsed, 2) if elapsed else None,
+                }
+        return report
+
+def synthetic_frames(count, width=1280, height=720, seed=0):
+    """
+    Yields a reproducible scene: a static room with sensor noise, a person
+    walking through every 60 frames, and a lighting step half way through.
+    """
+    rng = np.random.default_rng(seed)
+    room = np.zeros((height, width, 3), dtype=np.uint8)
+    room[:] = (90, 100, 110)
+    cv2.rectangle(room, (width // 10, height // 2), (width // 3, height - 40), (60, 80, 120), -1)
+    cv2.rectangle(room, (width // 2, height // 6), (width - width // 8, height // 2), (30, 30, 30), -1)
+    cv2.line(room, (0, height - 40), (width, height - 40), (150, 150, 150), 3)
+    noise = np.empty(room.shape, dtype=np.int16)
+    for i in range(count):
+        frame = room.astype(np.int16)
+        if i >= count // 2:
+            frame += 25
+        phase = i % 60
+        if phase < 20:
+            x = int(phase / 20 * (width - 120))
+            cv2.rectangle(frame, (x, height // 3), (x + 120, height - 40), (40, 50, 160), -1)
+        noise[:] = rng.integers(-4, 5, room.shape)
+        frame += noise
+        yield np.clip(frame, 0, 255).astype(np.uint8)
+
+def recorded_frames(source, count=None):
+    """
+    Yields frames from a directory of images (in filename order) or a video file.
+    """
+    produced = 0
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+        for name in names:
+            image = cv2.imread(os.path.join(source, name))
+            if image is None:
+                continue
+            yield image
+            produced += 1
+            if count and produced >= count:
+                return
+        return
+    cap = cv2.VideoCapture(source)
+    while cap.isOpened():
+        ret, image = cap.read()
+        if not ret:
+            break
+        yield image
+        produced += 1
+        if count and produced >= count:
+            break
+    cap.release()
+
+class ReplayCapture:
+    """
+    Stands in for cv2.VideoCapture, delivering frames from an iterator at `fps`.
+    """
+
+    def __init__(self, frames, fps):
+        self.frames = iter(frames)
+        self.period = 1.0 / fps if fps else 0.0
+        self.exhausted = False
+        self.delivered = 0
+        self._next = time.monotonic()
+
+    def read(self):
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next + self.period, time.monotonic())
+        frame = next(self.frames, None)
+        if frame is None:
+            self.exhausted = True
+            time.sleep(0.01)
+            return False, None
+        self.delivered += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+class LoopCapture(ReplayCapture):
+    """
+    Replays a fixed list of frames in an endless loop. Like
+    cv2.VideoCapture.read, each read writes into the given image when its
+    shape matches and allocates a new array otherwise.
+    """
+
+    def __init__(self, frames, fps):
+        frames = list(frames)
+        super().__init__(itertools.cycle(frames), fps)
+        self.allocated = 0
+
+    def read(self, image=None):
+        ret, frame = super().read()
+        if not ret:
+            return ret, frame
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        self.allocated += 1
+        return True, frame.copy()
+
+class ReplaySession(CameraSession):
+    """
+    A CameraSession fed from a frame iterator (or a given capture) instead of a device.
+    """
+
+    def __init__(self, frames, fps, capture=None, **kwargs):
+        super().__init__(warmup_frames=0, max_failures=1_000_000, **kwargs)
+        self._capture = capture or ReplayCapture(frames, fps)
+
+    def _open(self):
+        return self._capture, "replay"
+
+class TimedPoster(Poster):
+    """
+    Poster that records the latency of every HTTP request it makes.
+    """
+
+    def __init__(self, timer, **kwargs):
+        super().__init__(**kwargs)
+        self.timer = timer
+
+    def _send(self, batch):
+        start = time.perf_counter()
+        try:
+            return super()._send(batch)
+        finally:
+            self.timer.record("post", time.perf_counter() - start)
+
+def populate_captures(directory, hours, interval, now=None, size=64):
+    """
+    Fills a directory with `hours` worth of capture_{timestamp}.jpg files, one
+    every `interval` seconds, to benchmark retention at full scale.
+    """
+    now = int(now or time.time())
+    payload = b"\xff\xd8" + b"\x00" * (size - 4) + b"\xff\xd9"
+    count = 0
+    for timestamp in range(now - int(hours * 3600), now, interval):
+        with open(os.path.join(directory, f"capture_{timestamp}.jpg"), "wb") as f:
+            f.write(payload)
+        count += 1
+    return count
+
+def run_pipeline_benchmark(frames, fps=20.0, detector="mean", diff_threshold=10.0, model="llava-phi3:3.8b",
+                           vlm_first_token=0.3, vlm_token_delay=0.005, vlm_failure_rate=0.0,
+                           post_latency=0.02, post_failure_rate=0.0, queue_size=1, shed_policy="drop-oldest",
+                           workdir=None, trace_memory=False):
+    """
+    Feeds frames through the real capture -> diff -> analyze -> post pipeline,
+    with Ollama and the ingest API replaced by local stand-in servers.
+    Returns a report dict with per-stage latency percentiles, throughput and memory.
+    """
+    timer = StageTimer()
+    workdir = workdir or tempfile.mkdtemp(prefix="bench_")
+    output_dir = os.path.join(workdir, "captures")
+    os.makedirs(output_dir, exist_ok=True)
+
+    ollama_server = FakeOllamaServer(reply=FAKE_DESCRIPTION, first_token_delay=vlm_first_token,
+                                     token_delay=vlm_token_delay, failure_rate=vlm_failure_rate).start()
+    ingest_server = FakeIngestServer(latency=post_latency, failure_rate=post_failure_rate).start()
+
+    if trace_memory:
+        tracemalloc.start()
+    rss_samples = []
+
+    backend = OllamaBackend(model, host=ollama_server.url, deadline=30)
+    analyzer = ImageAnalyzer(model_id=model, backend=backend, preprocessor=Preprocessor(profile_for_model(model)))
+    poster = TimedPoster(timer, api_uri=ingest_server.url, spool_path=os.path.join(workdir, "spool.jsonl"),
+                         log_path=os.path.join(workdir, "posts_log.jsonl"), batch_wait=0,
+                         retry_delay=0.05, max_retry_delay=0.5).start()
+    retention = RetentionManager(output_dir, retention_seconds=3600)
+    retention.scan()
+    change_detector = create_detector(detector)
+
+    pipeline = Pipeline()
+    diff_queue = pipeline.queue(maxsize=2, policy="drop-oldest", name="diff")
+    analyze_queue = pipeline.queue(maxsize=queue_size, policy=shed_policy, deadline=30, name="analyze")
+    post_queue = pipeline.queue(maxsize=100, policy="block", name="post")
+
+    def diff_stage(job):
+        timer.wrap("cleanup", retention.expire)()
+        job.score = timer.wrap("diff", change_detector.update)(job.frame)
+        return job if job.score >= diff_threshold else None
+
+    def analyze_stage(job):
+        job.description = timer.wrap("analyze", analyzer.analyze)(job.frame)
+        return job
+
+    def post_stage(job):
+        poster.submit(job.description, job.frame.path)
+
+    pipeline.add_stage("diff", diff_stage, diff_queue, analyze_queue)
+    analyze = pipeline.add_stage("analyze", analyze_stage, analyze_queue, post_queue)
+    post = pipeline.add_stage("post", post_stage, post_queue)
+    pipeline.start()
+
+    session = ReplaySession(frames, fps).start()
+    start = time.perf_counter()
+    period = 1.0 / fps if fps else 0.0
+    last_timestamp = None
+    captured = 0
+    try:
+        while not session._capture.exhausted:
+            cycle_start = time.perf_counter()
+            frame = timer.wrap("capture", capture_frame)(session=session)
+            if frame is None or frame.timestamp == last_timestamp:
+                time.sleep(period / 4)
+                continue
+            last_timestamp = frame.timestamp
+            captured += 1
+            path = os.path.join(output_dir, f"capture_{captured:08d}.jpg")
+            timer.wrap("save", frame.save)(path)
+            retention.add(path, timestamp=int(time.time()), size=len(frame.jpeg()))
+            diff_queue.put(FrameJob(frame))
+            if captured % 10 == 0:
+                rss_samples.append(current_rss())
+            delay = period - (time.perf_counter() - cycle_start)
+            if delay > 0:
+                time.sleep(delay)
+
+        # Let the pipeline drain before stopping the clock
+        drain_deadline = time.monotonic() + 30
+        while time.monotonic() < drain_deadline:
+            busy = any(len(q) for q in pipeline.queues) or analyze.processed > post.processed
+            if not busy:
+                break
+            time.sleep(0.05)
+        # An analysis may still be in flight for the last job taken off the queue
+        time.sleep(0.1)
+        while analyze.processed > post.processed and time.monotonic() < drain_deadline:
+            time.sleep(0.05)
+        poster.flush(timeout=10)
+        elapsed = time.perf_counter() - start
+    finally:
+        session.stop()
+        pipeline.stop()
+        poster.stop(timeout=1)
+        backend.close()
+        ollama_server.stop()
+        ingest_server.stop()
+
+    rss = [r for r in rss_samples if r]
+    steady = rss[len(rss) // 2:] or rss
+    memory = {
+        "rss_start_mb": round(rss[0] / 2**20, 1) if rss else None,
+        "rss_steady_mb": round(percentile(steady, 50) / 2**20, 1) if steady else None,
+        "rss_max_mb": round(max(rss) / 2**20, 1) if rss else None,
+        "rss_growth_mb": round((steady[-1] - steady[0]) / 2**20, 1) if len(steady) > 1 else None,
+    }
+    if trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory["python_current_mb"] = round(current / 2**20, 2)
+        memory["python_peak_mb"] = round(peak / 2**20, 2)
+
+    return {
+        "frames": session._capture.delivered,
+        "captured": captured,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_fps": round(captured / elapsed, 2) if elapsed else None,
+        "analyzed": ollama_server.completed,
+        "posted": len(ingest_server.received),
+        "stages": timer.summary(elapsed),
+        "pipeline": pipeline.stats(),
+        "memory": memory,
+    }
+
+def run_legacy_benchmark(retention_hours=48, interval=3, repeats=5, workdir=None):
+    """
+    Times the original per-cycle functions at full scale, next to their replacements:
+    calculate_image_difference vs in-memory detection, cleanup_old_images over a
+    retention-sized directory vs RetentionManager, and post_content.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="bench_legacy_")
+    timer = StageTimer()
+    frames = list(synthetic_frames(2, 1024, 576))
+
+    # Change detection: file based vs in memory
+    path1 = Frame(frames[0]).save(os.path.join(workdir, "a.jpg"))
+    path2 = Frame(frames[1]).save(os.path.join(workdir, "b.jpg"))
+    detector = create_detector("mean")
+    detector.update(frames[0])
+    for _ in range(repeats * 10):
+        timer.wrap("calculate_image_difference", calculate_image_difference)(path1, path2)
+        timer.wrap("detector_update", detector.update)(frames[1])
+
+    # Retention at full scale
+    captures = os.path.join(workdir, "captures")
+    os.makedirs(captures, exist_ok=True)
+    start = time.perf_counter()
+    files = populate_captures(captures, retention_hours, interval)
+    populate_seconds = time.perf_counter() - start
+    retention_seconds = retention_hours * 3600
+    manager = RetentionManager(captures, retention_seconds)
+    timer.wrap("retention_scan", manager.scan)()
+    for _ in range(repeats):
+        timer.wrap("cleanup_old_images", cleanup_old_images)(captures, retention_seconds)
+        timer.wrap("retention_expire", manager.expire)()
+
+    # post_content against a local stand-in API
+    with FakeIngestServer() as server:
+        previous_uri = os.environ.get("API_URI")
+        previous_cwd = os.getcwd()
+        os.environ["API_URI"] = server.url
+        os.chdir(workdir)
+        try:
+            for _ in range(repeats * 4):
+                timer.wrap("post_content", post_content)("benchmark event")
+        finally:
+            os.chdir(previous_cwd)
+            if previous_uri is None:
+                os.environ.pop("API_URI", None)
+            else:
+                os.environ["API_URI"] = previous_uri
+
+    return {"capture_files": files, "populate_s": round(populate_seconds, 2), "stages": timer.summary(None)}
+
+def run_prompt_benchmark(frames, model="llava-phi3:3.8b", host=None, refresh=10,
+                         vlm_first_token=0.3, vlm_token_delay=0.005):
+    """
+    Describes the same frames in full mode and in delta mode and compares
+    tokens generated and VLM latency. Without host, a stand-in server replies
+    with a full description or only the People section; with host, a real
+    Ollama server is measured.
+    """
+    frames = list(frames)
+    timer = StageTimer()
+    server = None
+    if host is None:
+        server = FakeOllamaServer(reply=fake_vlm_reply, first_token_delay=vlm_first_token,
+                                  token_delay=vlm_token_delay).start()
+        host = server.url
+    modes = {}
+    try:
+        for mode in ("full", "delta"):
+            backend = OllamaBackend(model, host=host, deadline=120)
+            analyzer = ImageAnalyzer(model_id=model, backend=backend,
+                                     preprocessor=Preprocessor(profile_for_model(model)))
+            describer = IncrementalAnalyzer(analyzer, refresh=refresh) if mode == "delta" else None
+            tokens = []
+            start = time.perf_counter()
+            for image in frames:
+                frame = Frame(image)
+                if describer is not None:
+                    # A delta reply that cannot be merged costs a second, full request
+                    before = describer.totals()
+                    describer.analyze(frame)
+                    after = describer.totals()
+                    timer.record(f"vlm_{mode}", after["seconds"] - before["seconds"])
+                    tokens.append(after["tokens"] - before["tokens"])
+                else:
+                    analyzer.analyze(frame)
+                    result = analyzer.last_result
+                    timer.record(f"vlm_{mode}", result.latency)
+                    tokens.append(result.eval_count or 0)
+            elapsed = time.perf_counter() - start
+            backend.close()
+            modes[mode] = {
+                "calls": len(tokens),
+                "avg_tokens": round(sum(tokens) / len(tokens), 1) if tokens else None,
+                "total_s": round(elapsed, 2),
+            }
+            if describer is not None:
+                modes[mode]["fallbacks"] = describer.fallbacks
+    finally:
+        if server is not None:
+            server.stop()
+
+    full, delta = modes["full"], modes["delta"]
+    saved = None
+    if full["avg_tokens"]:
+        saved = round(100.0 * (1 - delta["avg_tokens"] / full["avg_tokens"]), 1)
+    return {"full": full, "delta": delta, "tokens_saved_pct": saved, "stages": timer.summary(None)}
+
+def run_memory_benchmark(frames, count=2000, fps=0.0, max_dim=640, detector="mean", in_flight=3, samples=20):
+    """
+    Runs the capture, downscale and diff hot path over count frames, once
+    allocating every array and once with a FramePool, and samples RSS and
+    minor page faults along the way. The last in_flight frames are held, as
+    the queues between pipeline stages would. With the pool, the number of
+    arrays allocated stays at a handful however long the run; RSS and page
+    faults show whether the allocator returned freed frames to the system.
+    """
+    frames = list(frames)
+    timer = StageTimer()
+    runs = {}
+    for mode in ("unpooled", "pooled"):
+        pool = FramePool() if mode == "pooled" else None
+        capture = LoopCapture(frames, fps)
+        session = ReplaySession(None, fps, capture=capture, pool=pool).start()
+        change = create_detector(detector)
+        held = deque(maxlen=in_flight)
+        rss = []
+        every = max(1, count // samples)
+        processed = seq = 0
+        faults_start = None
+        try:
+            while processed < count:
+                image, timestamp, seq = session.read_next(seq, timeout=1.0)
+                if image is None:
+                    continue
+                start = time.perf_counter()
+                frame = Frame(resize_for_vlm(image, max_dim, pool=pool), timestamp=timestamp)
+                change.update(frame)
+                held.append(frame)
+                timer.record(f"frame_{mode}", time.perf_counter() - start)
+                processed += 1
+                if processed % every == 0:
+                    rss.append(current_rss() or 0)
+                    if faults_start is None:
+                        # Measure from the first sample, once buffers and caches exist
+                        faults_start = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+                        frames_start = processed
+        finally:
+            session.stop()
+        faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - (faults_start or 0)
+        steady = max(1, processed - frames_start) if faults_start is not None else None
+        runs[mode] = {
+            "frames": processed,
+            # Reads that did not reuse a buffer, plus downscales
+            "arrays_allocated": capture.allocated + (pool.allocated if pool is not None else processed),
+            "rss_start_mb": round(rss[0] / 1e6, 1) if rss else None,
+            "rss_end_mb": round(rss[-1] / 1e6, 1) if rss else None,
+            "rss_max_mb": round(max(rss) / 1e6, 1) if rss else None,
+            "rss_growth_mb": round((rss[-1] - rss[0]) / 1e6, 1) if rss else None,
+            "minor_faults_per_frame": round(faults / steady, 1) if steady else None,
+        }
+        if pool is not None:
+            runs[mode]["pool"] = pool.stats()
+    return {**runs, "stages": timer.summary(None)}
+
+def print_report(title, report):
+    print(f"\n=== {title} ===")
+    for key, value in report.items():
+        if key not in ("stages", "pipeline"):
+            print(f"{key}: {value}")
+    print(f"{'stage':<28}{'count':>7}{'p50 ms':>11}{'p90 ms':>11}{'p99 ms':>11}{'max ms':>11}{'per s':>9}")
+    for stage, s in report["stages"].items():
+        per_sec = s["per_sec"] if s["per_sec"] is not None else "-"
+        print(f"{stage:<28}{s['count']:>7}{s['p50_ms']:>11}{s['p90_ms']:>11}{s['p99_ms']:>11}{s['max_ms']:>11}{per_sec:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark with a fake VLM and a fake ingest API")
+    parser.add_argument("--frames", type=int, default=300, help="Number of frames to feed through the pipeline")
+    parser.add_argument("--fps", type=float, default=20.0, help="Capture rate of the replayed camera")
+    parser.add_argument("--width", type=int, default=1280, help="Synthetic frame width")
+    parser.add_argument("--height", type=int, default=720, help="Synthetic frame height")
+    parser.add_argument("--source", type=str, default=None, help="Directory of images or a video file to replay instead of synthetic frames")
+    parser.add_argument("--detector", type=str, default="mean", choices=list(DETECTORS))
+    parser.add_argument("--diff-threshold", type=float, default=10.0)
+    parser.add_argument("--model", type=str, default="llava-phi3:3.8b", help="Model ID (selects the preprocessing profile)")
+    parser.add_argument("--vlm-first-token", type=float, default=0.3, help="Fake VLM time to first token (s)")
+    parser.add_argument("--vlm-token-delay", type=float, default=0.005, help="Fake VLM delay per token (s)")
+    parser.add_argument("--vlm-failure-rate", type=float, default=0.0, help="Fraction of fake VLM requests that fail")
+    parser.add_argument("--post-latency", type=float, default=0.02, help="Fake API latency per request (s)")
+    parser.add_argument("--post-failure-rate", type=float, default=0.0, help="Fraction of fake API requests that fail")
+    parser.add_argument("--queue-size", type=int, default=1)
+    parser.add_argument("--shed-policy", type=str, default="drop-oldest")
+    parser.add_argument("--tracemalloc", action="store_true", help="Also report Python heap usage (slower)")
+    parser.add_argument("--legacy", action="store_true", help="Also time the original per-cycle functions at full scale")
+    parser.add_argument("--retention-hours", type=float, default=48, help="Captures directory size for --legacy, in hours")
+    parser.add_argument("--interval", type=int, default=3, help="Capture interval used to populate the captures directory")
+    parser.add_argument("--prompt-modes", action="store_true",
+                        help="Also compare tokens and VLM latency of --prompt-mode full and delta")
+    parser.add_argument("--prompt-frames", type=int, default=20, help="Frames described per prompt mode")
+    parser.add_argument("--ollama-host", type=str, default=None,
+                        help="Measure --prompt-modes against this Ollama server instead of the fake VLM")
+    parser.add_argument("--memory", action="store_true",
+                        help="Also compare RSS and page faults of the capture/diff hot path with and without the frame pool")
+    parser.add_argument("--memory-frames", type=int, default=2000, help="Frames processed per --memory run")
+    parser.add_argument("--json", type=str, default=None, help="Write the full report to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the components' own log output")
+    args = parser.parse_args()
+
+    if args.source:
+        frames = recorded_frames(args.source, args.frames)
+    else:
+        frames = synthetic_frames(args.frames, args.width, args.height)
+
+    results = {}
+    # The components log every cycle with print(); keep the report readable
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+        with quiet:
+            results["pipeline"] = run_pipeline_benchmark(
+                frames, fps=args.fps, detector=args.detector, diff_threshold=args.diff_threshold, model=args.model,
+                vlm_first_token=args.vlm_first_token, vlm_token_delay=args.vlm_token_delay,
+                vlm_failure_rate=args.vlm_failure_rate, post_latency=args.post_latency,
+                post_failure_rate=args.post_failure_rate, queue_size=args.queue_size,
+                shed_policy=args.shed_policy, workdir=workdir, trace_memory=args.tracemalloc)
+        print_report("Pipeline", results["pipeline"])
+
+        if args.legacy:
+            legacy_dir = os.path.join(workdir, "legacy")
+            os.makedirs(legacy_dir)
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with quiet:
+                results["legacy"] = run_legacy_benchmark(args.retention_hours, args.interval, workdir=legacy_dir)
+            print_report("Per-cycle functions at full scale", results["legacy"])
+
+        if args.prompt_modes:
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            if args.source:
+                prompt_frames = recorded_frames(args.source, args.prompt_frames)
+            else:
+                prompt_frames = synthetic_frames(args.prompt_frames, args.width, args.height)
+            with quiet:
+                results["prompt_modes"] = run_prompt_benchmark(
+                    prompt_frames, model=args.model, host=args.ollama_host,
+                    vlm_first_token=args.vlm_first_token, vlm_token_delay=args.vlm_token_delay)
+            print_report("Prompt modes (full vs delta)", results["prompt_modes"])
+
+        if args.memory:
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            if args.source:
+                memory_frames = recorded_frames(args.source, 30)
+            else:
+                memory_frames = synthetic_frames(30, args.width, args.height)
+            with quiet:
+                results["memory"] = run_memory_benchmark(memory_frames, count=args.memory_frames,
+                                                         detector=args.detector)
+            print_report("Frame memory (allocating vs pooled)", results["memory"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 import cv2
+import json
 import os
+import threading
 import time
+from image_utils import Frame
 
 def gstreamer_pipeline(
     sensor_id=0,
@@ -29,68 +32,323 @@ def gstreamer_pipeline(
         )
     )
 
-def capture_image(filepath):
+def parse_camera_spec(spec):
     """
-    Captures an image using GStreamer (CSI) or V4L2 (USB) and saves it.
-    Returns True if successful, False otherwise.
+    Parses a camera list such as "0,1" or "0:0,1:2" into (sensor_id, device) pairs.
+    A bare number uses the same index for the CSI sensor and the V4L2 device.
     """
-    # Ensure directory exists
-    directory = os.path.dirname(filepath)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory)
+    cameras = []
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" in part:
+            sensor_id, device = part.split(":", 1)
+        else:
+            sensor_id = device = part
+        cameras.append((int(sensor_id), int(device)))
+    if not cameras:
+        raise ValueError(f"No cameras in spec: {spec!r}")
+    return cameras
 
-    # 1. Try GStreamer Pipeline (CSI Camera)
+def _open_gstreamer(sensor_id):
     print("Attempting to open CSI camera via GStreamer...")
-    cap = cv2.VideoCapture(gstreamer_pipeline(flip_method=0), cv2.CAP_GSTREAMER)
-    
-    success = False
+    cap = cv2.VideoCapture(gstreamer_pipeline(sensor_id=sensor_id, flip_method=0), cv2.CAP_GSTREAMER)
+
     if cap.isOpened():
-        # Warm up/Check if it actually works
         # Sometimes GStreamer opens but fails to read if no camera is present
         print("GStreamer pipeline opened. Testing read...")
         for _ in range(5): # warm up for a few frames
-            ret, frame = cap.read()
+            ret, _frame = cap.read()
             if ret:
-                success = True
-                break
+                return cap
             time.sleep(0.1)
-        
-        if not success:
-             print("GStreamer opened but failed to read frames.")
-             cap.release()
-    
-    if not success:
-        print("Falling back to USB Camera (V4L2)...")
-        cap = cv2.VideoCapture(0)
-        # Warm up
-        time.sleep(2)
-
-    if not cap.isOpened():
-        print("Error: Could not open any camera.")
-        return False
+        print("GStreamer opened but failed to read frames.")
+    cap.release()
+    return None
 
-    if not success: # if we fell back to V4L2, we need to read a frame
-        ret, frame = cap.read()
-    
+def _open_v4l2(device):
+    print("Opening USB Camera (V4L2)...")
+    cap = cv2.VideoCapture(device)
+    if cap.isOpened():
+        return cap
     cap.release()
+    return None
+
+CAMERA_BACKENDS = {"gstreamer": _open_gstreamer, "v4l2": _open_v4l2}
+
+def open_camera(sensor_id=0, device=0, prefer=None):
+    """
+    Opens the first working camera backend.
+    Tries GStreamer (CSI) first, then falls back to V4L2 (USB). With prefer
+    ("gstreamer" or "v4l2", e.g. the backend that worked last time), that
+    backend is tried first and the other one only if it fails.
+    Returns (cap, backend) where backend is "gstreamer" or "v4l2", or (None, None).
+    """
+    order = list(CAMERA_BACKENDS)
+    if prefer in CAMERA_BACKENDS:
+        order.remove(prefer)
+        order.insert(0, prefer)
+    for backend in order:
+        opener = CAMERA_BACKENDS[backend]
+        cap = opener(sensor_id) if backend == "gstreamer" else opener(device)
+        if cap is not None:
+            return cap, backend
+    print("Error: Could not open any camera.")
+    return None, None
+
+class BackendCache:
+    """
+    Remembers which backend last opened each camera in a small JSON file, so
+    later starts go straight to it instead of probing GStreamer first (which
+    costs about a second on machines without a CSI camera).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _key(sensor_id, device):
+        return f"{sensor_id}:{device}"
+
+    def get(self, sensor_id, device):
+        return self._entries.get(self._key(sensor_id, device))
+
+    def put(self, sensor_id, device, backend):
+        key = self._key(sensor_id, device)
+        with self._lock:
+            if self._entries.get(key) == backend:
+                return
+            self._entries[key] = backend
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Could not save camera backend cache: {e}")
+
+def resize_for_vlm(frame, max_dim=1024, pool=None):
+    """
+    Downscales a frame so its longest side is at most max_dim, to keep VLM load low.
+    With a FramePool, the result is written into a reused buffer.
+    """
+    height, width = frame.shape[:2]
+    if max(height, width) > max_dim:
+        scale = max_dim / max(height, width)
+        new_width = int(width * scale)
+        new_height = int(height * scale)
+        dst = None
+        if pool is not None:
+            dst = pool.acquire((new_height, new_width) + frame.shape[2:])
+        frame = cv2.resize(frame, (new_width, new_height), dst=dst, interpolation=cv2.INTER_AREA)
+    return frame
+
+class CameraSession:
+    """
+    Keeps one camera open for the lifetime of the process.
+
+    A background thread grabs frames continuously and keeps only the newest one,
+    so read() returns in milliseconds instead of reopening the device every cycle.
+    If the camera stops delivering frames it is released and reopened with
+    exponential backoff. With a BackendCache, the backend that worked last
+    time is tried first. With a FramePool, frames are read into reused
+    buffers instead of a new array per frame.
+    """
+
+    def __init__(self, sensor_id=0, device=0, warmup_frames=5, max_failures=10,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0, backend_cache=None, pool=None):
+        self.sensor_id = sensor_id
+        self.device = device
+        self.warmup_frames = warmup_frames
+        self.max_failures = max_failures
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.backend_cache = backend_cache
+        self.pool = pool
 
-    if ret and frame is not None:
-        # Resize if necessary to keep VLM load low
-        height, width = frame.shape[:2]
-        max_dim = 1024
-        if max(height, width) > max_dim:
-            scale = max_dim / max(height, width)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_AREA)
-
-        cv2.imwrite(filepath, frame)
-        print(f"Image saved to {filepath} ({frame.shape[1]}x{frame.shape[0]})")
-        return True
+        self.backend = None
+        self.reconnects = 0
+        # time.monotonic() when the camera first opened / published its first frame
+        self.opened_at = None
+        self.first_frame_at = None
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_time = 0.0
+        self._frame_seq = 0
+        self._frame_shape = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="camera-grab", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _open(self):
+        prefer = None
+        if self.backend_cache is not None:
+            prefer = self.backend_cache.get(self.sensor_id, self.device)
+        cap, backend = open_camera(sensor_id=self.sensor_id, device=self.device, prefer=prefer)
+        if cap is not None and self.backend_cache is not None:
+            self.backend_cache.put(self.sensor_id, self.device, backend)
+        return cap, backend
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stop_event.is_set():
+            cap, backend = self._open()
+            if cap is None:
+                print(f"Camera unavailable. Retrying in {delay:.1f}s...")
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+
+            self.backend = backend
+            if self.opened_at is None:
+                self.opened_at = time.monotonic()
+            print(f"Camera session opened ({backend}).")
+            failures = 0
+            skip = self.warmup_frames
+            while not self._stop_event.is_set():
+                ret, frame = self._grab(cap)
+                if not ret or frame is None:
+                    failures += 1
+                    if failures >= self.max_failures:
+                        print("Camera stopped delivering frames. Reconnecting...")
+                        break
+                    time.sleep(0.05)
+                    continue
+
+                failures = 0
+                delay = self.reconnect_delay
+                if skip > 0:
+                    # Let auto-exposure settle before publishing frames
+                    skip -= 1
+                    continue
+
+                if self.first_frame_at is None:
+                    self.first_frame_at = time.monotonic()
+                with self._cond:
+                    self._frame = frame
+                    self._frame_time = time.time()
+                    self._frame_seq += 1
+                    self._cond.notify_all()
+
+            cap.release()
+            if not self._stop_event.is_set():
+                self.reconnects += 1
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _grab(self, cap):
+        if self.pool is None or self._frame_shape is None:
+            ret, frame = cap.read()
+        else:
+            # The pool only hands out buffers no frame consumer still holds
+            ret, frame = cap.read(self.pool.acquire(self._frame_shape))
+        if ret and frame is not None:
+            self._frame_shape = frame.shape
+        return ret, frame
+
+    def read(self, timeout=5.0, max_age=None):
+        """
+        Returns (frame, timestamp) for the newest grabbed frame.
+        Waits up to timeout seconds for a frame newer than max_age seconds.
+        Returns (None, None) if no suitable frame arrived in time.
+        The returned array is never written to again by the grab thread.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._frame is not None:
+                    if max_age is None or time.time() - self._frame_time <= max_age:
+                        return self._frame, self._frame_time
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None, None
+                self._cond.wait(remaining)
+
+    def read_next(self, after_seq=0, timeout=1.0):
+        """
+        Returns (frame, timestamp, seq) for the first frame published after
+        sequence number after_seq, for consumers that look at every frame.
+        Frames published while the caller was busy are skipped, not queued.
+        Returns (None, None, after_seq) if no new frame arrived in time.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._frame_seq <= after_seq or self._frame is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None, None, after_seq
+                self._cond.wait(remaining)
+            return self._frame, self._frame_time, self._frame_seq
+
+def capture_frame(session=None, max_dim=1024):
+    """
+    Captures a frame using GStreamer (CSI) or V4L2 (USB) and keeps it in memory.
+    If a CameraSession is given, the newest frame from it is used instead of
+    opening the device.
+    Returns a Frame resized for the VLM, or None on failure.
+    """
+    if session is not None:
+        frame, timestamp = session.read()
     else:
+        timestamp = None
+        cap, backend = open_camera()
+        if cap is None:
+            return None
+        if backend == "v4l2":
+            # Warm up
+            time.sleep(2)
+        ret, frame = cap.read()
+        cap.release()
+        if not ret:
+            frame = None
+
+    if frame is None:
         print("Error: Could not read frame from any source.")
+        return None
+
+    return Frame(resize_for_vlm(frame, max_dim, pool=getattr(session, "pool", None)), timestamp=timestamp)
+
+def capture_image(filepath, session=None):
+    """
+    Captures an image using GStreamer (CSI) or V4L2 (USB) and saves it.
+    Returns True if successful, False otherwise.
+    """
+    frame = capture_frame(session)
+    if frame is None:
         return False
 
+    frame.save(filepath)
+    print(f"Image saved to {filepath} ({frame.shape[1]}x{frame.shape[0]})")
+    return True
+
 if __name__ == "__main__":
     # Test capture
     print(cv2.getBuildInformation())
@@ -0,0 +1,126 @@
+import collections
+import threading
+import time
+
+class CaptureScheduler:
+    """
+    Decides when the next capture cycle starts.
+
+    Deadlines are kept on the monotonic clock and each one is the previous
+    deadline plus the current interval, so time spent capturing does not
+    stretch the period. If a cycle overruns a whole period the missed ticks
+    are skipped instead of being fired back to back.
+
+    The interval adapts to what the change detector reports:
+    - a score at or above the threshold switches to min_interval (active);
+      a wait already in progress is cut short so the next capture comes
+      min_interval after the last one
+    - after idle_after seconds without activity the interval grows by
+      `backoff` each cycle, up to max_interval (idle)
+    - while backlog() reports frames waiting for analysis, the interval is
+      never shorter than the base interval, since faster captures would
+      only be shed
+    """
+
+    def __init__(self, interval, min_interval=None, max_interval=None, idle_after=30.0,
+                 backoff=1.5, backlog=None, clock=None, sleep=None, window=20):
+        self.interval = interval
+        self.min_interval = min(interval, 1.0) if min_interval is None else min_interval
+        self.max_interval = max(interval, 30.0) if max_interval is None else max_interval
+        if not self.min_interval <= self.interval <= self.max_interval:
+            raise ValueError("Capture intervals must satisfy min <= interval <= max")
+        self.idle_after = idle_after
+        self.backoff = backoff
+        self.backlog = backlog
+        self.clock = clock or time.monotonic
+        # Injected sleep is for tests; by default report() can wake a waiting cycle
+        self.sleep = sleep
+
+        self.current = interval
+        self.missed = 0
+        self.cycles = 0
+        self._deadline = None
+        self._last_activity = self.clock()
+        self._fired = collections.deque(maxlen=window)
+        self._cond = threading.Condition()
+
+    def _backlogged(self):
+        return self.backlog is not None and self.backlog() > 0
+
+    def report(self, score, threshold):
+        """
+        Feeds one change score back; called from the diff stage.
+        """
+        if score < threshold:
+            return
+        with self._cond:
+            now = self.clock()
+            self._last_activity = now
+            if self._deadline is None or not self._fired:
+                return
+            interval = self.interval if self._backlogged() else self.min_interval
+            deadline = max(now, self._fired[-1] + interval)
+            if deadline < self._deadline:
+                self._deadline = deadline
+                self.current = interval
+                self._cond.notify_all()
+
+    def _next_interval(self, now):
+        with self._cond:
+            quiet = now - self._last_activity
+        if quiet < self.idle_after:
+            interval = self.min_interval
+        else:
+            interval = min(self.max_interval, max(self.current, self.interval) * self.backoff)
+        if self._backlogged():
+            interval = max(interval, self.interval)
+        return interval
+
+    def wait(self):
+        """
+        Blocks until the next deadline, then schedules the one after it.
+        The first call returns immediately.
+        """
+        with self._cond:
+            if self._deadline is None:
+                self._deadline = self.clock()
+        while True:
+            with self._cond:
+                delay = self._deadline - self.clock()
+                if delay <= 0:
+                    break
+                if self.sleep is None:
+                    self._cond.wait(delay)
+                    continue
+            self.sleep(delay)
+
+        now = self.clock()
+        self.cycles += 1
+        self._fired.append(now)
+        interval = self._next_interval(now)
+        with self._cond:
+            self.current = interval
+            self._deadline += interval
+            if self._deadline <= now:
+                # Overran at least one full period: drop the missed ticks
+                skipped = int((now - self._deadline) // interval) + 1
+                self.missed += skipped
+                self._deadline += skipped * interval
+
+    def effective_rate(self):
+        """
+        Captures per minute over the recent window, or None before two cycles.
+        """
+        if len(self._fired) < 2:
+            return None
+        span = self._fired[-1] - self._fired[0]
+        return 60.0 * (len(self._fired) - 1) / span if span > 0 else None
+
+    def stats(self):
+        rate = self.effective_rate()
+        return {
+            "interval": round(self.current, 3),
+            "captures_per_min": round(rate, 2) if rate is not None else None,
+            "cycles": self.cycles,
+            "missed": self.missed,
+        }
@@ -0,0 +1,198 @@
+import threading
+import time
+
+import cv2
+
+class PersonDetector:
+    """
+    OpenCV's HOG pedestrian detector, run on a copy of the frame scaled to
+    width pixels (tens of milliseconds on a CPU). detect() returns
+    full-resolution (x, y, w, h) boxes of detections scoring at least
+    min_weight. OpenCV builds without HOGDescriptor (5.x without contrib)
+    raise RuntimeError.
+    """
+
+    def __init__(self, width=400, min_weight=0.3, scale=1.05):
+        if not hasattr(cv2, "HOGDescriptor"):
+            raise RuntimeError("This OpenCV build has no HOGDescriptor")
+        self.width = width
+        self.min_weight = min_weight
+        self.scale = scale
+        self._hog = cv2.HOGDescriptor()
+        self._hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+        self._lock = threading.Lock()
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        ratio = min(1.0, self.width / width)
+        small = image if ratio == 1.0 else cv2.resize(image, (self.width, max(1, round(height * ratio))),
+                                                      interpolation=cv2.INTER_AREA)
+        with self._lock:
+            rects, weights = self._hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=self.scale)
+        return [tuple(int(v / ratio) for v in rect)
+                for rect, weight in zip(rects, weights) if float(weight) >= self.min_weight]
+
+class BlobCounter:
+    """
+    Foreground blobs of one camera from a MOG2 background subtractor, on a
+    copy of the frame scaled to width pixels. Shadows are not foreground.
+    apply() updates the model and returns (blobs, foreground): (x, y, w, h)
+    boxes in scaled pixels of blobs covering at least min_area of the frame,
+    and the fraction of the frame they cover.
+    """
+
+    def __init__(self, width=160, history=50, var_threshold=16, min_area=0.002):
+        self.width = width
+        self.min_area = min_area
+        self.frames = 0
+        self.size = None
+        self._subtractor = cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=var_threshold,
+                                                              detectShadows=True)
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+    def apply(self, image):
+        height, width = image.shape[:2]
+        self.size = (self.width, max(1, round(self.width * height / width)))
+        small = cv2.resize(image, self.size, interpolation=cv2.INTER_AREA)
+        mask = self._subtractor.apply(small)
+        self.frames += 1
+        # Shadows are marked 127, confident foreground 255
+        _, mask = cv2.threshold(mask, 200, 255, cv2.THRESH_BINARY)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        min_pixels = self.min_area * mask.size
+        blobs = [tuple(int(v) for v in stats[i, :4]) for i in range(1, count)
+                 if stats[i, cv2.CC_STAT_AREA] >= min_pixels]
+        foreground = sum(int(stats[i, cv2.CC_STAT_AREA]) for i in range(1, count)
+                         if stats[i, cv2.CC_STAT_AREA] >= min_pixels) / mask.size
+        return blobs, foreground
+
+def person_shaped(blobs, frame_height, min_height=0.2, min_aspect=1.5):
+    """
+    Returns True if a blob is upright and tall enough to be a standing person.
+    """
+    return any(h >= min_aspect * w and h >= min_height * frame_height for _, _, w, h in blobs)
+
+class Cascade:
+    """
+    Cheap CPU checks that run before the VLM and pick the model, per camera.
+
+    Tiers, each optional:
+      motion:  MOG2 foreground blobs. A frame that passed the diff gate but
+               has no foreground (a lighting change, sensor noise) skips the
+               VLM, unless the camera has not been described for refresh
+               seconds.
+      person:  the HOG person detector (or, without HOG in this OpenCV
+               build, an upright foreground blob). People escalate to the
+               large model.
+      objects: a lot of foreground (escalate_foreground of the frame, or
+               escalate_blobs blobs) escalates to the large model.
+    Frames that pass without escalating go to the small model. Without
+    person and objects tiers, every frame that passes goes to the large one.
+
+    route() returns SKIP, SMALL or LARGE; stats() reports per-tier runs,
+    hits and latency, and how many VLM calls were avoided.
+    """
+
+    SKIP, SMALL, LARGE = "skip", "small", "large"
+    TIERS = ("motion", "person", "objects")
+
+    def __init__(self, tiers=TIERS, person_detector=None, blob_factory=None, min_foreground=0.002,
+                 escalate_foreground=0.05, escalate_blobs=3, refresh=300.0, warmup_frames=3):
+        unknown = set(tiers) - set(self.TIERS)
+        if unknown:
+            raise ValueError(f"Unknown cascade tier(s): {', '.join(sorted(unknown))}")
+        self.tiers = tuple(tier for tier in self.TIERS if tier in tiers)
+        if "person" in self.tiers and person_detector is None:
+            try:
+                person_detector = PersonDetector()
+            except RuntimeError as e:
+                print(f"Cascade: {e}. Using upright foreground blobs as the person check.")
+        self.person_detector = person_detector
+        self.blob_factory = blob_factory or BlobCounter
+        self.min_foreground = min_foreground
+        self.escalate_foreground = escalate_foreground
+        self.escalate_blobs = escalate_blobs
+        self.refresh = refresh
+        self.warmup_frames = warmup_frames
+
+        self._counters = {}
+        self._last_described = {}
+        self._tier_stats = {tier: {"runs": 0, "hits": 0, "seconds": 0.0} for tier in self.tiers}
+        self._routes = {self.SKIP: 0, self.SMALL: 0, self.LARGE: 0}
+        self._lock = threading.Lock()
+
+    def _counter(self, camera_id):
+        with self._lock:
+            counter = self._counters.get(camera_id)
+            if counter is None:
+                counter = self._counters[camera_id] = self.blob_factory()
+            return counter
+
+    def _record(self, tier, hit, started):
+        with self._lock:
+            stats = self._tier_stats[tier]
+            stats["runs"] += 1
+            stats["hits"] += int(hit)
+            stats["seconds"] += time.perf_counter() - started
+
+    def observe(self, frame, camera_id=0):
+        """
+        Updates the camera's background model with a frame that is not
+        routed (e.g. one below the diff threshold).
+        """
+        self._counter(camera_id).apply(getattr(frame, "image", frame))
+
+    def route(self, frame, camera_id=0, now=None):
+        image = getattr(frame, "image", frame)
+        now = now if now is not None else getattr(frame, "timestamp", None) or time.time()
+        started = time.perf_counter()
+        counter = self._counter(camera_id)
+        blobs, foreground = counter.apply(image)
+        # Until the background model has seen a few frames, everything looks like foreground
+        warm = counter.frames > self.warmup_frames
+        route = None
+
+        if "motion" in self.tiers:
+            moving = bool(blobs) and foreground >= self.min_foreground
+            self._record("motion", moving, started)
+            last = self._last_described.get(camera_id)
+            if warm and not moving and last is not None and now - last < self.refresh:
+                route = self.SKIP
+
+        if route is None and "person" in self.tiers:
+            started = time.perf_counter()
+            if self.person_detector is not None:
+                found = bool(self.person_detector.detect(image))
+            else:
+                found = warm and person_shaped(blobs, counter.size[1])
+            self._record("person", found, started)
+            if found:
+                route = self.LARGE
+
+        if route is None and "objects" in self.tiers:
+            started = time.perf_counter()
+            busy = warm and (foreground >= self.escalate_foreground or len(blobs) >= self.escalate_blobs)
+            self._record("objects", busy, started)
+            if busy:
+                route = self.LARGE
+
+        if route is None:
+            route = self.SMALL if ("person" in self.tiers or "objects" in self.tiers) else self.LARGE
+        with self._lock:
+            self._routes[route] += 1
+            if route != self.SKIP:
+                self._last_described[camera_id] = now
+        return route
+
+    def stats(self):
+        with self._lock:
+            tiers = {}
+            for tier, stats in self._tier_stats.items():
+                runs = stats["runs"]
+                tiers[tier] = {
+                    "runs": runs,
+                    "hits": stats["hits"],
+                    "avg_ms": round(1000 * stats["seconds"] / runs, 2) if runs else None,
+                }
+            return {"tiers": tiers, "routes": dict(self._routes), "vlm_calls_avoided": self._routes[self.SKIP]}
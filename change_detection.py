@@ -0,0 +1,361 @@
+import os
+import cv2
+import numpy as np
+
+def parse_regions(spec):
+    """
+    Parses "x,y,w,h;x,y,w,h" rectangles given as fractions (0-1) of the frame size.
+    """
+    regions = []
+    for part in spec.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        x, y, w, h = (float(v) for v in part.split(","))
+        regions.append((x, y, w, h))
+    return regions
+
+def _region_mask(spec, size):
+    """
+    Returns a boolean mask (True = selected) from a mask image path or a region spec.
+    """
+    width, height = size
+    if os.path.exists(spec):
+        image = cv2.imread(spec, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError(f"Could not read mask image: {spec}")
+        return cv2.resize(image, size, interpolation=cv2.INTER_NEAREST) > 0
+    mask = np.zeros((height, width), dtype=bool)
+    for x, y, w, h in parse_regions(spec):
+        x1, y1 = int(round(x * width)), int(round(y * height))
+        x2, y2 = int(round((x + w) * width)), int(round((y + h) * height))
+        mask[y1:y2, x1:x2] = True
+    return mask
+
+def build_mask(size, roi=None, ignore=None):
+    """
+    Builds a uint8 mask (255 = watched, 0 = ignored) for a (width, height) thumbnail.
+    roi and ignore are each either a mask image path or a region spec for parse_regions().
+    Returns None when neither is given, meaning the whole frame is watched.
+    """
+    if not roi and not ignore:
+        return None
+    width, height = size
+    watched = _region_mask(roi, size) if roi else np.ones((height, width), dtype=bool)
+    if ignore:
+        watched &= ~_region_mask(ignore, size)
+    if not watched.any():
+        raise ValueError("Region of interest and ignore masks leave nothing to watch")
+    return watched.astype(np.uint8) * 255
+
+def phash(gray):
+    """
+    Returns the 64-bit DCT perceptual hash of a grayscale image as an int.
+    """
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    # Skip the DC term so overall brightness does not dominate the median
+    bits = low > np.median(low[1:])
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+def hamming(hash1, hash2):
+    return bin(hash1 ^ hash2).count("1")
+
+class ChangeDetector:
+    """
+    Base class for change detectors.
+
+    update(frame) downsizes the frame into preallocated buffers, compares it with
+    the detector's reference (previous frame or background model) and returns a
+    score where higher means more change. The first frame returns inf so it is
+    always analyzed. Pixels outside the mask are ignored.
+    """
+
+    name = None
+    default_size = (64, 64)
+    interpolation = cv2.INTER_AREA
+
+    def __init__(self, size=None, roi=None, ignore=None):
+        self.size = tuple(size or self.default_size)
+        width, height = self.size
+        self.mask = build_mask(self.size, roi, ignore)
+        self._small = np.empty((height, width, 3), dtype=np.uint8)
+        self._gray = np.empty((height, width), dtype=np.uint8)
+        self._primed = False
+
+    def _thumbnail(self, image):
+        cv2.resize(image, self.size, dst=self._small, interpolation=self.interpolation)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        return self._gray
+
+    def _mean(self, image):
+        if self.mask is None:
+            return cv2.mean(image)[0]
+        return cv2.mean(image, mask=self.mask)[0]
+
+    def update(self, frame):
+        image = getattr(frame, "image", frame)
+        gray = self._thumbnail(image)
+        if not self._primed:
+            self._prime(gray)
+            self._primed = True
+            return float("inf")
+        return float(self._score(gray))
+
+    def reset(self):
+        self._primed = False
+
+    def _prime(self, gray):
+        raise NotImplementedError
+
+    def _score(self, gray):
+        raise NotImplementedError
+
+class MeanDiffDetector(ChangeDetector):
+    """
+    Mean absolute grayscale difference to the previous frame (0-255).
+    Matches calculate_frame_difference() when no mask is set.
+    """
+
+    name = "mean"
+    interpolation = cv2.INTER_LINEAR
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        width, height = self.size
+        self._prev = np.empty((height, width), dtype=np.uint8)
+        self._diff = np.empty((height, width), dtype=np.uint8)
+
+    def _prime(self, gray):
+        self._swap()
+
+    def _score(self, gray):
+        cv2.absdiff(gray, self._prev, dst=self._diff)
+        score = self._mean(self._diff)
+        self._swap()
+        return score
+
+    def _swap(self):
+        # Double buffering: the current thumbnail becomes the previous one and
+        # the old previous buffer receives the next frame, without a copy
+        self._gray, self._prev = self._prev, self._gray
+
+class BackgroundModelDetector(ChangeDetector):
+    """
+    Percentage (0-100) of watched pixels that differ from a running-average
+    background model by more than pixel_threshold. With compensate_lighting,
+    the difference in overall brightness between the frame and the background
+    is removed first, so global lighting changes do not count as foreground.
+    """
+
+    name = "background"
+    default_size = (128, 128)
+
+    def __init__(self, alpha=0.05, pixel_threshold=25, compensate_lighting=True, **kwargs):
+        super().__init__(**kwargs)
+        width, height = self.size
+        self.alpha = alpha
+        self.pixel_threshold = pixel_threshold
+        self.compensate_lighting = compensate_lighting
+        self._background = np.empty((height, width), dtype=np.float32)
+        self._current = np.empty((height, width), dtype=np.float32)
+        self._diff = np.empty((height, width), dtype=np.float32)
+
+    def _prime(self, gray):
+        np.copyto(self._background, gray)
+
+    def _score(self, gray):
+        np.copyto(self._current, gray)
+        if self.compensate_lighting:
+            offset = self._mean(self._current) - self._mean(self._background)
+            np.subtract(self._current, offset, out=self._diff)
+            cv2.absdiff(self._diff, self._background, dst=self._diff)
+        else:
+            cv2.absdiff(self._current, self._background, dst=self._diff)
+        cv2.threshold(self._diff, self.pixel_threshold, 100.0, cv2.THRESH_BINARY, dst=self._diff)
+        score = self._mean(self._diff)
+        cv2.accumulateWeighted(self._current, self._background, self.alpha)
+        return score
+
+class TileMaxDetector(ChangeDetector):
+    """
+    Splits the frame into a grid of tiles and returns the largest per-tile mean
+    absolute difference (0-255) to the previous frame, so a change confined to
+    one corner scores as high as a change across the whole frame.
+    """
+
+    name = "tile"
+    default_size = (128, 128)
+
+    def __init__(self, grid=(8, 8), compensate_lighting=True, **kwargs):
+        super().__init__(**kwargs)
+        width, height = self.size
+        cols, rows = grid
+        if width % cols or height % rows:
+            raise ValueError(f"Size {self.size} is not divisible by grid {grid}")
+        self.grid = (cols, rows)
+        self.compensate_lighting = compensate_lighting
+        self._prev = np.empty((height, width), dtype=np.float32)
+        self._current = np.empty((height, width), dtype=np.float32)
+        self._diff = np.empty((height, width), dtype=np.float32)
+        self._weights = None
+        self._tile_pixels = np.full((rows, cols), (height // rows) * (width // cols), dtype=np.float32)
+        if self.mask is not None:
+            self._weights = (self.mask > 0).astype(np.float32)
+            self._tile_pixels = self._tiles(self._weights)
+
+    def _tiles(self, image):
+        width, height = self.size
+        cols, rows = self.grid
+        return image.reshape(rows, height // rows, cols, width // cols).sum(axis=(1, 3))
+
+    def _prime(self, gray):
+        np.copyto(self._prev, gray)
+
+    def _score(self, gray):
+        np.copyto(self._current, gray)
+        if self.compensate_lighting:
+            offset = self._mean(self._current) - self._mean(self._prev)
+            np.subtract(self._current, offset, out=self._diff)
+            cv2.absdiff(self._diff, self._prev, dst=self._diff)
+        else:
+            cv2.absdiff(self._current, self._prev, dst=self._diff)
+        if self._weights is not None:
+            np.multiply(self._diff, self._weights, out=self._diff)
+        self._prev, self._current = self._current, self._prev
+        covered = self._tile_pixels > 0
+        return (self._tiles(self._diff)[covered] / self._tile_pixels[covered]).max()
+
+class GridSSIMDetector(ChangeDetector):
+    """
+    Structural similarity against the previous frame, averaged per grid tile.
+    Returns (1 - lowest tile SSIM) * 100, so 0 means identical and a tile
+    whose structure changed completely scores about 100. SSIM normalizes
+    local brightness and contrast, so it is robust to lighting changes.
+    """
+
+    name = "ssim"
+    default_size = (128, 128)
+
+    C1 = (0.01 * 255) ** 2
+    C2 = (0.03 * 255) ** 2
+
+    def __init__(self, grid=(8, 8), window=7, **kwargs):
+        super().__init__(**kwargs)
+        width, height = self.size
+        cols, rows = grid
+        if width % cols or height % rows:
+            raise ValueError(f"Size {self.size} is not divisible by grid {grid}")
+        self.grid = (cols, rows)
+        self.window = (window, window)
+        shape = (height, width)
+        self._prev = np.empty(shape, dtype=np.float32)
+        self._current = np.empty(shape, dtype=np.float32)
+        self._mu1 = np.empty(shape, dtype=np.float32)
+        self._mu2 = np.empty(shape, dtype=np.float32)
+        self._tmp = np.empty(shape, dtype=np.float32)
+        self._s1 = np.empty(shape, dtype=np.float32)
+        self._s2 = np.empty(shape, dtype=np.float32)
+        self._s12 = np.empty(shape, dtype=np.float32)
+        self._tile_pixels = np.full((rows, cols), (height // rows) * (width // cols), dtype=np.float32)
+        self._weights = None
+        if self.mask is not None:
+            self._weights = (self.mask > 0).astype(np.float32)
+            self._tile_pixels = self._tiles(self._weights)
+
+    def _tiles(self, image):
+        width, height = self.size
+        cols, rows = self.grid
+        return image.reshape(rows, height // rows, cols, width // cols).sum(axis=(1, 3))
+
+    def _prime(self, gray):
+        np.copyto(self._prev, gray)
+
+    def _score(self, gray):
+        x, y = self._current, self._prev
+        np.copyto(x, gray)
+        mu1, mu2, tmp, s1, s2, s12 = self._mu1, self._mu2, self._tmp, self._s1, self._s2, self._s12
+
+        cv2.blur(x, self.window, dst=mu1)
+        cv2.blur(y, self.window, dst=mu2)
+        np.multiply(x, x, out=tmp)
+        cv2.blur(tmp, self.window, dst=s1)
+        np.multiply(y, y, out=tmp)
+        cv2.blur(tmp, self.window, dst=s2)
+        np.multiply(x, y, out=tmp)
+        cv2.blur(tmp, self.window, dst=s12)
+
+        # s1, s2, s12 become the local variances/covariance
+        np.multiply(mu1, mu1, out=tmp)
+        np.subtract(s1, tmp, out=s1)
+        np.multiply(mu2, mu2, out=tmp)
+        np.subtract(s2, tmp, out=s2)
+        np.multiply(mu1, mu2, out=tmp)
+        np.subtract(s12, tmp, out=s12)
+
+        # Numerator: (2*mu1*mu2 + C1) * (2*s12 + C2), stored in s12
+        np.multiply(tmp, 2, out=tmp)
+        np.add(tmp, self.C1, out=tmp)
+        np.multiply(s12, 2, out=s12)
+        np.add(s12, self.C2, out=s12)
+        np.multiply(s12, tmp, out=s12)
+
+        # Denominator: (mu1^2 + mu2^2 + C1) * (s1 + s2 + C2), stored in s1
+        np.multiply(mu1, mu1, out=mu1)
+        np.multiply(mu2, mu2, out=mu2)
+        np.add(mu1, mu2, out=mu1)
+        np.add(mu1, self.C1, out=mu1)
+        np.add(s1, s2, out=s1)
+        np.add(s1, self.C2, out=s1)
+        np.multiply(s1, mu1, out=s1)
+
+        np.divide(s12, s1, out=s12)
+        if self._weights is not None:
+            np.multiply(s12, self._weights, out=s12)
+
+        self._prev, self._current = self._current, self._prev
+        covered = self._tile_pixels > 0
+        lowest = (self._tiles(s12)[covered] / self._tile_pixels[covered]).min()
+        return max(0.0, 1.0 - lowest) * 100
+
+class PHashDetector(ChangeDetector):
+    """
+    Hamming distance (0-64) between the perceptual hashes of consecutive frames.
+    Ignored pixels are filled with the mean of the watched area before hashing.
+    """
+
+    name = "phash"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._prev_hash = None
+
+    def _hash(self, gray):
+        if self.mask is not None:
+            gray[self.mask == 0] = int(self._mean(gray))
+        return phash(gray)
+
+    def _prime(self, gray):
+        self._prev_hash = self._hash(gray)
+
+    def _score(self, gray):
+        current = self._hash(gray)
+        distance = hamming(current, self._prev_hash)
+        self._prev_hash = current
+        return distance
+
+DETECTORS = {
+    cls.name: cls
+    for cls in (MeanDiffDetector, BackgroundModelDetector, TileMaxDetector, GridSSIMDetector, PHashDetector)
+}
+
+def create_detector(name="mean", **kwargs):
+    """
+    Creates a change detector by name (see DETECTORS).
+    """
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown detector '{name}'. Choose from: {', '.join(DETECTORS)}")
+    return DETECTORS[name](**kwargs)
@@ -0,0 +1,162 @@
+import collections
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+
+from event_store import parse_description
+
+STOPWORDS = frozenset(
+    "a an the and or of in on at to with is are was were be it its this that there some any no not "
+    "visible appears seems can see seen".split()
+)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Kept as uint64: mixing uint64 arrays with Python ints promotes them to float64
+_MERSENNE = np.uint64((1 << 61) - 1)
+
+def normalize_words(text):
+    """
+    Lowercases text and returns its content words, with markdown,
+    punctuation, stopwords and simple plural endings removed.
+    """
+    words = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+def description_features(text):
+    """
+    Returns (people_count, shingles) for a description in the analyzer's
+    fixed layout. The shingles are the normalized words and word pairs of
+    the environment and people fields, plus one token per object, so
+    reordered object lists and rewording of filler words do not count as
+    differences.
+    """
+    parsed = parse_description(text)
+    shingles = set()
+    fields = [parsed["environment"]] + [" ".join(person.values()) for person in parsed["people"]]
+    for field in fields:
+        words = normalize_words(field)
+        shingles.update(words)
+        shingles.update(" ".join(pair) for pair in zip(words, words[1:]))
+    for name in parsed["objects"]:
+        words = normalize_words(name)
+        if words:
+            shingles.add("object:" + " ".join(words))
+    return len(parsed["people"]), shingles
+
+class MinHasher:
+    """
+    MinHash signatures of shingle sets: the fraction of equal signature
+    entries estimates the Jaccard similarity of two sets.
+    """
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.default_rng(seed)
+        # a * x + b wraps around 2**64 before the modulo; that is fine for hashing
+        self._a = rng.integers(1, _MERSENNE, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE, num_perm, dtype=np.uint64)
+
+    @staticmethod
+    def _hash(shingle):
+        return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "little")
+
+    def signature(self, shingles):
+        values = np.fromiter((self._hash(s) for s in shingles), dtype=np.uint64, count=len(shingles))
+        if not len(values):
+            return np.full(len(self._a), _MERSENNE, dtype=np.uint64)
+        hashes = (np.outer(values, self._a) + self._b) % _MERSENNE
+        return hashes.min(axis=0)
+
+    @staticmethod
+    def similarity(signature1, signature2):
+        return float(np.mean(signature1 == signature2))
+
+class _Entry:
+    def __init__(self, people, signature, timestamp):
+        self.people = people
+        self.signature = signature
+        self.posted_at = timestamp
+        self.suppressed = 0
+
+class DescriptionDeduper:
+    """
+    Suppresses descriptions that repeat a recent one of the same camera.
+
+    Each description is reduced to its parsed fields (people count, objects,
+    environment and people text, normalized) and a MinHash signature of
+    their shingles. It is a duplicate when a description among the camera's
+    last history posts has the same number of people and a similarity of at
+    least threshold. A duplicate is still posted as a heartbeat once the
+    matched post is heartbeat seconds old, so a long unchanged scene keeps
+    reporting. Errors are never suppressed.
+    """
+
+    POST, DUPLICATE, HEARTBEAT = "post", "duplicate", "heartbeat"
+
+    def __init__(self, threshold=0.8, history=32, heartbeat=600.0, num_perm=64):
+        self.threshold = threshold
+        self.history = history
+        self.heartbeat = heartbeat
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.checked = 0
+        self.posted = 0
+        self.suppressed = 0
+        self.heartbeats = 0
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def check(self, text, camera_id=None, timestamp=None):
+        """
+        Returns (decision, similarity): POST for a new description, DUPLICATE
+        if it should not be posted, HEARTBEAT if it repeats a recent one but
+        should be posted anyway. similarity is that of the closest recent
+        description with the same people count (None if there is none).
+        """
+        timestamp = timestamp if timestamp is not None else time.time()
+        if text.startswith("Error"):
+            return self.POST, None
+        people, shingles = description_features(text)
+        signature = self.hasher.signature(shingles)
+        with self._lock:
+            self.checked += 1
+            recent = self._recent.setdefault(camera_id, collections.deque(maxlen=self.history))
+            best, similarity = None, None
+            for entry in recent:
+                if entry.people != people:
+                    continue
+                score = self.hasher.similarity(signature, entry.signature)
+                if similarity is None or score > similarity:
+                    best, similarity = entry, score
+
+            if best is None or similarity < self.threshold:
+                recent.append(_Entry(people, signature, timestamp))
+                self.posted += 1
+                return self.POST, similarity
+            if timestamp - best.posted_at >= self.heartbeat:
+                print(f"[cam{camera_id}] Scene unchanged for {timestamp - best.posted_at:.0f}s "
+                      f"({best.suppressed} similar description(s) not posted). Posting a heartbeat.")
+                # The heartbeat becomes the newest post of this scene
+                recent.remove(best)
+                recent.append(_Entry(people, signature, timestamp))
+                self.heartbeats += 1
+                return self.HEARTBEAT, similarity
+            best.suppressed += 1
+            self.suppressed += 1
+            return self.DUPLICATE, similarity
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "posted": self.posted,
+                "heartbeats": self.heartbeats,
+                "suppressed": self.suppressed,
+                "saved_pct": round(100.0 * self.suppressed / self.checked, 1) if self.checked else 0.0,
+            }
@@ -0,0 +1,170 @@
+import re
+import threading
+
+from analyzer import DEFAULT_PROMPT
+from event_store import SECTION_RE
+
+SECTIONS = ("environment", "objects", "people")
+HEADINGS = {
+    "environment": "**1. Environment**",
+    "objects": "**2. Objects**",
+    "people": "**3. People**",
+}
+NO_CHANGE = "NO CHANGE"
+NO_CHANGE_RE = re.compile(r"^\W*no changes?\W*$", re.IGNORECASE)
+
+# Identical on every call, so the server can reuse its processed prefix
+SYSTEM_PROMPT = (
+    DEFAULT_PROMPT
+    + "\n\nYou may be given your previous description of the same camera. In that case compare the new "
+      "image with it and rewrite only the sections whose content changed, with the same headings and "
+      "format. Leave out sections that did not change. If nothing changed, reply exactly: " + NO_CHANGE
+)
+FULL_REQUEST = "Describe this image."
+DELTA_REQUEST = "Previous description:\n{previous}\n\nDescribe only what changed in this image."
+
+def split_sections(text):
+    """
+    Splits a description into {section: [lines]} by its headings.
+    Returns None if the text has no recognizable headings.
+    """
+    sections = {}
+    current = None
+    for line in text.splitlines():
+        match = SECTION_RE.match(line.strip())
+        if match:
+            current = match.group(1).lower()
+            sections[current] = []
+        elif current is not None and line.strip():
+            sections[current].append(line.rstrip())
+    return sections or None
+
+def format_sections(sections):
+    """
+    Renders {section: [lines]} in the analyzer's fixed layout.
+    """
+    parts = [HEADINGS[name] + "\n" + "\n".join(sections[name]) for name in SECTIONS if name in sections]
+    return "\n\n".join(parts)
+
+def merge_delta(previous, delta):
+    """
+    Applies a delta reply to the previous full description. Sections in the
+    reply replace the previous ones; the others are kept. Returns the merged
+    description, or None if the reply is neither a delta nor NO CHANGE.
+    """
+    if NO_CHANGE_RE.match(delta.strip()):
+        return previous
+    changed = split_sections(delta)
+    if changed is None:
+        return None
+    sections = split_sections(previous) or {}
+    sections.update(changed)
+    return format_sections(sections)
+
+class IncrementalAnalyzer:
+    """
+    Wraps an ImageAnalyzer so that, per camera, only changes are generated.
+
+    The first frame of a camera, and every refresh-th frame after that, gets
+    a full description. In between, the model is shown its previous
+    description and asked to rewrite only the sections that changed (or to
+    reply NO CHANGE); the reply is merged into a full record, so posts and the
+    event store always see the complete fixed format. Replies that cannot be
+    merged fall back to a full description.
+
+    All requests start with the same system prompt, so Ollama can reuse the
+    evaluated prefix from the previous call. Tokens generated and latency are
+    tracked per mode for comparison (stats()).
+    """
+
+    MODES = ("full", "delta")
+
+    def __init__(self, analyzer, refresh=10):
+        self.analyzer = analyzer
+        self.refresh = max(1, refresh)
+        self.fallbacks = 0
+        self.unchanged = 0
+        self._previous = {}
+        self._since_full = {}
+        self._totals = {mode: {"calls": 0, "tokens": 0, "prompt_tokens": 0, "seconds": 0.0}
+                        for mode in self.MODES}
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self):
+        return self.analyzer.model_id
+
+    def warm_up(self):
+        return self.analyzer.warm_up()
+
+    def _ask(self, mode, frame, prompt):
+        text = self.analyzer.analyze(frame, prompt=prompt, system=SYSTEM_PROMPT)
+        # last_result is this thread's call; cache hits leave it None and cost nothing
+        result = self.analyzer.last_result
+        if result is not None:
+            with self._lock:
+                totals = self._totals[mode]
+                totals["calls"] += 1
+                totals["tokens"] += result.eval_count or 0
+                totals["prompt_tokens"] += result.prompt_eval_count or 0
+                totals["seconds"] += result.latency or 0.0
+        return text
+
+    def analyze(self, frame, camera_id=0):
+        """
+        Returns the full description of frame for camera_id.
+        """
+        with self._lock:
+            previous = self._previous.get(camera_id)
+            since_full = self._since_full.get(camera_id, 0)
+
+        description = None
+        if previous is not None and since_full < self.refresh:
+            reply = self._ask("delta", frame, DELTA_REQUEST.format(previous=previous))
+            if reply.startswith("Error"):
+                return reply
+            description = merge_delta(previous, reply)
+            if description is previous:
+                with self._lock:
+                    self.unchanged += 1
+            elif description is None:
+                with self._lock:
+                    self.fallbacks += 1
+                print("Delta reply could not be merged. Requesting a full description.")
+
+        if description is None:
+            description = self._ask("full", frame, FULL_REQUEST)
+            if description.startswith("Error"):
+                return description
+            since_full = 0
+            if split_sections(description) is None:
+                # Without headings there is nothing to merge into next time
+                with self._lock:
+                    self._previous.pop(camera_id, None)
+                return description
+
+        with self._lock:
+            self._previous[camera_id] = description
+            self._since_full[camera_id] = since_full + 1
+        return description
+
+    def totals(self):
+        """
+        Returns VLM calls, tokens and seconds summed over all modes.
+        """
+        with self._lock:
+            return {key: sum(totals[key] for totals in self._totals.values())
+                    for key in ("calls", "tokens", "seconds")}
+
+    def stats(self):
+        with self._lock:
+            report = {"unchanged": self.unchanged, "fallbacks": self.fallbacks}
+            for mode, totals in self._totals.items():
+                calls = totals["calls"]
+                report[mode] = {
+                    "calls": calls,
+                    "avg_tokens": round(totals["tokens"] / calls, 1) if calls else None,
+                    "avg_prompt_tokens": round(totals["prompt_tokens"] / calls, 1) if calls else None,
+                    "avg_seconds": round(totals["seconds"] / calls, 3) if calls else None,
+                }
+        return report
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from change_detection import hamming
+
+def prompt_hash(prompt):
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:16]
+
+class DescriptionCache:
+    """
+    Remembers VLM descriptions of scenes seen before.
+
+    Entries are keyed by the perceptual hash of the frame plus the model ID
+    and a hash of the prompt. A lookup matches the closest stored hash within
+    `radius` bits (Hamming distance), so returning to a known scene such as an
+    empty room reuses its description instead of calling the VLM.
+    Least recently used entries are evicted beyond max_entries, and entries
+    older than ttl seconds are ignored. With a path, entries are saved to a
+    JSON file and reloaded on the next start.
+
+    The 64-bit hash of a 64x64 thumbnail is blind to small local changes: a
+    person in a corner of a large frame can move it by only a couple of
+    bits. The cache is therefore off by default and only safe behind a
+    change gate that also looks at the whole frame; with ROI or ignore masks
+    or event-mode bursts, a gated change may be answered from the cache.
+    """
+
+    def __init__(self, max_entries=256, radius=4, ttl=None, path=None):
+        self.max_entries = max_entries
+        self.radius = radius
+        self.ttl = ttl
+        self.path = path
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable description cache {self.path}: {e}")
+            return
+        for entry in entries[-self.max_entries:]:
+            self._entries[(entry["hash"], entry["model"], entry["prompt"])] = entry
+        print(f"Loaded {len(self._entries)} cached description(s) from {self.path}")
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(self._entries.values()), f)
+        os.replace(tmp_path, self.path)
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry["created"] > self.ttl
+
+    def lookup(self, image_hash, model_id, prompt):
+        """
+        Returns (description, distance) for the closest match, or (None, None).
+        """
+        key_prompt = prompt_hash(prompt)
+        now = time.time()
+        best_key = None
+        best_distance = None
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry["model"] != model_id or entry["prompt"] != key_prompt or self._expired(entry, now):
+                    continue
+                distance = hamming(image_hash, entry["hash"])
+                if distance <= self.radius and (best_distance is None or distance < best_distance):
+                    best_key, best_distance = key, distance
+                    if distance == 0:
+                        break
+            if best_key is None:
+                self.misses += 1
+                return None, None
+            self._entries.move_to_end(best_key)
+            entry = self._entries[best_key]
+            self.hits += 1
+            self.saved_seconds += entry["latency"]
+            return entry["description"], best_distance
+
+    def store(self, image_hash, model_id, prompt, description, latency=0.0):
+        key = (image_hash, model_id, prompt_hash(prompt))
+        with self._lock:
+            self._entries[key] = {
+                "hash": image_hash,
+                "model": model_id,
+                "prompt": key[2],
+                "description": description,
+                "latency": latency,
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            now = time.time()
+            for old_key in [k for k, e in self._entries.items() if self._expired(e, now)]:
+                del self._entries[old_key]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.path:
+                self._save()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 2),
+        }
@@ -0,0 +1,160 @@
+import threading
+
+import cv2
+import numpy as np
+
+import metrics
+from camera import resize_for_vlm
+from change_detection import create_detector
+from image_utils import Frame
+
+def sharpness(gray):
+    """
+    Variance of the Laplacian: high for crisp edges, low for blurred frames.
+    """
+    return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+def exposure(gray, dark=8, bright=247):
+    """
+    Returns 0-1, where 1 is a mid-grey mean with no clipped pixels.
+    Under- or overexposed frames and frames with large clipped areas score low.
+    """
+    mean = float(gray.mean())
+    clipped = (np.count_nonzero(gray <= dark) + np.count_nonzero(gray >= bright)) / gray.size
+    return max(0.0, 1.0 - abs(mean - 128.0) / 128.0) * (1.0 - clipped)
+
+def frame_quality(image, max_dim=480):
+    """
+    Scores a frame for VLM input: sharpness weighted by exposure.
+    Computed on a downscaled grayscale copy so a burst is scored in a few milliseconds.
+    """
+    height, width = image.shape[:2]
+    scale = max_dim / max(height, width)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return sharpness(gray) * exposure(gray)
+
+def pick_best_frame(burst):
+    """
+    Returns (index, quality) of the best (image, timestamp) pair in a burst.
+    """
+    qualities = [frame_quality(image) for image, _ in burst]
+    index = int(np.argmax(qualities))
+    return index, qualities[index]
+
+class MotionWatcher:
+    """
+    Watches one camera at its full frame rate for motion, between the
+    periodic captures of the main loop.
+
+    Every frame from the session is reduced to the detector's small grayscale
+    thumbnail and compared with a running background model, which costs well
+    under a millisecond. Motion in trigger_frames consecutive frames starts a
+    burst of up to burst_frames frames over burst_seconds; the sharpest,
+    best-exposed one is handed to on_event(frame, score) for analysis. After
+    an event the watcher stays quiet for cooldown seconds, so continuous
+    motion produces at most one frame per cooldown.
+    """
+
+    def __init__(self, session, on_event, camera_id=0, threshold=1.0, trigger_frames=2,
+                 burst_frames=5, burst_seconds=0.5, cooldown=5.0, detector=None, max_dim=1024):
+        self.session = session
+        self.on_event = on_event
+        self.camera_id = camera_id
+        self.threshold = threshold
+        self.trigger_frames = max(1, trigger_frames)
+        self.burst_frames = max(1, burst_frames)
+        self.burst_seconds = burst_seconds
+        self.cooldown = cooldown
+        self.detector = detector or create_detector("background")
+        self.max_dim = max_dim
+
+        self.frames_watched = 0
+        self.events = 0
+        self.last_quality = None
+
+        self._streak = 0
+        self._quiet_until = None
+        self._burst = None
+        self._burst_end = 0.0
+        self._trigger_score = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"motion-cam{self.camera_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        seq = 0
+        while not self._stop_event.is_set():
+            image, timestamp, seq = self.session.read_next(seq, timeout=1.0)
+            if image is None:
+                continue
+            event = self.process(image, timestamp)
+            if event is not None:
+                try:
+                    self.on_event(*event)
+                except Exception as e:
+                    print(f"[cam{self.camera_id}] Motion event handler failed: {e}")
+
+    def process(self, image, timestamp):
+        """
+        Feeds one camera frame. Returns (frame, score) when a burst completes,
+        otherwise None. The frame is resized for the VLM like a periodic capture.
+        """
+        self.frames_watched += 1
+        score = self.detector.update(image)
+        if self._burst is not None:
+            self._burst.append((image, timestamp))
+            if len(self._burst) >= self.burst_frames or timestamp >= self._burst_end:
+                return self._finish()
+            return None
+
+        if score == float("inf") or score < self.threshold:
+            self._streak = 0
+            return None
+        self._streak += 1
+        if self._streak < self.trigger_frames:
+            return None
+        if self._quiet_until is not None and timestamp < self._quiet_until:
+            return None
+
+        self._streak = 0
+        self._trigger_score = score
+        self._burst = [(image, timestamp)]
+        self._burst_end = timestamp + self.burst_seconds
+        if self.burst_frames == 1:
+            return self._finish()
+        return None
+
+    def _finish(self):
+        burst, self._burst = self._burst, None
+        index, self.last_quality = pick_best_frame(burst)
+        image, timestamp = burst[index]
+        self._quiet_until = burst[-1][1] + self.cooldown
+        self.events += 1
+        metrics.MOTION_EVENTS.inc()
+        metrics.BURST_SECONDS.observe(timestamp - burst[0][1])
+        print(f"[cam{self.camera_id}] Motion {self._trigger_score:.2f}: picked frame {index + 1}/{len(burst)} "
+              f"(quality {self.last_quality:.1f})")
+        image = resize_for_vlm(image, self.max_dim, pool=getattr(self.session, "pool", None))
+        return Frame(image, timestamp=timestamp), self._trigger_score
+
+    def stats(self):
+        return {
+            "frames_watched": self.frames_watched,
+            "events": self.events,
+        }
@@ -0,0 +1,354 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+SECTION_RE = re.compile(r"^\W*(?:\d+\.\s*)?(environment|objects|people)\W*$", re.IGNORECASE)
+FIELD_RE = re.compile(r"^\W*(traits|appearance|action(?:\s*/\s*state)?)\W*:\s*(.*)$", re.IGNORECASE)
+NO_PEOPLE_RE = re.compile(r"\bno (?:people|persons?|one)\b", re.IGNORECASE)
+
+def _strip_item(line):
+    return re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip().strip("*").strip()
+
+def parse_description(text):
+    """
+    Parses the analyzer's fixed '**1. Environment** / **2. Objects** /
+    **3. People**' layout into a dict:
+    {"environment": str, "objects": [str], "people": [{"traits", "appearance", "action"}]}.
+    Text that does not follow the layout ends up in "environment".
+    """
+    sections = {"environment": [], "objects": [], "people": []}
+    current = None
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        match = SECTION_RE.match(line.strip())
+        if match:
+            current = match.group(1).lower()
+            continue
+        sections[current or "environment"].append(line)
+
+    objects = []
+    for line in sections["objects"]:
+        item = _strip_item(line)
+        # "desk, chair, lamp" on one bullet is common for small models
+        objects.extend(part.strip() for part in item.split(",") if part.strip())
+
+    people = []
+    for line in sections["people"]:
+        match = FIELD_RE.match(line.strip())
+        if not match:
+            continue
+        field = match.group(1).lower().split("/")[0].strip()
+        value = match.group(2).strip()
+        if field == "traits" or not people or field in people[-1]:
+            people.append({})
+        people[-1][field] = value
+    if not people and sections["people"] and not NO_PEOPLE_RE.search(" ".join(sections["people"])):
+        # People listed without the per-field layout still count as present
+        people = [{"traits": _strip_item(line)} for line in sections["people"] if _strip_item(line)]
+
+    return {
+        "environment": " ".join(_strip_item(line) for line in sections["environment"]).strip(),
+        "objects": objects,
+        "people": people,
+    }
+
+def _epoch(timestamp):
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    return datetime.fromisoformat(timestamp).timestamp()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    record_id TEXT UNIQUE,
+    ts REAL NOT NULL,
+    camera_id INTEGER,
+    image_path TEXT,
+    environment TEXT,
+    objects TEXT,
+    people_count INTEGER NOT NULL,
+    status TEXT,
+    error TEXT,
+    raw TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS idx_events_camera_ts ON events (camera_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_person_ts ON events (ts) WHERE people_count > 0;
+CREATE TABLE IF NOT EXISTS people (
+    event_id INTEGER NOT NULL REFERENCES events (id) ON DELETE CASCADE,
+    ts REAL NOT NULL,
+    camera_id INTEGER,
+    traits TEXT,
+    appearance TEXT,
+    action TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_people_event ON people (event_id);
+CREATE INDEX IF NOT EXISTS idx_people_ts ON people (ts);
+CREATE TABLE IF NOT EXISTS objects (
+    event_id INTEGER NOT NULL REFERENCES events (id) ON DELETE CASCADE,
+    ts REAL NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_objects_event ON objects (event_id);
+CREATE INDEX IF NOT EXISTS idx_objects_name_ts ON objects (name, ts);
+"""
+
+class EventStore:
+    """
+    Structured, indexed record of every analysis, in an embedded SQLite file.
+
+    Descriptions are parsed into environment, objects and people. Writes are
+    buffered and committed by a background thread in one transaction per
+    batch_size records or flush_interval seconds, whichever comes first.
+    Every rotate_interval seconds, events older than max_age seconds (or
+    beyond max_rows) are deleted and the freed pages are vacuumed.
+    """
+
+    def __init__(self, path="events.db", batch_size=50, flush_interval=1.0,
+                 max_age=None, max_rows=None, rotate_interval=3600.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_age = max_age
+        self.max_rows = max_rows
+        self.rotate_interval = rotate_interval
+
+        self.written = 0
+        self.rotated = 0
+        self.commits = 0
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db_lock = threading.Lock()
+        with self._db_lock:
+            # auto_vacuum only takes effect before the first table is created
+            self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("PRAGMA synchronous = NORMAL")
+            self._db.execute("PRAGMA foreign_keys = ON")
+            self._db.executescript(SCHEMA)
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._last_rotate = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="event-store", daemon=True)
+        self._thread.start()
+
+    def add(self, text, timestamp=None, camera_id=None, image_path=None, record_id=None, status=None):
+        """
+        Queues one description for storage. Returns immediately.
+        """
+        self._queue(("add", {
+            "record_id": record_id,
+            "ts": _epoch(timestamp),
+            "camera_id": camera_id,
+            "image_path": image_path,
+            "text": text,
+            "status": status,
+        }))
+
+    def set_status(self, record_ids, status, error=None):
+        """
+        Queues a delivery status update ("sent", "error", ...) for stored records.
+        """
+        self._queue(("status", (status, error, list(record_ids))))
+
+    def _queue(self, op):
+        with self._cond:
+            self._pending.append(op)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def _write(self, ops):
+        with self._db_lock:
+            with self._db:
+                for kind, data in ops:
+                    if kind == "add":
+                        parsed = parse_description(data["text"] or "")
+                        cursor = self._db.execute(
+                            "INSERT OR IGNORE INTO events (record_id, ts, camera_id, image_path, environment,"
+                            " objects, people_count, status, raw) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (data["record_id"], data["ts"], data["camera_id"], data["image_path"],
+                             parsed["environment"], json.dumps(parsed["objects"]), len(parsed["people"]),
+                             data["status"], data["text"]))
+                        if not cursor.rowcount:
+                            # Already stored (e.g. a record replayed after a restart)
+                            continue
+                        event_id = cursor.lastrowid
+                        self._db.executemany(
+                            "INSERT INTO people (event_id, ts, camera_id, traits, appearance, action)"
+                            " VALUES (?, ?, ?, ?, ?, ?)",
+                            [(event_id, data["ts"], data["camera_id"], p.get("traits"), p.get("appearance"),
+                              p.get("action")) for p in parsed["people"]])
+                        self._db.executemany(
+                            "INSERT INTO objects (event_id, ts, name) VALUES (?, ?, ?)",
+                            [(event_id, data["ts"], name.lower()) for name in parsed["objects"]])
+                        self.written += 1
+                    else:
+                        status, error, record_ids = data
+                        self._db.executemany(
+                            "UPDATE events SET status = ?, error = ? WHERE record_id = ?",
+                            [(status, error, record_id) for record_id in record_ids])
+            self.commits += 1
+
+    def flush(self):
+        """
+        Commits everything queued so far.
+        """
+        with self._cond:
+            ops = self._pending
+            self._pending = []
+        if ops:
+            self._write(ops)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pending) >= self.batch_size
+                                    or self._stop_event.is_set(), self.flush_interval)
+            try:
+                self.flush()
+                if time.monotonic() - self._last_rotate >= self.rotate_interval:
+                    self._last_rotate = time.monotonic()
+                    self.rotate()
+            except sqlite3.Error as e:
+                print(f"Event store write failed: {e}")
+
+    def rotate(self, now=None):
+        """
+        Deletes events older than max_age and beyond max_rows, then returns the
+        freed pages to the filesystem. Returns the number of events deleted.
+        """
+        if self.max_age is None and self.max_rows is None:
+            return 0
+        now = time.time() if now is None else now
+        deleted = 0
+        with self._db_lock:
+            with self._db:
+                if self.max_age is not None:
+                    deleted += self._db.execute("DELETE FROM events WHERE ts < ?", (now - self.max_age,)).rowcount
+                if self.max_rows is not None:
+                    deleted += self._db.execute(
+                        "DELETE FROM events WHERE id IN (SELECT id FROM events ORDER BY ts DESC LIMIT -1 OFFSET ?)",
+                        (self.max_rows,)).rowcount
+            if deleted:
+                # execute() would step the pragma once and free a single page;
+                # executescript() runs it to completion
+                self._db.executescript("PRAGMA incremental_vacuum;")
+                self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.rotated += deleted
+        return deleted
+
+    def _rows(self, sql, params):
+        with self._db_lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def query(self, start=None, end=None, camera_id=None, person=None, obj=None, attribute=None, limit=100):
+        """
+        Returns events (newest first) filtered by time range, camera, whether
+        people were present, an object name, or a substring of any person's
+        traits, appearance or action. Each event includes its "people" list.
+        """
+        where, params = [], []
+        if start is not None:
+            where.append("e.ts >= ?")
+            params.append(_epoch(start))
+        if end is not None:
+            where.append("e.ts < ?")
+            params.append(_epoch(end))
+        if camera_id is not None:
+            where.append("e.camera_id = ?")
+            params.append(camera_id)
+        if person is not None:
+            where.append("e.people_count > 0" if person else "e.people_count = 0")
+        if obj is not None:
+            where.append("e.id IN (SELECT event_id FROM objects WHERE name LIKE ?)")
+            params.append(f"%{obj.lower()}%")
+        if attribute is not None:
+            where.append("e.id IN (SELECT event_id FROM people WHERE traits LIKE ? OR appearance LIKE ? OR action LIKE ?)")
+            params.extend([f"%{attribute}%"] * 3)
+        sql = "SELECT e.* FROM events e"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY e.ts DESC LIMIT ?"
+        params.append(limit)
+        events = self._rows(sql, params)
+        if events:
+            ids = [event["id"] for event in events]
+            people = self._rows(f"SELECT * FROM people WHERE event_id IN ({','.join('?' * len(ids))})", ids)
+            by_event = {}
+            for person_row in people:
+                by_event.setdefault(person_row["event_id"], []).append(
+                    {k: person_row[k] for k in ("traits", "appearance", "action")})
+            for event in events:
+                event["objects"] = json.loads(event["objects"] or "[]")
+                event["people"] = by_event.get(event["id"], [])
+        return events
+
+    def last_seen_person(self, camera_id=None, attribute=None):
+        """
+        Returns the most recent event with a person (optionally matching an
+        attribute substring), or None.
+        """
+        events = self.query(camera_id=camera_id, person=True, attribute=attribute, limit=1)
+        return events[0] if events else None
+
+    def count(self):
+        return self._rows("SELECT COUNT(*) AS n FROM events", ())[0]["n"]
+
+    def close(self):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._db.close()
+
+def query_main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py events", description="Query the local event store")
+    parser.add_argument("--db", type=str, default="events.db", help="Event store file")
+    parser.add_argument("--since", type=str, default=None, help="Start time (ISO format, or seconds ago like '3600s')")
+    parser.add_argument("--until", type=str, default=None, help="End time (ISO format)")
+    parser.add_argument("--camera", type=int, default=None, help="Only this camera")
+    parser.add_argument("--person", action="store_true", help="Only events with people")
+    parser.add_argument("--object", type=str, default=None, help="Only events listing this object")
+    parser.add_argument("--attribute", type=str, default=None, help="Only events with a person matching this text")
+    parser.add_argument("--last-person", action="store_true", help="Show when a person was last seen")
+    parser.add_argument("--limit", type=int, default=20, help="Max events to show")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No event store at {args.db}")
+        return
+    since = args.since
+    if since and since.endswith("s") and since[:-1].replace(".", "", 1).isdigit():
+        since = time.time() - float(since[:-1])
+
+    store = EventStore(args.db)
+    try:
+        if args.last_person:
+            events = [e for e in [store.last_seen_person(args.camera, args.attribute)] if e]
+        else:
+            events = store.query(start=since, end=args.until, camera_id=args.camera,
+                                 person=True if args.person else None, obj=args.object,
+                                 attribute=args.attribute, limit=args.limit)
+        for event in events:
+            when = datetime.fromtimestamp(event["ts"]).isoformat(timespec="seconds")
+            print(f"{when} [cam{event['camera_id']}] people={event['people_count']} "
+                  f"objects={', '.join(event['objects'])} | {event['environment']}")
+            for person in event["people"]:
+                print(f"    - {person['traits']} | {person['appearance']} | {person['action']}")
+        if not events:
+            print("No matching events")
+    finally:
+        store.close()
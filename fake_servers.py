@@ -0,0 +1,204 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _IngestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server.owner
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        time.sleep(server.latency)
+        with server.lock:
+            server.connections.add(self.client_address)
+            fail = server.fail_next > 0 or server.random.random() < server.failure_rate
+            if server.fail_next > 0:
+                server.fail_next -= 1
+            if not fail:
+                server.received.append(json.loads(body))
+        if fail:
+            self.send_response(503)
+            self.send_header("Content-Length", "11")
+            self.end_headers()
+            self.wfile.write(b"unavailable")
+            return
+        response = json.dumps({"ok": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeIngestServer:
+    """
+    Local stand-in for the workflow API behind API_URI.
+    Records every accepted JSON body. Each request takes `latency` seconds,
+    and answers 503 to the next `fail_next` requests and to a random
+    `failure_rate` fraction of the rest.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, seed=0):
+        self.received = []
+        self.connections = set()
+        self.fail_next = 0
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _IngestHandler)
+        self._httpd.owner = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/workflows/processTextWorkflow/start-async"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    # HTTP/1.0: the streamed body ends when the connection closes
+    protocol_version = "HTTP/1.0"
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server.owner
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with server.lock:
+            server.requests.append((self.path, body))
+
+        if self.path == "/api/generate":
+            # Warm-up request: "load" the model
+            time.sleep(server.load_delay)
+            with server.lock:
+                server.loaded[body.get("model")] = body.get("keep_alive")
+            self._send_json({"model": body.get("model"), "response": "", "done": True})
+            return
+
+        if self.path != "/api/chat":
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        with server.lock:
+            fail = server.fail_next > 0 or server.random.random() < server.failure_rate
+            if server.fail_next > 0:
+                server.fail_next -= 1
+        if fail:
+            self._send_json({"error": "simulated failure"}, status=500)
+            return
+
+        time.sleep(server.first_token_delay)
+        tokens = server.reply_for(body).split(" ")
+        if not body.get("stream", True):
+            time.sleep(server.token_delay * len(tokens))
+            self._send_json({"model": body.get("model"), "done": True,
+                             "message": {"role": "assistant", "content": " ".join(tokens)},
+                             "eval_count": len(tokens)})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for i, token in enumerate(tokens):
+                text = token if i == 0 else " " + token
+                chunk = {"model": body.get("model"), "done": False,
+                         "message": {"role": "assistant", "content": text}}
+                self.wfile.write((json.dumps(chunk) + "\n").encode())
+                self.wfile.flush()
+                time.sleep(server.token_delay)
+            final = {"model": body.get("model"), "done": True,
+                     "message": {"role": "assistant", "content": ""},
+                     "eval_count": len(tokens), "prompt_eval_count": 1}
+            self.wfile.write((json.dumps(final) + "\n").encode())
+            with server.lock:
+                server.completed += 1
+        except (BrokenPipeError, ConnectionResetError):
+            with server.lock:
+                server.cancelled += 1
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeOllamaServer:
+    """
+    Local stand-in for an Ollama server.
+    /api/generate simulates a model load taking load_delay seconds.
+    /api/chat streams `reply` word by word after first_token_delay, with
+    token_delay between words, and fails the next `fail_next` chats and a
+    random `failure_rate` fraction of the rest with a 500. `reply` may be a
+    callable taking the request body.
+    """
+
+    def __init__(self, reply="**1. Environment**\n- An empty room.", first_token_delay=0.0,
+                 token_delay=0.0, load_delay=0.0, failure_rate=0.0, seed=0, host="127.0.0.1", port=0):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.load_delay = load_delay
+        self.failure_rate = failure_rate
+        self.fail_next = 0
+        self.random = random.Random(seed)
+        self.requests = []
+        self.loaded = {}
+        self.completed = 0
+        self.cancelled = 0
+        self.lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _OllamaHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.owner = self
+        self._thread = None
+
+    def reply_for(self, body):
+        return self.reply(body) if callable(self.reply) else self.reply
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def chat_requests(self):
+        with self.lock:
+            return [body for path, body in self.requests if path == "/api/chat"]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -1,6 +1,150 @@
 import cv2
 import numpy as np
 import os
+import sys
+import threading
+import time
+
+class Frame:
+    """
+    A captured frame carried in memory through diff, analysis and posting.
+
+    The downscaled grayscale thumbnail used for change detection and the JPEG
+    encoding sent to the VLM are each computed once and cached, so a frame is
+    never re-read from disk or re-encoded within a cycle.
+    """
+
+    def __init__(self, image, timestamp=None, path=None, jpeg_quality=95):
+        self.image = image
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.path = path
+        self.jpeg_quality = jpeg_quality
+        self._jpeg = None
+        self._thumbnails = {}
+
+    @classmethod
+    def from_file(cls, filepath):
+        """
+        Loads a frame from disk. Returns None if it cannot be decoded.
+        The file bytes are kept as the cached JPEG so they are not re-encoded.
+        """
+        try:
+            with open(filepath, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        return cls.from_bytes(data, timestamp=os.path.getmtime(filepath), path=filepath,
+                              is_jpeg=filepath.lower().endswith((".jpg", ".jpeg")))
+
+    @classmethod
+    def from_bytes(cls, data, timestamp=None, path=None, is_jpeg=True):
+        """
+        Decodes an encoded image held in memory. Returns None if it cannot be decoded.
+        """
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        frame = cls(image, timestamp=timestamp, path=path)
+        if is_jpeg:
+            frame._jpeg = bytes(data)
+        return frame
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def thumbnail(self, size=(64, 64)):
+        """
+        Returns the grayscale thumbnail of the given size, computing it once.
+        """
+        thumb = self._thumbnails.get(size)
+        if thumb is None:
+            small = cv2.resize(self.image, size)
+            thumb = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            self._thumbnails[size] = thumb
+        return thumb
+
+    def jpeg(self):
+        """
+        Returns the JPEG-encoded bytes of the frame, encoding it once.
+        """
+        if self._jpeg is None:
+            ok, buf = cv2.imencode(".jpg", self.image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise ValueError("Failed to encode frame as JPEG")
+            self._jpeg = buf.tobytes()
+        return self._jpeg
+
+    def save(self, filepath):
+        """
+        Writes the cached JPEG bytes to disk for archival and remembers the path.
+        """
+        directory = os.path.dirname(filepath)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(filepath, "wb") as f:
+            f.write(self.jpeg())
+        self.path = filepath
+        return filepath
+
+class FramePool:
+    """
+    Reuses preallocated image buffers so the capture and downscale hot path
+    does not allocate a fresh array for every frame.
+
+    acquire(shape) returns a buffer of that shape that nothing outside the
+    pool references any more: frames still held by a queue, a Frame or a view
+    are never handed out again. When every pooled buffer is in use a new one
+    is allocated, and kept for reuse while the pool holds fewer than size
+    buffers of that shape. Pass the buffer as the dst of an OpenCV call (or
+    to VideoCapture.read) and use the array that call returns.
+    """
+
+    def __init__(self, size=8, dtype=np.uint8):
+        self.size = size
+        self.dtype = dtype
+        self.reused = 0
+        self.allocated = 0
+        self._buffers = {}
+        self._lock = threading.Lock()
+        # References a buffer has when only the pool holds it
+        self._free_refs = self._refcounts([np.empty(1, dtype=dtype)])[0]
+
+    @staticmethod
+    def _refcounts(buffers):
+        return [sys.getrefcount(buffer) for buffer in buffers]
+
+    def acquire(self, shape):
+        shape = tuple(shape)
+        with self._lock:
+            buffers = self._buffers.setdefault(shape, [])
+            for index, refs in enumerate(self._refcounts(buffers)):
+                if refs <= self._free_refs:
+                    self.reused += 1
+                    return buffers[index]
+            buffer = np.empty(shape, dtype=self.dtype)
+            self.allocated += 1
+            if len(buffers) < self.size:
+                buffers.append(buffer)
+            return buffer
+
+    def stats(self):
+        with self._lock:
+            pooled = sum(len(buffers) for buffers in self._buffers.values())
+            nbytes = sum(buffer.nbytes for buffers in self._buffers.values() for buffer in buffers)
+        return {"reused": self.reused, "allocated": self.allocated, "pooled": pooled, "pooled_bytes": nbytes}
+
+def calculate_frame_difference(frame1, frame2, resize_dim=(64, 64)):
+    """
+    Same metric as calculate_image_difference, but on in-memory Frames.
+    Uses each frame's cached thumbnail, so the previous frame is not decoded again.
+    """
+    try:
+        diff = cv2.absdiff(frame1.thumbnail(resize_dim), frame2.thumbnail(resize_dim))
+        return float(np.mean(diff))
+    except Exception as e:
+        print(f"Error calculating image difference: {e}")
+        return float('inf')
 
 def calculate_image_difference(image_path1, image_path2, resize_dim=(64, 64)):
     """
@@ -17,33 +161,14 @@ def calculate_image_difference(image_path1, image_path2, resize_dim=(64, 64)):
         print(f"One of the images does not exist: {image_path1}, {image_path2}")
         return float('inf')
 
-    try:
-        img1 = cv2.imread(image_path1)
-        img2 = cv2.imread(image_path2)
-        
-        if img1 is None or img2 is None:
-            return float('inf')
-            
-        # Resize to normalize comparisons and speed up
-        img1_small = cv2.resize(img1, resize_dim)
-        img2_small = cv2.resize(img2, resize_dim)
-        
-        # Convert to grayscale
-        gray1 = cv2.cvtColor(img1_small, cv2.COLOR_BGR2GRAY)
-        gray2 = cv2.cvtColor(img2_small, cv2.COLOR_BGR2GRAY)
-        
-        # Calculate absolute difference
-        diff = cv2.absdiff(gray1, gray2)
-        
-        # Calculate mean score (0-255)
-        score = np.mean(diff)
-        
-        return score
-        
-    except Exception as e:
-        print(f"Error calculating image difference: {e}")
+    frame1 = Frame.from_file(image_path1)
+    frame2 = Frame.from_file(image_path2)
+
+    if frame1 is None or frame2 is None:
         return float('inf')
 
+    return calculate_frame_difference(frame1, frame2, resize_dim)
+
 if __name__ == "__main__":
     # Simple test
     import sys
@@ -1,10 +1,32 @@
 import time
+_STARTED = time.monotonic()
 import argparse
+import itertools
 import os
-from camera import capture_image
+import socket
+import sys
+import threading
+import metrics
+from camera import capture_frame, BackendCache, CameraSession, parse_camera_spec
 from analyzer import ImageAnalyzer
-from poster import post_content
-from image_utils import calculate_image_difference
+from ollama_backend import OllamaBackend
+from preprocess import Preprocessor, MODEL_PROFILES, profile_for_model
+from poster import Poster
+from change_detection import create_detector, DETECTORS
+from pipeline import Pipeline, FrameJob
+from scheduler import AnalysisScheduler
+from capture_scheduler import CaptureScheduler
+from retention import RetentionManager, capture_filename
+from storage import SegmentStore
+from description_cache import DescriptionCache
+from event_store import EventStore
+from event_capture import MotionWatcher
+from delta_prompt import IncrementalAnalyzer
+from regions import RegionAnalyzer, RegionExtractor
+from image_utils import FramePool
+from work_queue import QueueClient, make_job
+from dedupe import DescriptionDeduper
+from cascade import Cascade
 
 def cleanup_old_images(directory, retention_seconds):
     """
@@ -31,76 +53,551 @@ def cleanup_old_images(directory, retention_seconds):
             except Exception:
                 pass
 
-def main():
-    parser = argparse.ArgumentParser(description="Semantic Camera VLM")
-    parser.add_argument("--interval", type=int, default=3, help="Interval in seconds between captures")
-    parser.add_argument("--output_dir", type=str, default="captures", help="Directory to save captured images")
+def add_vlm_arguments(parser):
+    """
+    Adds the model, Ollama and image preprocessing options shared by live and replay mode.
+    """
     parser.add_argument("--model", type=str, default="llava-phi3:3.8b", help="Model ID to use (Ollama)")
     parser.add_argument("--device", type=str, default=None, help="Device to run model on (cpu, cuda, mps)")
+    parser.add_argument("--ollama-host", type=str, default=None, help="Ollama server URL (default: OLLAMA_HOST or localhost)")
+    parser.add_argument("--keep-alive", type=str, default="30m", help="How long Ollama keeps the model loaded between requests")
+    parser.add_argument("--vlm-deadline", type=float, default=120.0, help="Hard limit in seconds for one VLM request")
+    parser.add_argument("--analyze-workers", type=int, default=1, help="Concurrent VLM requests in flight")
+    parser.add_argument("--profile", type=str, default=None, choices=list(MODEL_PROFILES),
+                        help="Image preprocessing profile for the VLM (default: chosen from --model)")
+    parser.add_argument("--vlm-format", type=str, default=None, choices=list(Preprocessor.ENCODINGS),
+                        help="Encoding of images sent to the VLM (default: from the profile)")
+    parser.add_argument("--vlm-quality", type=int, default=None, help="Encode quality of images sent to the VLM")
+    parser.add_argument("--crop", type=str, default=None,
+                        help="Only send this region to the VLM: 'x,y,w,h' as fractions of the frame")
+
+def build_analyzer(args, cache=None, model=None):
+    """
+    Creates the preprocessor, Ollama backend and analyzer described by args,
+    for model instead of --model if given (then --profile does not apply).
+    Returns (analyzer, preprocessor).
+    """
+    if model is None or model == args.model:
+        model = args.model
+        profile = MODEL_PROFILES[args.profile] if args.profile else profile_for_model(model)
+    else:
+        profile = profile_for_model(model)
+    preprocessor = Preprocessor(profile, crop=args.crop, fmt=args.vlm_format, quality=args.vlm_quality)
+    print(f"VLM preprocessing ({model}): {profile}")
+    backend = OllamaBackend(model, host=args.ollama_host, keep_alive=args.keep_alive,
+                            deadline=args.vlm_deadline, max_in_flight=args.analyze_workers)
+    analyzer = ImageAnalyzer(model_id=model, device=args.device, cache=cache, backend=backend,
+                             preprocessor=preprocessor)
+    return analyzer, preprocessor
+
+def gate_frame(job, threshold, cascade=None, store=None):
+    """
+    Decides whether a scored job goes on to analysis: its diff score must
+    reach threshold, and the cascade (if any) must not skip it; job.tier is
+    set from the cascade. With a SegmentStore, the frame is archived, in full
+    resolution only if it goes on. Returns the job, or None to skip it.
+    """
+    passed = job.score >= threshold
+    if not passed:
+        metrics.FRAMES_SKIPPED.inc()
+        print("Change is below threshold. Skipping analysis.")
+        if cascade is not None:
+            # Keeps the cascade's background model current
+            cascade.observe(job.frame, camera_id=job.camera_id)
+    elif cascade is not None:
+        job.tier = cascade.route(job.frame, camera_id=job.camera_id)
+        if job.tier == Cascade.SKIP:
+            metrics.CASCADE_SKIPPED.inc()
+            print(f"[cam{job.camera_id}] Cascade found no foreground. Skipping analysis.")
+            passed = False
+        else:
+            if job.tier == Cascade.LARGE:
+                metrics.CASCADE_ESCALATED.inc()
+            print(f"[cam{job.camera_id}] Cascade tier: {job.tier}")
+    if store is not None:
+        # Full resolution is only kept for frames that go on to analysis
+        job.frame.path = store.put(job.frame, keyframe=passed)
+    return job if passed else None
+
+def main():
+    startup = metrics.StartupTimer(start=_STARTED)
+    startup.mark("imports")
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        # Offline reprocessing of archived captures or a video file
+        from replay import replay_main
+        return replay_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "events":
+        # Queries over the local event store
+        from event_store import query_main
+        return query_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "queue":
+        # Work queue between edge nodes (--queue-url) and analysis workers
+        from work_queue import queue_main
+        return queue_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        # Shared VLM worker pulling frames from the work queue
+        from worker import worker_main
+        return worker_main(sys.argv[2:])
+
+    parser = argparse.ArgumentParser(description="Semantic Camera VLM",
+                                     epilog="Run 'main.py replay --help' to reprocess archived captures or a video file, "
+                                            "'main.py events --help' to query past events, "
+                                            "'main.py queue --help' and 'main.py worker --help' for a shared VLM "
+                                            "worker pool fed by edge nodes (--queue-url).")
+    parser.add_argument("--interval", type=float, default=3, help="Interval in seconds between captures")
+    parser.add_argument("--min-interval", type=float, default=None,
+                        help="Fastest capture interval, used while changes are detected (default: min(interval, 1))")
+    parser.add_argument("--max-interval", type=float, default=None,
+                        help="Slowest capture interval, reached on static scenes (default: max(interval, 30))")
+    parser.add_argument("--idle-after", type=float, default=30.0,
+                        help="Seconds without changes before capture slows toward --max-interval")
+    parser.add_argument("--mode", type=str, default="interval", choices=["interval", "event"],
+                        help="interval: periodic captures only. event: also watch every camera frame for motion "
+                             "and analyze the best frame of a short burst right away")
+    parser.add_argument("--motion-threshold", type=float, default=1.0,
+                        help="With --mode event, %% of the watched area that must move to trigger a burst")
+    parser.add_argument("--burst-frames", type=int, default=5, help="With --mode event, frames per motion burst")
+    parser.add_argument("--burst-seconds", type=float, default=0.5, help="With --mode event, max duration of a burst")
+    parser.add_argument("--event-cooldown", type=float, default=5.0,
+                        help="With --mode event, min seconds between motion events of one camera")
+    parser.add_argument("--output_dir", type=str, default="captures", help="Directory to save captured images")
+    add_vlm_arguments(parser)
     parser.add_argument("--retention", type=int, default=48*3600, help="Image retention period in seconds (default: 48 hours)")
     parser.add_argument("--diff-threshold", type=float, default=10.0, help="Difference threshold to skip analysis (lower = more sensitive)")
+    parser.add_argument("--detector", type=str, default="mean", choices=list(DETECTORS),
+                        help="Change detector: mean (0-255), background (%% foreground), tile (0-255), ssim (0-100), phash (0-64 bits)")
+    parser.add_argument("--roi", type=str, action="append", default=None,
+                        help="Region to watch: mask image path or 'x,y,w,h;...' as fractions of the frame. "
+                             "Repeat once per camera for per-camera regions")
+    parser.add_argument("--ignore", type=str, action="append", default=None,
+                        help="Region to ignore: mask image path or 'x,y,w,h;...' as fractions of the frame. "
+                             "Repeat once per camera for per-camera regions")
+    parser.add_argument("--cameras", type=str, default="0",
+                        help="Cameras to capture from, e.g. '0,1' or 'sensor:device' pairs like '0:0,1:2'")
+    parser.add_argument("--camera-cache", type=str, default="camera_backend.json",
+                        help="File remembering which backend opened each camera, so restarts skip the probe "
+                             "('' = always probe)")
+    parser.add_argument("--frame-pool", type=int, default=8,
+                        help="Reusable frame buffers per camera and frame size for capture and downscaling "
+                             "(0 = allocate every frame)")
+    parser.add_argument("--schedule", type=str, default="round-robin", choices=list(AnalysisScheduler.POLICIES),
+                        help="How cameras share the analyzer")
+    parser.add_argument("--min-camera-interval", type=float, default=60.0,
+                        help="With --schedule min-rate, max seconds a changed camera waits for analysis")
+    parser.add_argument("--queue-size", type=int, default=1, help="Max frames waiting for analysis before load shedding")
+    parser.add_argument("--shed-policy", type=str, default="drop-oldest",
+                        choices=["drop-oldest", "keep-highest-score", "deadline"],
+                        help="What to drop when the analyzer falls behind")
+    parser.add_argument("--frame-deadline", type=float, default=30.0,
+                        help="Max age in seconds of a frame waiting for analysis (deadline policy)")
+    parser.add_argument("--prompt-mode", type=str, default="full", choices=["full", "delta", "regions"],
+                        help="full: describe every frame from scratch. delta: send the previous description and "
+                             "generate only the sections that changed. regions: send only crops of the changed "
+                             "regions, with the last full description as context")
+    parser.add_argument("--delta-refresh", type=int, default=10,
+                        help="With --prompt-mode delta or regions, request a full description every N analyses per camera")
+    parser.add_argument("--max-regions", type=int, default=1,
+                        help="With --prompt-mode regions, max crops per request (1 for single-image models)")
+    parser.add_argument("--region-max-coverage", type=float, default=0.5,
+                        help="With --prompt-mode regions, send the full frame when crops would cover more than "
+                             "this fraction of it")
+    parser.add_argument("--cascade", type=str, default=None,
+                        help="Cheap CPU checks on changed frames before the VLM, comma-separated tiers: motion "
+                             "(skip frames without foreground blobs), person (people escalate to --model), objects "
+                             "(a lot of foreground escalates to --model), e.g. motion,person (default: off)")
+    parser.add_argument("--small-model", type=str, default=None,
+                        help="With --cascade person/objects, model for frames that are not escalated "
+                             "(default: --model for every frame)")
+    parser.add_argument("--cascade-min-foreground", type=float, default=0.002,
+                        help="With --cascade motion, min fraction of the frame in foreground blobs to call the VLM")
+    parser.add_argument("--cascade-escalate-foreground", type=float, default=0.05,
+                        help="With --cascade objects, fraction of the frame in foreground that escalates to --model")
+    parser.add_argument("--cascade-escalate-blobs", type=int, default=3,
+                        help="With --cascade objects, number of foreground blobs that escalates to --model")
+    parser.add_argument("--cascade-refresh", type=float, default=300.0,
+                        help="With --cascade motion, describe a camera anyway once it has not been for this many seconds")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="Max cached VLM descriptions of recurring scenes, e.g. 256 (default: 0 = off). The "
+                             "whole-frame hash misses small local changes such as one person entering a corner, "
+                             "so only use it when the change gate also looks at the whole frame (no --roi/--ignore, "
+                             "not --mode event)")
+    parser.add_argument("--cache-radius", type=int, default=4, help="Max perceptual-hash distance (bits) for a cache hit")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="Seconds before a cached description expires")
+    parser.add_argument("--cache-path", type=str, default=None, help="Optional file to persist the description cache")
+    parser.add_argument("--dedupe-threshold", type=float, default=None,
+                        help="Don't post descriptions whose similarity (0-1) to a recent one of the same camera "
+                             "reaches this, e.g. 0.8 (default: post everything)")
+    parser.add_argument("--dedupe-history", type=int, default=32, help="Recent posts per camera compared for --dedupe-threshold")
+    parser.add_argument("--dedupe-heartbeat", type=float, default=600.0,
+                        help="With --dedupe-threshold, post a repeated description anyway once the scene has been "
+                             "unchanged for this many seconds")
+    parser.add_argument("--post-batch-size", type=int, default=1, help="Records per API request (1 = one post per event)")
+    parser.add_argument("--storage", type=str, default="segments", choices=["segments", "files"],
+                        help="Archive frames in segment files (default) or as one JPEG per capture")
+    parser.add_argument("--skipped-frames", type=str, default="thumbnail", choices=list(SegmentStore.SKIPPED_MODES),
+                        help="With --storage segments, how to archive frames below the change threshold")
+    parser.add_argument("--segment-minutes", type=float, default=10.0, help="Time span of one storage segment")
+    parser.add_argument("--disk-budget-mb", type=float, default=None, help="Optional cap on disk space used by captures")
+    parser.add_argument("--spool-path", type=str, default="post_spool.jsonl", help="File holding posts not yet delivered")
+    parser.add_argument("--events-db", type=str, default="events.db", help="SQLite file storing parsed analysis results")
+    parser.add_argument("--events-retention", type=float, default=30*24*3600,
+                        help="Seconds to keep events in the store (default: 30 days)")
+    parser.add_argument("--queue-url", type=str, default=None,
+                        help="Edge mode: submit changed frames to this work queue (see 'main.py queue') for shared "
+                             "analysis workers instead of running the VLM here")
+    parser.add_argument("--node-id", type=str, default=None,
+                        help="With --queue-url, name of this edge node in submitted jobs (default: host name)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve /metrics (Prometheus) and /stats (JSON) on this local port")
+    parser.add_argument("--metrics-interval", type=float, default=None,
+                        help="Print a one-line metrics summary every N seconds")
     
     args = parser.parse_args()
+
+    # Instrumentation stays a no-op unless something will read it
+    metrics_server = None
+    summary_reporter = None
+    if args.metrics_port is not None or args.metrics_interval:
+        metrics.REGISTRY.enable()
+    if args.metrics_port is not None:
+        metrics_server = metrics.MetricsServer(port=args.metrics_port).start()
+        print(f"Metrics at {metrics_server.url}/metrics and {metrics_server.url}/stats")
+    if args.metrics_interval:
+        summary_reporter = metrics.SummaryReporter(interval=args.metrics_interval).start()
     
-    # 1. Initialize Analyzer
-    print("Initializing Analyzer (this may take a while to download/load the model)...")
+    # 1. Capture schedule and cameras
     try:
-        analyzer = ImageAnalyzer(model_id=args.model, device=args.device)
-    except Exception as e:
-        print(f"CRITICAL ERROR: Failed to initialize analyzer. {e}")
+        # Capturing faster than frames can be analyzed would only shed them
+        capture_scheduler = CaptureScheduler(args.interval, min_interval=args.min_interval,
+                                             max_interval=args.max_interval, idle_after=args.idle_after,
+                                             backlog=lambda: len(analyze_queue))
+    except ValueError as e:
+        print(f"CRITICAL ERROR: {e}")
         return
-
-    # 2. Main Loop
-    print(f"Starting loop with interval {args.interval}s. Saving to '{args.output_dir}'")
+    print(f"Starting loop with interval {args.interval}s "
+          f"(adaptive {capture_scheduler.min_interval}s-{capture_scheduler.max_interval}s). Saving to '{args.output_dir}'")
     print(f"Image retention policy: {args.retention} seconds")
-    print(f"Change detection threshold: {args.diff_threshold}")
-    
-    if not os.path.exists(args.output_dir):
-        os.makedirs(args.output_dir)
-        
-    last_image_path = None
+    print(f"Change detection: {args.detector}, threshold {args.diff_threshold}")
+    print(f"Analysis queue: size {args.queue_size}, policy {args.shed_policy}")
+    if args.mode == "event":
+        print(f"Motion watch: threshold {args.motion_threshold}%, burst {args.burst_frames} frames / "
+              f"{args.burst_seconds}s, cooldown {args.event_cooldown}s")
+
+    cameras = parse_camera_spec(args.cameras)
+    camera_ids = list(range(len(cameras)))
+    print(f"Cameras: {cameras} (analysis schedule: {args.schedule})")
+
+    # Keep the cameras open across cycles instead of reopening them every capture.
+    # They open in their own threads while the model loads and the rest starts up.
+    backend_cache = BackendCache(args.camera_cache) if args.camera_cache else None
+    sessions = {
+        cam: CameraSession(sensor_id=sensor_id, device=device, backend_cache=backend_cache,
+                           pool=FramePool(size=args.frame_pool) if args.frame_pool > 0 else None).start()
+        for cam, (sensor_id, device) in zip(camera_ids, cameras)
+    }
+    startup.mark("cameras_started")
+
+    # 2. Initialize Analyzer (edge mode leaves analysis to the workers behind the queue)
+    analyzer = preprocessor = cache = client = None
+    small_analyzer = small_preprocessor = None
+    if args.queue_url:
+        client = QueueClient(args.queue_url)
+        node_id = args.node_id or socket.gethostname()
+        print(f"Edge mode: submitting changed frames to {args.queue_url} as '{node_id}'")
+    else:
+        print("Initializing Analyzer (this may take a while to download/load the model)...")
+        if args.cache_size > 0:
+            cache = DescriptionCache(max_entries=args.cache_size, radius=args.cache_radius,
+                                     ttl=args.cache_ttl, path=args.cache_path)
+        try:
+            analyzer, preprocessor = build_analyzer(args, cache=cache)
+            if args.small_model and args.small_model != args.model:
+                # One cache (size limit, --cache-path file) for both; entries are keyed per model, so each
+                # model is only served its own descriptions
+                small_analyzer, small_preprocessor = build_analyzer(args, cache=cache, model=args.small_model)
+        except Exception as e:
+            print(f"CRITICAL ERROR: Failed to initialize analyzer. {e}")
+            for session in sessions.values():
+                session.stop()
+            return
+
+        # Load the model now so the first change does not pay for it, in parallel with the camera open
+        def warm_up_model():
+            if analyzer.warm_up() is not None:
+                startup.mark("model_loaded")
+            if small_analyzer is not None:
+                small_analyzer.warm_up()
+        threading.Thread(target=warm_up_model, name="model-warm-up", daemon=True).start()
+
+    def per_camera(values, camera_id):
+        if not values:
+            return None
+        return values[camera_id] if len(values) > 1 else values[0]
+
+    describer = None
+    if analyzer is not None and args.prompt_mode == "delta":
+        describer = IncrementalAnalyzer(analyzer, refresh=args.delta_refresh)
+    elif analyzer is not None and args.prompt_mode == "regions":
+        def make_extractor(cam):
+            return RegionExtractor(max_regions=args.max_regions, max_coverage=args.region_max_coverage,
+                                   roi=per_camera(args.roi, cam), ignore=per_camera(args.ignore, cam))
+        describer = RegionAnalyzer(analyzer, refresh=args.delta_refresh, extractor_factory=make_extractor)
+    if describer is not None:
+        print(f"Prompt mode: {args.prompt_mode} (full description every {args.delta_refresh} analyses)")
+
+    cascade = None
+    if args.cascade:
+        try:
+            cascade = Cascade(tiers=[tier.strip() for tier in args.cascade.split(",") if tier.strip()],
+                              min_foreground=args.cascade_min_foreground,
+                              escalate_foreground=args.cascade_escalate_foreground,
+                              escalate_blobs=args.cascade_escalate_blobs, refresh=args.cascade_refresh)
+        except ValueError as e:
+            print(f"CRITICAL ERROR: {e}")
+            for session in sessions.values():
+                session.stop()
+            return
+        print(f"Cascade: {', '.join(cascade.tiers)}"
+              + (f" (small model {args.small_model})" if small_analyzer is not None else ""))
+
+    # Single camera keeps the flat layout; several cameras get one subdirectory each
+    output_dirs = {
+        cam: args.output_dir if len(cameras) == 1 else os.path.join(args.output_dir, f"cam{cam}")
+        for cam in camera_ids
+    }
+    for directory in output_dirs.values():
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    # Index existing captures once; afterwards only new and expired files are touched
+    max_bytes = int(args.disk_budget_mb * 1024 * 1024 / len(cameras)) if args.disk_budget_mb else None
+    retentions = {}
+    for cam in camera_ids:
+        if args.storage == "segments":
+            # Retention then deletes whole segments instead of individual files
+            retentions[cam] = SegmentStore(output_dirs[cam], args.retention, max_bytes=max_bytes,
+                                           segment_seconds=args.segment_minutes * 60, skipped=args.skipped_frames)
+            print(f"Indexed {retentions[cam].scan()} stored frames in '{retentions[cam].directory}'")
+        else:
+            retentions[cam] = RetentionManager(output_dirs[cam], args.retention, max_bytes=max_bytes)
+            print(f"Indexed {retentions[cam].scan()} existing captures for retention in '{output_dirs[cam]}'")
+
+    # Posting happens in the background; undelivered posts survive restarts in the spool
+    # Every result is parsed into the indexed event store alongside posting (by the workers in edge mode)
+    events = poster = deduper = None
+    if client is None:
+        events = EventStore(args.events_db, max_age=args.events_retention)
+        poster = Poster(spool_path=args.spool_path, batch_size=args.post_batch_size, store=events).start()
+        if args.dedupe_threshold is not None:
+            deduper = DescriptionDeduper(threshold=args.dedupe_threshold, history=args.dedupe_history,
+                                         heartbeat=args.dedupe_heartbeat)
+            print(f"Dedupe: similarity threshold {args.dedupe_threshold}, heartbeat {args.dedupe_heartbeat}s")
+
+    # 3. Pipeline: capture (this thread) -> diff -> analyze -> post
+    # Each stage has its own worker, so a slow VLM call never stalls capture.
+    pipeline = Pipeline()
+    diff_queue = pipeline.queue(maxsize=2 * len(cameras), policy="drop-oldest", name="diff")
+    # One bounded queue per camera, served fairly to the single shared analyzer
+    analyze_queue = pipeline.add_queue(AnalysisScheduler(
+        camera_ids, policy=args.schedule, min_interval=args.min_camera_interval,
+        maxsize=args.queue_size, shed_policy=args.shed_policy, deadline=args.frame_deadline))
+    post_queue = pipeline.queue(maxsize=100, policy="block", name="post")
+
+    # Each detector keeps its camera's previous frame / background model in preallocated buffers
+    detectors = {
+        cam: create_detector(args.detector, roi=per_camera(args.roi, cam), ignore=per_camera(args.ignore, cam))
+        for cam in camera_ids
+    }
+
+    def diff_stage(job):
+        # Cleanup old images
+        with metrics.CLEANUP_SECONDS.time():
+            files, reclaimed = retentions[job.camera_id].expire()
+        if files:
+            print(f"Deleted {files} old file(s), reclaimed {reclaimed} bytes")
+
+        with metrics.DIFF_SECONDS.time():
+            job.score = detectors[job.camera_id].update(job.frame)
+        capture_scheduler.report(job.score, args.diff_threshold)
+        print(f"[cam{job.camera_id}] Difference score: {job.score:.2f} (Threshold: {args.diff_threshold})")
+        store = retentions[job.camera_id] if args.storage == "segments" else None
+        return gate_frame(job, args.diff_threshold, cascade=cascade, store=store)
+
+    def analyze_stage(job):
+        print("Analyzing image...")
+        if job.tier == Cascade.SMALL and small_analyzer is not None:
+            # Prompt modes keep their state with the large model; the small one describes from scratch
+            job.description = small_analyzer.analyze(job.frame)
+        elif describer is not None:
+            job.description = describer.analyze(job.frame, camera_id=job.camera_id)
+        else:
+            job.description = analyzer.analyze(job.frame)
+        print(f"Analysis Result:\n{job.description}")
+        return job
+
+    def post_stage(job):
+        if deduper is not None:
+            decision, similarity = deduper.check(job.description, camera_id=job.camera_id,
+                                                 timestamp=job.frame.timestamp)
+            if decision == deduper.DUPLICATE:
+                # Kept in the local event store, just not posted again
+                metrics.POSTS_DEDUPED.inc()
+                print(f"[cam{job.camera_id}] Description repeats a recent one (similarity {similarity:.2f}). Not posting.")
+                events.add(job.description, job.frame.timestamp, camera_id=job.camera_id,
+                           image_path=job.frame.path, status="duplicate")
+                return None
+        poster.submit(job.description, job.frame.path, camera_id=job.camera_id)
+        if startup.mark("first_event"):
+            print(f"Startup: {startup.summary_line()}")
+        return None
+
+    stopping = threading.Event()
+
+    def submit_stage(job):
+        # Edge mode: retry until the queue takes the job; meanwhile the analysis queue sheds as usual
+        work = make_job(job.frame, camera_id=job.camera_id, score=job.score, source=node_id)
+        delay = 1.0
+        while True:
+            try:
+                client.submit(work)
+                break
+            except Exception as e:
+                metrics.QUEUE_FAILURES.inc()
+                if stopping.is_set():
+                    print(f"[cam{job.camera_id}] Work queue unavailable ({e}). Dropping the frame on shutdown.")
+                    return None
+                print(f"Work queue unavailable ({e}). Retrying in {delay:.1f}s...")
+                stopping.wait(delay)
+                delay = min(delay * 2, 30.0)
+        metrics.JOBS_SUBMITTED.inc()
+        print(f"[cam{job.camera_id}] Submitted job {work['id']} to the work queue")
+        if startup.mark("first_event"):
+            print(f"Startup: {startup.summary_line()}")
+        return None
+
+    pipeline.add_stage("diff", diff_stage, diff_queue, analyze_queue)
+    if client is not None:
+        pipeline.add_stage("submit", submit_stage, analyze_queue)
+    else:
+        pipeline.add_stage("analyze", analyze_stage, analyze_queue, post_queue, workers=args.analyze_workers)
+        pipeline.add_stage("post", post_stage, post_queue)
+    pipeline.start()
+
+    def pipeline_gauges():
+        stats = pipeline.stats()
+        gauges = {}
+        for name, queue_stats in stats["queues"].items():
+            gauges[f"queue_depth_{name}"] = queue_stats["depth"]
+            gauges[f"queue_shed_{name}"] = queue_stats["dropped"] + queue_stats["expired"]
+        if poster is not None:
+            gauges["posts_pending"] = poster.pending()
+        gauges["capture_interval_seconds"] = capture_scheduler.current
+        gauges["capture_rate_per_min"] = round(capture_scheduler.effective_rate() or 0, 2)
+        gauges["capture_missed_ticks"] = capture_scheduler.missed
+        return gauges
+    metrics.REGISTRY.add_collector(pipeline_gauges)
+    metrics.REGISTRY.add_collector(startup.gauges)
+
+    # Motion watcher threads queue frames too, possibly in the same second as the main loop
+    capture_seq = itertools.count()
+
+    def queue_frame(cam, frame):
+        if args.storage == "files":
+            filepath = os.path.join(output_dirs[cam], capture_filename(frame.timestamp, next(capture_seq)))
+            frame.save(filepath)
+            retentions[cam].add(filepath, frame.timestamp, len(frame.jpeg()))
+            print(f"Image saved to {filepath} ({frame.shape[1]}x{frame.shape[0]})")
+        else:
+            print(f"[cam{cam}] Captured {frame.shape[1]}x{frame.shape[0]}")
+        diff_queue.put(FrameJob(frame, camera_id=cam))
+
+    # Event mode: motion between periodic captures is caught at camera frame rate.
+    # The picked frame still goes through change detection, which decides on analysis.
+    watchers = {}
+    if args.mode == "event":
+        for cam in camera_ids:
+            detector = create_detector("background", roi=per_camera(args.roi, cam),
+                                       ignore=per_camera(args.ignore, cam))
+            watchers[cam] = MotionWatcher(sessions[cam], lambda frame, score, cam=cam: queue_frame(cam, frame),
+                                          camera_id=cam, threshold=args.motion_threshold,
+                                          burst_frames=args.burst_frames, burst_seconds=args.burst_seconds,
+                                          cooldown=args.event_cooldown, detector=detector).start()
+
+    startup.mark("pipeline_started")
+    print(f"Startup: {startup.summary_line()}")
 
     try:
         while True:
+            # Fixed deadlines: capture, VLM and post time do not add to the period
+            capture_scheduler.wait()
             timestamp = int(time.time())
-            filename = f"capture_{timestamp}.jpg"
-            filepath = os.path.join(args.output_dir, filename)
             
             print(f"\n--- Cycle Start: {time.ctime(timestamp)} ---")
             
-            # Capture
-            if capture_image(filepath):
-                # Check for changes if we have a previous image
-                skip_analysis = False
-                if last_image_path and os.path.exists(last_image_path):
-                    diff_score = calculate_image_difference(last_image_path, filepath)
-                    print(f"Difference score: {diff_score:.2f} (Threshold: {args.diff_threshold})")
-                    
-                    if diff_score < args.diff_threshold:
-                        print("Change is below threshold. Skipping analysis.")
-                        skip_analysis = True
-                
-                if not skip_analysis:
-                    # Analyze
-                    print("Analyzing image...")
-                    description = analyzer.analyze(filepath)
-                    print(f"Analysis Result:\n{description}")
-                    # Post
-                    post_content(description, filepath)
-                
-                # Update last image path
-                last_image_path = filepath
-                
-                # Cleanup old images
-                cleanup_old_images(args.output_dir, args.retention)
-            else:
-                print("Skipping analysis due to capture failure.")
+            for cam in camera_ids:
+                # Capture (kept in memory; the file on disk is only an archive copy)
+                with metrics.CAPTURE_SECONDS.time():
+                    frame = capture_frame(session=sessions[cam])
+                if frame is not None:
+                    metrics.FRAMES_CAPTURED.inc()
+                    if startup.mark(f"cam{cam}_first_frame", at=sessions[cam].first_frame_at):
+                        startup.mark(f"cam{cam}_open", at=sessions[cam].opened_at)
+                    queue_frame(cam, frame)
+                else:
+                    metrics.CAPTURE_FAILURES.inc()
+                    print(f"[cam{cam}] Skipping analysis due to capture failure.")
                 
-            print(f"Sleeping for {args.interval} seconds...")
-            time.sleep(args.interval)
+            stats = capture_scheduler.stats()
+            print(f"Next capture in {stats['interval']}s (effective rate: {stats['captures_per_min']} captures/min)")
             
     except KeyboardInterrupt:
         print("\nStopping loop.")
+    finally:
+        for watcher in watchers.values():
+            watcher.stop()
+        stopping.set()
+        pipeline.stop()
+        for session in sessions.values():
+            session.stop()
+        if poster is not None:
+            poster.stop()
+            events.close()
+        if client is not None:
+            client.close()
+        if summary_reporter is not None:
+            summary_reporter.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        print(f"Pipeline stats: {pipeline.stats()}")
+        print(f"Capture schedule: {capture_scheduler.stats()}")
+        print(f"Startup: {startup.summary_line()}")
+        for cam, watcher in watchers.items():
+            print(f"[cam{cam}] Motion watch: {watcher.stats()}")
+        for cam, session in sessions.items():
+            if session.pool is not None:
+                print(f"[cam{cam}] Frame pool: {session.pool.stats()}")
+        if events is not None:
+            print(f"Event store: {events.written} event(s) in {events.commits} commit(s), {events.rotated} rotated out")
+        if cache is not None:
+            print(f"Description cache: {cache.stats()}")
+        if deduper is not None:
+            print(f"Dedupe: {deduper.stats()}")
+        if cascade is not None:
+            print(f"Cascade: {cascade.stats()}")
+        print(f"Analyses per camera: {analyze_queue.served}")
+        if preprocessor is not None:
+            print(f"VLM preprocessing: {preprocessor.stats()}")
+        if small_preprocessor is not None:
+            print(f"VLM preprocessing ({args.small_model}): {small_preprocessor.stats()}")
+        if describer is not None:
+            print(f"Prompt modes: {describer.stats()}")
+        for cam, retention in retentions.items():
+            print(f"[cam{cam}] Retention: reclaimed {retention.reclaimed_files} file(s), {retention.reclaimed_bytes} bytes")
+            if args.storage == "segments":
+                retention.close()
+                print(f"[cam{cam}] Storage: {retention.stats()}")
+        if metrics.REGISTRY.enabled:
+            print(f"[metrics] {metrics.REGISTRY.summary_line()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,323 @@
+import bisect
+import contextlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus style.
+    observe() is a no-op while the registry is disabled.
+    """
+
+    def __init__(self, registry, name, help, buckets=LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if not self.registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+            if value > self.max:
+                self.max = value
+
+    def time(self):
+        """
+        Context manager that observes the elapsed seconds of its block.
+        """
+        if not self.registry.enabled:
+            return contextlib.nullcontext()
+        return _Timer(self)
+
+    def quantile(self, q):
+        """
+        Estimates a quantile (0-1) by interpolating inside the matching bucket.
+        """
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+            maximum = self.max
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for i, n in enumerate(counts):
+            upper = self.buckets[i] if i < len(self.buckets) else maximum
+            if n and cumulative + n >= rank:
+                return min(maximum, lower + (upper - lower) * (rank - cumulative) / n)
+            cumulative += n
+            lower = upper
+        return maximum
+
+    def snapshot(self):
+        with self._lock:
+            count, total, maximum = self.count, self.sum, self.max
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "avg": round(total / count, 6) if count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": round(maximum, 6) if count else None,
+        }
+
+    def render(self, prefix):
+        name = prefix + self.name
+        lines = [f"# HELP {name} {self.help}", f"# TYPE {name} histogram"]
+        with self._lock:
+            cumulative = 0
+            for bound, n in zip(self.buckets, self.counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+            lines.append(f"{name}_sum {self.sum}")
+            lines.append(f"{name}_count {self.count}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+class Counter:
+    """
+    Monotonic counter. inc() is a no-op while the registry is disabled.
+    """
+
+    def __init__(self, registry, name, help):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+    def render(self, prefix):
+        name = prefix + self.name
+        return [f"# HELP {name} {self.help}", f"# TYPE {name} counter", f"{name} {self.value}"]
+
+class Registry:
+    """
+    Holds all metrics. Disabled by default so instrumentation costs one
+    attribute check per call until enable() is called.
+
+    Collectors are callables returning {name: value} gauges read at export
+    time, for state that already lives elsewhere (e.g. queue depths).
+    """
+
+    def __init__(self, prefix="semcam_"):
+        self.prefix = prefix
+        self.enabled = False
+        self.metrics = {}
+        self.collectors = []
+
+    def enable(self):
+        self.enabled = True
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self.metrics.setdefault(name, Histogram(self, name, help, buckets))
+
+    def counter(self, name, help):
+        return self.metrics.setdefault(name, Counter(self, name, help))
+
+    def add_collector(self, func):
+        self.collectors.append(func)
+
+    def _gauges(self):
+        gauges = {}
+        for collector in self.collectors:
+            try:
+                gauges.update(collector())
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        return gauges
+
+    def render_prometheus(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render(self.prefix))
+        for name, value in self._gauges().items():
+            lines.append(f"# TYPE {self.prefix}{name} gauge")
+            lines.append(f"{self.prefix}{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        data = {}
+        for name, metric in self.metrics.items():
+            data[name] = metric.snapshot() if isinstance(metric, Histogram) else metric.value
+        data.update(self._gauges())
+        return data
+
+    def summary_line(self):
+        """
+        One-line digest: p50/p95 of each histogram that has data, then counters.
+        """
+        parts = []
+        for name, metric in self.metrics.items():
+            if isinstance(metric, Histogram) and metric.count:
+                label = name.replace("_seconds", "")
+                parts.append(f"{label} p50={metric.quantile(0.5) * 1000:.0f}ms p95={metric.quantile(0.95) * 1000:.0f}ms n={metric.count}")
+        for name, metric in self.metrics.items():
+            if isinstance(metric, Counter):
+                parts.append(f"{name.replace('_total', '')}={metric.value}")
+        for name, value in self._gauges().items():
+            parts.append(f"{name}={value}")
+        return " | ".join(parts)
+
+class StartupTimer:
+    """
+    Records when each startup milestone (imports done, camera open, model
+    loaded, first analysis, ...) was reached, in seconds since the process
+    started. Each milestone is kept the first time it is marked. Always on,
+    independent of the registry.
+    """
+
+    def __init__(self, start=None):
+        self.start = time.monotonic() if start is None else start
+        self.marks = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name, at=None):
+        """
+        Records milestone name at time.monotonic() value at (default: now).
+        Returns True the first time a milestone is marked.
+        """
+        if at is None:
+            at = time.monotonic()
+        with self._lock:
+            if name in self.marks:
+                return False
+            self.marks[name] = at - self.start
+            return True
+
+    def gauges(self):
+        with self._lock:
+            return {f"startup_{name}_seconds": round(value, 3) for name, value in self.marks.items()}
+
+    def summary_line(self):
+        with self._lock:
+            timeline = sorted(self.marks.items(), key=lambda item: item[1])
+        return " | ".join(f"{name} {value:.2f}s" for name, value in timeline)
+
+REGISTRY = Registry()
+
+CAPTURE_SECONDS = REGISTRY.histogram("capture_seconds", "Time to take a frame from the camera session")
+DIFF_SECONDS = REGISTRY.histogram("diff_seconds", "Time to run change detection on a frame")
+VLM_SECONDS = REGISTRY.histogram("vlm_seconds", "VLM request latency")
+VLM_TTFT_SECONDS = REGISTRY.histogram("vlm_ttft_seconds", "VLM time to first token")
+POST_SECONDS = REGISTRY.histogram("post_seconds", "Latency of one API post request")
+CLEANUP_SECONDS = REGISTRY.histogram("cleanup_seconds", "Time spent deleting expired captures")
+BURST_SECONDS = REGISTRY.histogram("burst_seconds", "Time from a motion trigger to the selected burst frame")
+
+FRAMES_CAPTURED = REGISTRY.counter("frames_captured_total", "Frames captured")
+FRAMES_SKIPPED = REGISTRY.counter("frames_skipped_total", "Frames below the change threshold")
+CACHE_HITS = REGISTRY.counter("cache_hits_total", "Description cache hits (VLM skipped)")
+CACHE_MISSES = REGISTRY.counter("cache_misses_total", "Description cache misses")
+CAPTURE_FAILURES = REGISTRY.counter("capture_failures_total", "Cycles where no frame could be captured")
+VLM_FAILURES = REGISTRY.counter("vlm_failures_total", "VLM requests that failed or timed out")
+POST_FAILURES = REGISTRY.counter("post_failures_total", "API post requests that failed")
+POSTS_SENT = REGISTRY.counter("posts_sent_total", "Records delivered to the API")
+VLM_TOKENS = REGISTRY.counter("vlm_tokens_total", "Tokens generated by the VLM")
+MOTION_EVENTS = REGISTRY.counter("motion_events_total", "Motion bursts sent to change detection")
+POSTS_DEDUPED = REGISTRY.counter("posts_deduped_total", "Descriptions not posted because they repeat a recent one")
+JOBS_SUBMITTED = REGISTRY.counter("jobs_submitted_total", "Frames submitted to the work queue (edge mode)")
+QUEUE_FAILURES = REGISTRY.counter("queue_failures_total", "Work queue requests that failed (edge mode)")
+CASCADE_SKIPPED = REGISTRY.counter("cascade_skipped_total", "Changed frames the pre-filter cascade kept from the VLM")
+CASCADE_ESCALATED = REGISTRY.counter("cascade_escalated_total", "Frames the cascade sent to the large model")
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        registry = self.server.registry
+        if self.path.startswith("/metrics"):
+            body = registry.render_prometheus().encode()
+            content_type = "text/plain; version=0.0.4"
+        elif self.path.startswith("/stats"):
+            body = json.dumps(registry.to_dict(), indent=2).encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class MetricsServer:
+    """
+    Serves /metrics (Prometheus text format) and /stats (JSON) on a local port.
+    """
+
+    def __init__(self, registry=REGISTRY, port=9108, host="127.0.0.1"):
+        self._httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.registry = registry
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+class SummaryReporter:
+    """
+    Prints registry.summary_line() every `interval` seconds.
+    """
+
+    def __init__(self, registry=REGISTRY, interval=60.0):
+        self.registry = registry
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-summary", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            print(f"[metrics] {self.registry.summary_line()}")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1)
@@ -0,0 +1,154 @@
+import copy
+import threading
+import time
+
+class ChatResult:
+    """
+    Outcome of one VLM request.
+    ttft is the time to the first streamed token; timed_out means the deadline
+    passed and content holds whatever had been generated by then.
+    """
+
+    def __init__(self):
+        self.content = ""
+        self.ttft = None
+        self.latency = None
+        self.eval_count = None
+        self.prompt_eval_count = None
+        self.timed_out = False
+        self.error = None
+
+    def __repr__(self):
+        return (f"ChatResult(chars={len(self.content)}, ttft={self.ttft}, latency={self.latency}, "
+                f"eval_count={self.eval_count}, timed_out={self.timed_out}, error={self.error!r})")
+
+class OllamaBackend:
+    """
+    Talks to Ollama through one persistent client.
+
+    - warm_up() loads the model ahead of the first frame and keep_alive keeps
+      it resident between changes, so idle periods do not cost a reload.
+    - Responses are streamed, so time-to-first-token is measured and partial
+      output is available (on_token receives the text generated so far).
+    - Every request has a hard deadline. The caller gets control back when it
+      passes; the stream is then closed, which cancels generation on the server.
+    - At most max_in_flight requests run at once.
+    - The ollama package is imported and the client created on first use, so
+      constructing a backend costs nothing at startup.
+    """
+
+    def __init__(self, model_id, host=None, keep_alive="30m", deadline=120.0, num_ctx=1024, max_in_flight=1):
+        self.model_id = model_id
+        self.keep_alive = keep_alive
+        self.deadline = deadline
+        self.num_ctx = num_ctx
+        self.max_in_flight = max_in_flight
+        self.host = host
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                import ollama
+                # The read timeout bounds how long a cancelled request can linger on a silent server
+                self._client = ollama.Client(host=self.host, timeout=self.deadline)
+            return self._client
+
+    def warm_up(self):
+        """
+        Loads the model into memory with the configured keep-alive.
+        Returns the seconds it took, or None if the server could not be reached.
+        """
+        start = time.monotonic()
+        try:
+            # An empty prompt makes Ollama load the model without generating anything
+            self.client.generate(model=self.model_id, prompt="", keep_alive=self.keep_alive)
+        except Exception as e:
+            print(f"Model warm-up failed: {e}")
+            return None
+        elapsed = time.monotonic() - start
+        print(f"Model {self.model_id} loaded in {elapsed:.2f}s (keep_alive={self.keep_alive})")
+        return elapsed
+
+    def _stream(self, result, messages, options, cancel, done, on_token, start):
+        stream = None
+        try:
+            stream = self.client.chat(
+                model=self.model_id,
+                messages=messages,
+                options=options,
+                keep_alive=self.keep_alive,
+                stream=True,
+            )
+            for chunk in stream:
+                if cancel.is_set():
+                    break
+                text = chunk["message"]["content"]
+                if text:
+                    if result.ttft is None:
+                        result.ttft = time.monotonic() - start
+                    result.content += text
+                    if on_token is not None:
+                        on_token(result.content)
+                if chunk.get("done"):
+                    result.eval_count = chunk.get("eval_count")
+                    result.prompt_eval_count = chunk.get("prompt_eval_count")
+        except Exception as e:
+            if not cancel.is_set():
+                result.error = e
+        finally:
+            if stream is not None:
+                # Closing the stream drops the connection, which stops generation server-side
+                stream.close()
+            self._slots.release()
+            done.set()
+
+    def chat(self, prompt, images=None, options=None, deadline=None, on_token=None, system=None):
+        """
+        Sends one request and returns a ChatResult.
+        deadline (seconds) covers waiting for a free slot as well as generation.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        start = time.monotonic()
+        result = ChatResult()
+
+        if not self._slots.acquire(timeout=deadline):
+            result.timed_out = True
+            result.latency = time.monotonic() - start
+            return result
+
+        messages = []
+        if system:
+            messages.append({'role': 'system', 'content': system})
+        message = {'role': 'user', 'content': prompt}
+        if images:
+            message['images'] = list(images)
+        messages.append(message)
+        request_options = {'num_ctx': self.num_ctx}
+        request_options.update(options or {})
+
+        cancel = threading.Event()
+        done = threading.Event()
+        worker = threading.Thread(
+            target=self._stream,
+            args=(result, messages, request_options, cancel, done, on_token, start),
+            name="ollama-request",
+            daemon=True,
+        )
+        worker.start()
+
+        remaining = deadline - (time.monotonic() - start)
+        if not done.wait(max(0.0, remaining)):
+            cancel.set()
+            # The worker may still append to result until it notices the cancel
+            result = copy.copy(result)
+            result.timed_out = True
+        result.latency = time.monotonic() - start
+        return result
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
@@ -0,0 +1,204 @@
+import threading
+import time
+from collections import deque
+
+class FrameJob:
+    """
+    A unit of work passed between pipeline stages.
+    Stages fill in the diff score, cascade tier and description as the job moves along.
+    """
+
+    def __init__(self, frame, camera_id=0):
+        self.frame = frame
+        self.camera_id = camera_id
+        self.created = time.monotonic()
+        self.score = None
+        self.tier = None
+        self.description = None
+
+    @property
+    def age(self):
+        return time.monotonic() - self.created
+
+class SheddingQueue:
+    """
+    A bounded queue between two pipeline stages.
+
+    When the queue is full, put() applies the shedding policy instead of letting
+    the producer fall behind:
+    - "block": wait for space (nothing is dropped)
+    - "drop-oldest": evict the oldest queued job
+    - "keep-highest-score": evict the job with the lowest diff score, or drop the
+      new job if it has the lowest score (a job without a score always wins)
+    - "deadline": like drop-oldest, and get() also discards jobs older than
+      `deadline` seconds
+    """
+
+    POLICIES = ("block", "drop-oldest", "keep-highest-score", "deadline")
+
+    def __init__(self, maxsize=1, policy="drop-oldest", deadline=None, name="queue"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown shedding policy: {policy}")
+        if policy == "deadline" and not deadline:
+            raise ValueError("The deadline policy needs a deadline in seconds")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.deadline = deadline
+        self.name = name
+        self.dropped = 0
+        self.expired = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    @staticmethod
+    def _score(job):
+        score = getattr(job, "score", None)
+        return float("inf") if score is None else score
+
+    def max_score(self):
+        """
+        Returns the highest diff score among queued jobs, or None if empty.
+        """
+        with self._cond:
+            if not self._items:
+                return None
+            return max(self._score(job) for job in self._items)
+
+    def put(self, job, timeout=None):
+        """
+        Enqueues a job. Returns False if the job itself was shed (or the
+        blocking put timed out), True otherwise.
+        """
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.policy == "block":
+                    if not self._cond.wait_for(lambda: len(self._items) < self.maxsize, timeout):
+                        return False
+                elif self.policy == "keep-highest-score":
+                    lowest = min(self._items, key=self._score)
+                    if self._score(job) <= self._score(lowest):
+                        self.dropped += 1
+                        return False
+                    self._items.remove(lowest)
+                    self.dropped += 1
+                else:
+                    self._items.popleft()
+                    self.dropped += 1
+            self._items.append(job)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Returns the next job, or None if none arrived within timeout.
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                while self._items:
+                    job = self._items.popleft()
+                    self._cond.notify_all()
+                    if self.policy == "deadline" and getattr(job, "age", 0) > self.deadline:
+                        self.expired += 1
+                        continue
+                    return job
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+class Stage:
+    """
+    Runs `func` on every job from `inbox` in its own worker thread(s) and
+    forwards the non-None results to `outbox`.
+    """
+
+    def __init__(self, name, func, inbox, outbox=None, workers=1):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.processed = 0
+        self.errors = 0
+        self._threads = []
+
+    def start(self, stop_event):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(stop_event,),
+                                      name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self, stop_event):
+        while not stop_event.is_set():
+            job = self.inbox.get(timeout=0.2)
+            if job is None:
+                continue
+            try:
+                result = self.func(job)
+            except Exception as e:
+                self.errors += 1
+                print(f"[{self.name}] Error: {e}")
+                continue
+            self.processed += 1
+            if result is not None and self.outbox is not None:
+                self.outbox.put(result)
+
+class Pipeline:
+    """
+    A chain of stages connected by bounded queues.
+    The producer (e.g. the capture loop) feeds the first queue with put().
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.queues = []
+        self._stop_event = threading.Event()
+
+    def queue(self, maxsize=1, policy="drop-oldest", deadline=None, name="queue"):
+        q = SheddingQueue(maxsize, policy, deadline, name)
+        self.queues.append(q)
+        return q
+
+    def add_queue(self, q):
+        """
+        Registers a queue-like inbox (e.g. an AnalysisScheduler) for stats().
+        """
+        self.queues.append(q)
+        return q
+
+    def add_stage(self, name, func, inbox, outbox=None, workers=1):
+        stage = Stage(name, func, inbox, outbox, workers)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        self._stop_event.clear()
+        for stage in self.stages:
+            stage.start(self._stop_event)
+        return self
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def stats(self):
+        """
+        Returns per-stage and per-queue counters for logging.
+        """
+        return {
+            "stages": {s.name: {"processed": s.processed, "errors": s.errors} for s in self.stages},
+            "queues": {q.name: {"depth": len(q), "dropped": q.dropped, "expired": q.expired}
+                       for q in self.queues},
+        }
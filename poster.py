@@ -1,32 +1,68 @@
 import json
 import os
-import requests
+import threading
+import uuid
+import metrics
 from datetime import datetime
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+_env_loaded = False
 
-def post_content(text, image_path=None):
+def load_env():
     """
-    Posts the content to the configured API.
-    Also logs to file for debugging.
+    Loads API_URI and friends from .env into the environment, once.
+    dotenv is imported here, on first use, rather than at startup.
     """
-    timestamp = datetime.now().isoformat()
-    api_uri = os.getenv("API_URI")
-    
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def build_payload(text, timestamp):
     # Prepare payload matching the requested format
-    # input = { 
+    # input = {
     #   englishText: '...',
     #   occured_at: new Date().toISOString()
     # };
-    payload = {
+    return {
         "inputData": {
             "englishText": text,
             "occured_at": timestamp
         }
     }
-    
+
+def log_post(entry, log_path="posts_log.jsonl"):
+    with open(log_path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+def make_session(pool_size=2):
+    """
+    Returns a requests.Session that keeps connections to the API alive.
+    requests is imported here, on the first post, rather than at startup.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({'Content-Type': 'application/json'})
+    return session
+
+_shared_session = None
+
+def post_content(text, image_path=None):
+    """
+    Posts the content to the configured API.
+    Also logs to file for debugging.
+    """
+    global _shared_session
+    timestamp = datetime.now().isoformat()
+    load_env()
+    api_uri = os.getenv("API_URI")
+
+    payload = build_payload(text, timestamp)
+
     log_entry = {
         "timestamp": timestamp,
         "image_path": image_path,
@@ -36,18 +72,20 @@ def post_content(text, image_path=None):
     }
 
     print(f"\nPosting to API: {api_uri}")
-    
+
     try:
         if not api_uri:
              raise ValueError("API_URI not found in .env")
 
-        response = requests.post(
+        if _shared_session is None:
+            _shared_session = make_session()
+
+        response = _shared_session.post(
             api_uri,
-            headers={'Content-Type': 'application/json'},
             json=payload,
             timeout=10
         )
-        
+
         if response.ok:
             print("API Post Success!")
             try:
@@ -68,8 +106,252 @@ def post_content(text, image_path=None):
         log_entry["error"] = str(e)
 
     # Log to file
-    with open("posts_log.jsonl", "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
+    log_post(log_entry)
+
+class PostSpool:
+    """
+    Append-only on-disk record of posts that have not been delivered yet.
+
+    Each line is either {"op": "add", "id": ..., "record": ...} or
+    {"op": "ack", "id": ...}. Replaying the file yields every record that was
+    added but never acknowledged, so nothing is lost across restarts. The file
+    is rewritten with only the pending records when it is reopened (or by
+    rewrite()), and truncated whenever everything has been acknowledged.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Returns the pending records in submission order and compacts the file.
+        """
+        pending = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn write from a crash; skip it
+                        continue
+                    if entry.get("op") == "add":
+                        pending[entry["id"]] = entry["record"]
+                    elif entry.get("op") == "ack":
+                        pending.pop(entry["id"], None)
+        records = list(pending.values())
+        self.rewrite(records)
+        return records
+
+    def rewrite(self, records):
+        """
+        Replaces the file with add entries for records only, dropping
+        everything acknowledged.
+        """
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                for record in records:
+                    f.write(json.dumps({"op": "add", "id": record["id"], "record": record}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def _append(self, entries):
+        with self._lock:
+            with open(self.path, "a") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def add(self, record):
+        self._append([{"op": "add", "id": record["id"], "record": record}])
+
+    def ack(self, records):
+        self._append([{"op": "ack", "id": r["id"]} for r in records])
+
+    def truncate(self):
+        with self._lock:
+            open(self.path, "w").close()
+
+class Poster:
+    """
+    Posts analysis results to the API from a background thread.
+
+    submit() returns immediately. Records are written to a PostSpool first, then
+    sent over a pooled keep-alive session. With batch_size > 1, up to batch_size
+    records are sent in one request as {"inputData": [ ... ]}. Failed sends are
+    retried with exponential backoff, and anything still unsent at shutdown is
+    replayed from the spool on the next start.
+
+    With an EventStore, each record is stored (parsed and indexed) on submit
+    and its delivery status is updated there; otherwise every attempt is
+    appended to the JSONL log at log_path.
+    """
+
+    def __init__(self, api_uri=None, spool_path="post_spool.jsonl", log_path="posts_log.jsonl",
+                 batch_size=1, batch_wait=1.0, timeout=10, retry_delay=1.0, max_retry_delay=300.0,
+                 store=None):
+        # Without api_uri, API_URI is read from the environment (and .env) in start()
+        self.api_uri = api_uri
+        self.spool = PostSpool(spool_path)
+        self.log_path = log_path
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.store = store
+
+        self.sent = 0
+        self.failures = 0
+
+        # Created by the sender thread on the first post
+        self.session = None
+        self._pending = []
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._in_flight = 0
+
+    def start(self):
+        if not self.api_uri:
+            load_env()
+            self.api_uri = os.getenv("API_URI")
+        replayed = self.spool.load()
+        if replayed:
+            print(f"Replaying {len(replayed)} unsent post(s) from {self.spool.path}")
+        with self._cond:
+            # Records submitted before start() are already in the spool
+            queued = {r["id"] for r in self._pending}
+            self._pending = [r for r in replayed if r["id"] not in queued] + self._pending
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="poster", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        """
+        Tries to deliver what is pending for up to timeout seconds, then stops.
+        Undelivered records stay in the spool.
+        """
+        self.flush(timeout)
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=self.timeout + 1)
+            self._thread = None
+        if self.session is not None:
+            self.session.close()
+
+    def flush(self, timeout=None):
+        """
+        Waits until every submitted record has been delivered.
+        Returns True if the queue drained within timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    def pending(self):
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+    def submit(self, text, image_path=None, camera_id=None, timestamp=None):
+        # timestamp defaults to now; replayed archives pass the original capture time
+        timestamp = timestamp or datetime.now().isoformat()
+        record = {
+            "id": uuid.uuid4().hex,
+            "timestamp": timestamp,
+            "camera_id": camera_id,
+            "image_path": image_path,
+            "content": text,
+        }
+        if self.store is not None:
+            self.store.add(text, timestamp, camera_id=camera_id, image_path=image_path,
+                           record_id=record["id"], status="pending")
+        with self._cond:
+            # Spool under the lock so a concurrent truncate cannot drop this record
+            self.spool.add(record)
+            self._pending.append(record)
+            self._cond.notify_all()
+        return record["id"]
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._stop_event.is_set())
+            if self._stop_event.is_set():
+                return []
+            if len(self._pending) < self.batch_size and self.batch_wait:
+                # Give a batch a moment to fill up
+                self._cond.wait_for(lambda: len(self._pending) >= self.batch_size
+                                    or self._stop_event.is_set(), self.batch_wait)
+            batch = self._pending[:self.batch_size]
+            del self._pending[:len(batch)]
+            self._in_flight = len(batch)
+            return batch
+
+    def _send(self, batch):
+        if not self.api_uri:
+            raise ValueError("API_URI not found in .env")
+        if self.batch_size == 1:
+            payload = build_payload(batch[0]["content"], batch[0]["timestamp"])
+        else:
+            payload = {"inputData": [build_payload(r["content"], r["timestamp"])["inputData"] for r in batch]}
+        if self.session is None:
+            self.session = make_session()
+        response = self.session.post(self.api_uri, json=payload, timeout=self.timeout)
+        if not response.ok:
+            raise RuntimeError(f"{response.status_code} {response.reason} - {response.text}")
+        return response
+
+    def _record(self, batch, status, error=None, response=None):
+        if self.store is not None:
+            self.store.set_status([r["id"] for r in batch], "sent" if status == "SUCCESS" else "error", error)
+            return
+        for record in batch:
+            entry = {"timestamp": record["timestamp"], "image_path": record["image_path"],
+                     "content": record["content"], "api_uri": self.api_uri, "status": status}
+            if error is not None:
+                entry["error"] = error
+            if response is not None:
+                entry["response"] = response
+            log_post(entry, self.log_path)
+
+    def _run(self):
+        delay = self.retry_delay
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                with metrics.POST_SECONDS.time():
+                    response = self._send(batch)
+            except Exception as e:
+                self.failures += 1
+                metrics.POST_FAILURES.inc()
+                print(f"Post Failed: {e}. Retrying {len(batch)} post(s) in {delay:.1f}s")
+                self._record(batch, "ERROR", error=str(e))
+                with self._cond:
+                    self._pending = batch + self._pending
+                    self._in_flight = 0
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+
+            delay = self.retry_delay
+            self.sent += len(batch)
+            metrics.POSTS_SENT.inc(len(batch))
+            print(f"API Post Success! ({len(batch)} record(s))")
+            self.spool.ack(batch)
+            self._record(batch, "SUCCESS", response=response.text)
+            with self._cond:
+                self._in_flight = 0
+                if not self._pending:
+                    self.spool.truncate()
+                self._cond.notify_all()
 
 if __name__ == "__main__":
     # Test
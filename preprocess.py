@@ -0,0 +1,154 @@
+import threading
+import cv2
+import numpy as np
+from change_detection import parse_regions
+
+class ModelProfile:
+    """
+    How to prepare images for one family of vision models.
+
+    mode is "letterbox" (fit into a size x size square, padding the rest) for
+    models with a fixed square input, or "resize" (longest side = size, both
+    sides rounded down to a multiple of `multiple`) for models that accept
+    variable resolutions.
+    """
+
+    def __init__(self, name, size, mode="resize", multiple=1, fmt="jpeg", quality=90):
+        self.name = name
+        self.size = size
+        self.mode = mode
+        self.multiple = multiple
+        self.fmt = fmt
+        self.quality = quality
+
+    def __repr__(self):
+        return f"ModelProfile({self.name}, {self.mode} {self.size}, {self.fmt} q{self.quality})"
+
+# Native input sizes of the vision encoders; sending more pixels than this only
+# costs encode, transfer and resize time.
+MODEL_PROFILES = {
+    "default": ModelProfile("default", 1024, "resize", fmt="jpeg", quality=95),
+    "llava": ModelProfile("llava", 336, "letterbox"),
+    "llava-phi3": ModelProfile("llava-phi3", 336, "letterbox"),
+    "llava-llama3": ModelProfile("llava-llama3", 336, "letterbox"),
+    "bakllava": ModelProfile("bakllava", 336, "letterbox"),
+    "moondream": ModelProfile("moondream", 378, "letterbox"),
+    "minicpm-v": ModelProfile("minicpm-v", 448, "resize", multiple=14),
+    "qwen2.5vl": ModelProfile("qwen2.5vl", 448, "resize", multiple=28),
+    "qwen2-vl": ModelProfile("qwen2-vl", 448, "resize", multiple=28),
+    "llama3.2-vision": ModelProfile("llama3.2-vision", 560, "letterbox"),
+    "gemma3": ModelProfile("gemma3", 896, "letterbox"),
+}
+
+def profile_for_model(model_id):
+    """
+    Picks the profile for an Ollama model ID such as "llava-phi3:3.8b".
+    Falls back to the longest matching prefix, then to "default".
+    """
+    base = model_id.split(":")[0].split("/")[-1].lower()
+    if base in MODEL_PROFILES:
+        return MODEL_PROFILES[base]
+    matches = [name for name in MODEL_PROFILES if base.startswith(name)]
+    if matches:
+        return MODEL_PROFILES[max(matches, key=len)]
+    return MODEL_PROFILES["default"]
+
+class Preprocessor:
+    """
+    Turns a captured Frame into the encoded image sent to the VLM:
+    optional crop to a region, resize or letterbox to the profile's input size,
+    then encode with the profile's format and quality.
+    Tracks per-profile bytes sent and VLM latency.
+    """
+
+    ENCODINGS = {
+        "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+        "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+        "png": (".png", None),
+    }
+
+    def __init__(self, profile, crop=None, fmt=None, quality=None, pad_color=(0, 0, 0)):
+        self.profile = profile
+        self.crop = parse_regions(crop)[0] if isinstance(crop, str) else crop
+        self.fmt = fmt or profile.fmt
+        self.quality = quality or profile.quality
+        self.pad_color = pad_color
+        if self.fmt not in self.ENCODINGS:
+            raise ValueError(f"Unsupported image format: {self.fmt}")
+
+        self.images = 0
+        self.bytes_sent = 0
+        self.vlm_calls = 0
+        self.vlm_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _crop(self, image):
+        if not self.crop:
+            return image
+        height, width = image.shape[:2]
+        x, y, w, h = self.crop
+        x1, y1 = int(x * width), int(y * height)
+        x2, y2 = int((x + w) * width), int((y + h) * height)
+        return image[max(0, y1):min(height, y2), max(0, x1):min(width, x2)]
+
+    def _resize(self, image):
+        profile = self.profile
+        height, width = image.shape[:2]
+        scale = min(1.0, profile.size / max(height, width))
+        new_width = max(1, int(width * scale))
+        new_height = max(1, int(height * scale))
+
+        if profile.mode == "letterbox":
+            if (new_width, new_height) != (width, height):
+                image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+            canvas = np.empty((profile.size, profile.size, 3), dtype=np.uint8)
+            canvas[:] = self.pad_color
+            top = (profile.size - new_height) // 2
+            left = (profile.size - new_width) // 2
+            canvas[top:top + new_height, left:left + new_width] = image
+            return canvas
+
+        if profile.multiple > 1:
+            new_width = max(profile.multiple, new_width // profile.multiple * profile.multiple)
+            new_height = max(profile.multiple, new_height // profile.multiple * profile.multiple)
+        if (new_width, new_height) != (width, height):
+            image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+        return image
+
+    def prepare(self, image, apply_crop=True):
+        """
+        Returns the cropped and resized image, before encoding.
+        """
+        return self._resize(self._crop(image) if apply_crop else image)
+
+    def process(self, frame, apply_crop=True):
+        """
+        Returns the encoded bytes to send to the VLM for a Frame (or BGR array).
+        With apply_crop=False the configured crop region is not applied.
+        """
+        image = getattr(frame, "image", frame)
+        prepared = self.prepare(image, apply_crop)
+        ext, flag = self.ENCODINGS[self.fmt]
+        params = [flag, int(self.quality)] if flag is not None else []
+        ok, buf = cv2.imencode(ext, prepared, params)
+        if not ok:
+            raise ValueError(f"Failed to encode image as {self.fmt}")
+        data = buf.tobytes()
+        with self._lock:
+            self.images += 1
+            self.bytes_sent += len(data)
+        return data
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self.vlm_calls += 1
+            self.vlm_seconds += seconds
+
+    def stats(self):
+        return {
+            "profile": self.profile.name,
+            "images": self.images,
+            "avg_bytes_sent": self.bytes_sent // self.images if self.images else 0,
+            "bytes_sent": self.bytes_sent,
+            "avg_vlm_seconds": round(self.vlm_seconds / self.vlm_calls, 3) if self.vlm_calls else None,
+        }
@@ -0,0 +1,231 @@
+import cv2
+import numpy as np
+
+from change_detection import build_mask
+from delta_prompt import IncrementalAnalyzer, FULL_REQUEST, merge_delta, split_sections
+from image_utils import Frame
+
+REGION_REQUEST = (
+    "The scene was last described as:\n{context}\n\n"
+    "The {count} attached image(s) are crops of the camera view showing only the areas that changed "
+    "since then. Describe only what changed."
+)
+
+def _union(a, b):
+    x1, y1 = min(a[0], b[0]), min(a[1], b[1])
+    x2, y2 = max(a[0] + a[2], b[0] + b[2]), max(a[1] + a[3], b[1] + b[3])
+    return (x1, y1, x2 - x1, y2 - y1)
+
+def _area(box):
+    return box[2] * box[3]
+
+def _overlaps(a, b, gap):
+    return (a[0] - gap < b[0] + b[2] and b[0] - gap < a[0] + a[2]
+            and a[1] - gap < b[1] + b[3] and b[1] - gap < a[1] + a[3])
+
+def merge_boxes(boxes, gap=0, max_boxes=None):
+    """
+    Merges (x, y, w, h) boxes that overlap or lie within gap pixels of each
+    other. With max_boxes, the pair whose union is smallest is merged until
+    at most max_boxes remain.
+    """
+    boxes = [tuple(int(v) for v in box) for box in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                if _overlaps(boxes[i], boxes[j], gap):
+                    boxes[i] = _union(boxes[i], boxes.pop(j))
+                    merged = True
+                    break
+            if merged:
+                break
+    while max_boxes and len(boxes) > max_boxes:
+        pairs = [(i, j) for i in range(len(boxes)) for j in range(i + 1, len(boxes))]
+        i, j = min(pairs, key=lambda p: _area(_union(boxes[p[0]], boxes[p[1]])))
+        boxes[i] = _union(boxes[i], boxes.pop(j))
+    return boxes
+
+class RegionExtractor:
+    """
+    Finds the parts of a frame that changed since a reference frame.
+
+    Works on a small blurred grayscale copy (width pixels wide): the
+    lighting-compensated difference to the reference is thresholded, cleaned
+    up with an opening and a dilation, and split into connected components.
+    Components smaller than min_area (fraction of the frame) are noise.
+    Nearby components are merged, and at most max_regions boxes are kept.
+    The boxes are then mapped back to full resolution and padded by pad (a
+    fraction of each box's size), to at least min_size pixels.
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, min_area=0.002, max_coverage=0.5, max_regions=1,
+                 pad=0.15, min_size=64, roi=None, ignore=None):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.max_coverage = max_coverage
+        self.max_regions = max(1, max_regions)
+        self.pad = pad
+        self.min_size = min_size
+        self.roi = roi
+        self.ignore = ignore
+        self.size = None
+        self.mask = None
+        self._reference = None
+        self._open_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self._dilate_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+    def _small(self, image):
+        height, width = image.shape[:2]
+        size = (self.width, max(1, round(self.width * height / width)))
+        if size != self.size:
+            self.size = size
+            self.mask = build_mask(size, self.roi, self.ignore)
+            self._reference = None
+        small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0).astype(np.float32)
+
+    def set_reference(self, image):
+        """
+        Makes image (e.g. the last frame described in full) the reference.
+        """
+        self._reference = self._small(image)
+
+    def find(self, image):
+        """
+        Returns the changed regions of image as full-resolution (x, y, w, h)
+        boxes, [] if nothing changed, or None if there is no reference yet or
+        the change covers too much of the frame for crops to help.
+        """
+        current = self._small(image)
+        if self._reference is None:
+            return None
+        diff = current - self._reference
+        # The median shift is a global lighting change as long as most of the scene is unchanged
+        diff -= self._median(diff)
+        np.abs(diff, out=diff)
+        binary = (diff > self.pixel_threshold).astype(np.uint8) * 255
+        if self.mask is not None:
+            cv2.bitwise_and(binary, self.mask, dst=binary)
+        binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, self._open_kernel)
+        binary = cv2.dilate(binary, self._dilate_kernel)
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        min_pixels = self.min_area * binary.size
+        boxes = [stats[i, :4] for i in range(1, count) if stats[i, cv2.CC_STAT_AREA] >= min_pixels]
+        if not boxes:
+            return []
+        boxes = merge_boxes(boxes, gap=2, max_boxes=self.max_regions)
+
+        height, width = image.shape[:2]
+        sx, sy = width / self.size[0], height / self.size[1]
+        regions = [self._to_full(box, sx, sy, width, height) for box in boxes]
+        regions = merge_boxes(regions)
+        covered = sum(_area(box) for box in regions)
+        if covered > self.max_coverage * width * height:
+            return None
+        return regions
+
+    def _median(self, values):
+        if self.mask is None:
+            return float(np.median(values))
+        return float(np.median(values[self.mask > 0]))
+
+    def _to_full(self, box, sx, sy, width, height):
+        x, y, w, h = box
+        x1, y1, x2, y2 = x * sx, y * sy, (x + w) * sx, (y + h) * sy
+        pad_x = max(self.pad * (x2 - x1), (self.min_size - (x2 - x1)) / 2, 0)
+        pad_y = max(self.pad * (y2 - y1), (self.min_size - (y2 - y1)) / 2, 0)
+        x1, x2 = int(max(0, x1 - pad_x)), int(min(width, x2 + pad_x))
+        y1, y2 = int(max(0, y1 - pad_y)), int(min(height, y2 + pad_y))
+        return (x1, y1, x2 - x1, y2 - y1)
+
+class RegionAnalyzer(IncrementalAnalyzer):
+    """
+    Sends only the changed parts of a frame to the VLM.
+
+    Each camera gets a full description first (and every refresh-th
+    analysis), and that frame becomes the reference of its RegionExtractor.
+    Later frames are compared with it; the changed regions are cropped from
+    the full-resolution frame and sent with the last full description as
+    context, and the reply is merged into that description like a delta.
+    When no region changed, the last description is returned without a
+    request. Changes too large for crops, and replies that cannot be merged,
+    get a full description instead.
+    """
+
+    MODES = ("full", "regions")
+
+    def __init__(self, analyzer, refresh=10, extractor_factory=None):
+        super().__init__(analyzer, refresh=refresh)
+        self.extractor_factory = extractor_factory or (lambda camera_id: RegionExtractor())
+        self.crops = 0
+        self.cropped_frames = 0
+        self.crop_fraction = 0.0
+        self._extractors = {}
+
+    def analyze(self, frame, camera_id=0):
+        """
+        Returns the full description of frame for camera_id.
+        """
+        with self._lock:
+            context = self._previous.get(camera_id)
+            since_full = self._since_full.get(camera_id, 0)
+            extractor = self._extractors.get(camera_id)
+            if extractor is None:
+                extractor = self._extractors[camera_id] = self.extractor_factory(camera_id)
+
+        image = frame.image
+        if context is not None and since_full < self.refresh:
+            boxes = extractor.find(image)
+            if boxes == []:
+                # No region changed against the reference: like a NO CHANGE reply, without asking
+                with self._lock:
+                    self.unchanged += 1
+                    self._since_full[camera_id] = since_full + 1
+                return context
+            if boxes:
+                crops = [Frame(np.ascontiguousarray(image[y:y + h, x:x + w]), timestamp=frame.timestamp)
+                         for x, y, w, h in boxes]
+                reply = self._ask("regions", crops, REGION_REQUEST.format(context=context, count=len(crops)))
+                if reply.startswith("Error"):
+                    return reply
+                description = merge_delta(context, reply)
+                if description is not None:
+                    height, width = image.shape[:2]
+                    with self._lock:
+                        self.crops += len(crops)
+                        self.cropped_frames += 1
+                        self.crop_fraction += sum(_area(box) for box in boxes) / (width * height)
+                        # The full description stays the context for the next crops
+                        self._since_full[camera_id] = since_full + 1
+                        if description is context:
+                            self.unchanged += 1
+                    return description
+                with self._lock:
+                    self.fallbacks += 1
+                print("Region reply could not be merged. Requesting a full description.")
+
+        description = self._ask("full", frame, FULL_REQUEST)
+        if description.startswith("Error"):
+            return description
+        extractor.set_reference(image)
+        with self._lock:
+            if split_sections(description) is None:
+                # Without headings there is nothing to merge crops into
+                self._previous.pop(camera_id, None)
+            else:
+                self._previous[camera_id] = description
+            self._since_full[camera_id] = 1
+        return description
+
+    def stats(self):
+        report = super().stats()
+        with self._lock:
+            report["crops"] = self.crops
+            frames = self.cropped_frames
+            report["avg_crop_fraction"] = round(self.crop_fraction / frames, 3) if frames else None
+        return report
@@ -0,0 +1,423 @@
+import argparse
+import bisect
+import collections
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+
+from analyzer import DEFAULT_PROMPT
+from change_detection import create_detector, DETECTORS
+from description_cache import prompt_hash
+from image_utils import Frame
+from retention import parse_capture_timestamp
+from storage import SegmentStore, read_frame
+
+# Frames a detector needs to see before its scores match a live run.
+# Detectors that compare against the previous frame only need one.
+WARMUP_FRAMES = {"background": 30}
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".m4v", ".webm")
+
+def list_captures(directory):
+    """
+    Returns (timestamp, camera_id, path or storage ref) for every capture in
+    a captures directory, in timestamp order: capture_{timestamp}.jpg files
+    and frames archived in segments. Multi-camera layouts ('cam{id}'
+    subdirectories) are read as well.
+    """
+    sources = [(0, directory)]
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith("cam") and name[3:].isdigit() and os.path.isdir(path):
+            sources.append((int(name[3:]), path))
+
+    items = []
+    for camera_id, path in sources:
+        for filename in os.listdir(path):
+            timestamp = parse_capture_timestamp(filename)
+            if timestamp is not None:
+                items.append((timestamp, camera_id, os.path.join(path, filename)))
+        store = SegmentStore(path, retention_seconds=float("inf"))
+        # Read-only: the live process may still be appending to the newest segment
+        if store.scan(repair=False):
+            items.extend((ts, camera_id, ref) for ts, _, ref in store.entries())
+    items.sort()
+    return items
+
+def list_video_frames(path, every=3.0, start_time=None):
+    """
+    Returns (timestamp, 0, frame_index) for one frame every `every` seconds of
+    a video file. Timestamps count from start_time (default: the file's
+    modification time minus its duration).
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if count <= 0:
+        raise ValueError(f"Cannot determine the frame count of {path}")
+    if start_time is None:
+        start_time = os.path.getmtime(path) - count / fps
+    step = max(1, int(round(every * fps)))
+    return [(start_time + index / fps, 0, index) for index in range(0, count, step)]
+
+def _chunks(items, start, size, warmup):
+    """
+    Splits items[start:] into chunks. Each chunk carries the frames just
+    before it (per camera) so its detectors start from the same state as a
+    sequential run would have.
+    """
+    for begin in range(start, len(items), size):
+        needed = collections.Counter()
+        lead = []
+        i = begin - 1
+        cameras = {item[1] for item in items[begin:begin + size]}
+        while i >= 0 and any(needed[cam] < warmup for cam in cameras):
+            cam = items[i][1]
+            if cam in cameras and needed[cam] < warmup:
+                needed[cam] += 1
+                lead.append(items[i])
+            i -= 1
+        lead.reverse()
+        yield lead, items[begin:begin + size]
+
+def _read_frames(kind, source, entries):
+    """
+    Yields (entry, Frame or None) for entries in order. Video frames are read
+    with one seek, skipping the frames in between without converting them.
+    """
+    if kind == "captures":
+        for entry in entries:
+            yield entry, read_frame(entry[2], timestamp=entry[0])
+        return
+
+    cap = cv2.VideoCapture(source)
+    position = None
+    try:
+        for entry in entries:
+            index = entry[2]
+            if position is None or index < position or index - position > 250:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                position = index
+            while position < index:
+                cap.grab()
+                position += 1
+            ok, image = cap.read()
+            position += 1
+            yield entry, Frame(image, timestamp=entry[0]) if ok else None
+    finally:
+        cap.release()
+
+def scan_chunk(task):
+    """
+    Runs change detection over one chunk in a worker process.
+    Returns the frames that pass the threshold; for video their JPEG bytes
+    are included since there is no file to read them back from.
+    """
+    detectors = {}
+    lead = task["lead"]
+    entries = lead + task["items"]
+    passed = []
+    for i, (entry, frame) in enumerate(_read_frames(task["kind"], task["source"], entries)):
+        if frame is None:
+            continue
+        camera_id = entry[1]
+        if camera_id not in detectors:
+            detectors[camera_id] = create_detector(task["detector"], roi=task["roi"], ignore=task["ignore"])
+        score = detectors[camera_id].update(frame)
+        if i >= len(lead) and score >= task["threshold"]:
+            data = frame.jpeg() if task["kind"] == "video" else None
+            passed.append((entry, score, data))
+    return {"last": task["items"][-1], "frames": len(task["items"]), "passed": passed}
+
+class ReplayCheckpoint:
+    """
+    Remembers the last replayed frame so an interrupted run continues there,
+    and the frames before it whose analysis failed so they are retried.
+    The fingerprint ties it to the source, model, prompt and detector; a
+    checkpoint written with different settings is ignored.
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+
+    def load(self):
+        """
+        Returns (last, failed): the last replayed item (None without a usable
+        checkpoint) and a list of (item, score) whose analysis failed.
+        """
+        if not os.path.exists(self.path):
+            return None, []
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except ValueError:
+            return None, []
+        if data.get("fingerprint") != self.fingerprint:
+            print(f"Checkpoint {self.path} was written with different settings. Starting over.")
+            return None, []
+        return tuple(data["last"]), [(tuple(item), score) for item, score in data.get("failed", [])]
+
+    def save(self, last, stats, failed=()):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"fingerprint": self.fingerprint, "last": list(last), "stats": stats,
+                       "failed": [[list(item), score] for item, score in failed]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+class JsonlSink:
+    """
+    Appends replay results to a JSONL file, synced before the checkpoint moves.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a")
+
+    def __call__(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+class PosterSink:
+    """
+    Submits replay results through a Poster, keeping the original capture time.
+    """
+
+    def __init__(self, poster):
+        self.poster = poster
+
+    def __call__(self, record):
+        self.poster.submit(record["content"], record["image_path"], camera_id=record["camera_id"],
+                           timestamp=record["timestamp"])
+
+    def close(self):
+        pass
+
+class ReplayAborted(Exception):
+    pass
+
+def run_replay(items, kind, source, analyzer, sink, prompt=DEFAULT_PROMPT, detector="mean", threshold=10.0,
+               roi=None, ignore=None, workers=None, analyze_workers=1, chunk_size=200,
+               checkpoint=None, max_failures=5):
+    """
+    Replays items (from list_captures or list_video_frames) in order.
+
+    Change detection runs in a pool of `workers` processes, chunk by chunk;
+    frames that pass go to the analyzer with at most analyze_workers requests
+    in flight. Results reach sink in timestamp order, and the checkpoint is
+    advanced only past frames whose result has been written. Failed analyses
+    are not written; the checkpoint keeps them and a resumed run analyzes
+    them again first.
+    Returns a stats dict.
+    """
+    start_time = time.monotonic()
+    stats = {"frames": 0, "passed": 0, "analyzed": 0, "failed": 0, "skipped_resume": 0}
+
+    start = 0
+    last, failed = checkpoint.load() if checkpoint is not None else (None, [])
+    if last is not None:
+        start = bisect.bisect_right([tuple(item) for item in items], last)
+        stats["skipped_resume"] = start
+        print(f"Resuming after {start} already replayed frame(s)")
+
+    warmup = WARMUP_FRAMES.get(detector, 1)
+    tasks = ({"kind": kind, "source": source, "lead": lead, "items": chunk, "detector": detector,
+              "roi": roi, "ignore": ignore, "threshold": threshold}
+             for lead, chunk in _chunks(items, start, chunk_size, warmup))
+
+    # Entries are (key, future or None, passed entry); results leave in this order
+    pending = collections.deque()
+    # Failed frames by key, with their score, until an analysis of them succeeds
+    state = {"last": last, "saved": time.monotonic(), "consecutive": 0, "failed": dict(failed)}
+
+    def analyze(entry, data):
+        if data is not None:
+            frame = Frame.from_bytes(data, timestamp=entry[0])
+        elif kind == "captures":
+            frame = read_frame(entry[2], timestamp=entry[0])
+        else:
+            # A retried video frame: nothing was kept from the earlier run
+            _, frame = next(_read_frames(kind, source, [entry]))
+        if frame is None:
+            return f"Error: Could not read frame {entry[2]}"
+        return analyzer.analyze(frame, prompt=prompt)
+
+    def save():
+        checkpoint.save(state["last"], stats, state["failed"].items())
+        state["saved"] = time.monotonic()
+
+    def drain(max_outstanding):
+        wrote = False
+        while pending:
+            key, future, passed = pending[0]
+            outstanding = sum(1 for _, f, _ in pending if f is not None)
+            if future is not None:
+                if not future.done() and outstanding <= max_outstanding:
+                    break
+                description = future.result()
+                entry, score, _ = passed
+                if description.startswith("Error"):
+                    # Not written anywhere; the checkpoint keeps the frame for the next run
+                    print(f"Analysis of {entry[2]} failed: {description}")
+                    state["failed"][key] = score
+                    state["consecutive"] += 1
+                    stats["failed"] += 1
+                    if state["consecutive"] >= max_failures:
+                        raise ReplayAborted(f"{max_failures} analyses in a row failed; last: {description}")
+                else:
+                    state["failed"].pop(key, None)
+                    state["consecutive"] = 0
+                    stats["analyzed"] += 1
+                    sink({
+                        "timestamp": datetime.fromtimestamp(entry[0]).isoformat(),
+                        "camera_id": entry[1],
+                        "image_path": entry[2] if kind == "captures" else f"{source}#frame={entry[2]}",
+                        "score": round(float(score), 3),
+                        "model": analyzer.model_id,
+                        "content": description,
+                    })
+                wrote = True
+            pending.popleft()
+            # Retried frames lie before the checkpoint; it never moves back
+            if state["last"] is None or key > state["last"]:
+                state["last"] = key
+        if checkpoint is not None and state["last"] is not None and (
+                wrote or time.monotonic() - state["saved"] > 2.0):
+            save()
+
+    def consume(result):
+        stats["frames"] += result["frames"]
+        for passed in result["passed"]:
+            stats["passed"] += 1
+            pending.append((passed[0], analyzers.submit(analyze, passed[0], passed[2]), passed))
+            drain(2 * analyze_workers)
+        pending.append((result["last"], None, None))
+        drain(2 * analyze_workers)
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as scanners, \
+            ThreadPoolExecutor(max_workers=analyze_workers) as analyzers:
+        scans = collections.deque()
+        try:
+            if failed:
+                print(f"Retrying {len(failed)} frame(s) whose analysis failed")
+            for key, score in failed:
+                pending.append((key, analyzers.submit(analyze, key, None), (key, score, None)))
+                drain(2 * analyze_workers)
+            for task in tasks:
+                scans.append(scanners.submit(scan_chunk, task))
+                # Keep a couple of chunks per worker ahead, not the whole archive
+                while len(scans) > 2 * workers or (scans and scans[0].done()):
+                    consume(scans.popleft().result())
+            while scans:
+                consume(scans.popleft().result())
+            drain(0)
+        finally:
+            for scan in scans:
+                scan.cancel()
+            for _, future, _ in pending:
+                if future is not None:
+                    future.cancel()
+            if checkpoint is not None and state["last"] is not None:
+                save()
+
+    stats["elapsed"] = round(time.monotonic() - start_time, 2)
+    return stats
+
+def replay_main(argv=None):
+    from main import add_vlm_arguments, build_analyzer
+    from poster import Poster
+
+    parser = argparse.ArgumentParser(prog="main.py replay",
+                                     description="Reprocess archived captures or a video file with the current model and prompt")
+    parser.add_argument("source", help="Captures directory (capture_{timestamp}.jpg files) or a video file")
+    add_vlm_arguments(parser)
+    parser.add_argument("--prompt-file", type=str, default=None, help="Text file with the prompt (default: the built-in prompt)")
+    parser.add_argument("--detector", type=str, default="mean", choices=list(DETECTORS), help="Change detector")
+    parser.add_argument("--diff-threshold", type=float, default=10.0, help="Difference threshold to skip analysis")
+    parser.add_argument("--roi", type=str, default=None, help="Region to watch: mask image path or 'x,y,w,h;...'")
+    parser.add_argument("--ignore", type=str, default=None, help="Region to ignore: mask image path or 'x,y,w,h;...'")
+    parser.add_argument("--every", type=float, default=3.0, help="Video only: seconds between sampled frames")
+    parser.add_argument("--start-time", type=float, default=None,
+                        help="Video only: epoch time of the first frame (default: file time minus duration)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for decoding and change detection (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=200, help="Frames per change detection task")
+    parser.add_argument("--output", type=str, default="replay_results.jsonl", help="JSONL file to append results to")
+    parser.add_argument("--post", action="store_true", help="Send results to the API instead of --output")
+    parser.add_argument("--spool-path", type=str, default="replay_spool.jsonl", help="With --post, file holding posts not yet delivered")
+    parser.add_argument("--checkpoint", type=str, default=None, help="Checkpoint file (default: next to --output)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--max-failures", type=int, default=5, help="Stop after this many failed analyses in a row")
+    args = parser.parse_args(argv)
+
+    prompt = DEFAULT_PROMPT
+    if args.prompt_file:
+        with open(args.prompt_file, "r") as f:
+            prompt = f.read()
+
+    if os.path.isdir(args.source):
+        kind, items = "captures", list_captures(args.source)
+    elif args.source.lower().endswith(VIDEO_EXTENSIONS):
+        kind, items = "video", list_video_frames(args.source, args.every, args.start_time)
+    else:
+        print(f"CRITICAL ERROR: {args.source} is neither a captures directory nor a video file")
+        return
+    print(f"Replaying {len(items)} frame(s) from {args.source}")
+    if not items:
+        return
+
+    try:
+        analyzer, preprocessor = build_analyzer(args)
+    except Exception as e:
+        print(f"CRITICAL ERROR: Failed to initialize analyzer. {e}")
+        return
+    analyzer.warm_up()
+
+    checkpoint_path = args.checkpoint or (args.spool_path if args.post else args.output) + ".checkpoint"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = ReplayCheckpoint(checkpoint_path, {
+        "source": os.path.abspath(args.source),
+        "model": args.model,
+        "prompt": prompt_hash(prompt),
+        "detector": args.detector,
+        "threshold": args.diff_threshold,
+        "roi": args.roi,
+        "ignore": args.ignore,
+    })
+
+    poster = None
+    if args.post:
+        poster = Poster(spool_path=args.spool_path).start()
+        sink = PosterSink(poster)
+    else:
+        sink = JsonlSink(args.output)
+
+    try:
+        stats = run_replay(items, kind, args.source, analyzer, sink, prompt=prompt, detector=args.detector,
+                           threshold=args.diff_threshold, roi=args.roi, ignore=args.ignore,
+                           workers=args.workers, analyze_workers=args.analyze_workers,
+                           chunk_size=args.chunk_size, checkpoint=checkpoint, max_failures=args.max_failures)
+        print(f"Replay finished: {stats}")
+    except ReplayAborted as e:
+        print(f"Replay stopped: {e}. Run again to continue from {checkpoint_path}")
+    except KeyboardInterrupt:
+        print(f"\nReplay interrupted. Run again to continue from {checkpoint_path}")
+    finally:
+        sink.close()
+        if poster is not None:
+            poster.stop()
+        print(f"VLM preprocessing: {preprocessor.stats()}")
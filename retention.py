@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from collections import deque
+
+def capture_filename(timestamp, seq, prefix="capture_", suffix=".jpg"):
+    """
+    Returns 'capture_{seconds}.{millis}_{seq}.jpg' for a capture. The
+    sequence number keeps captures taken in the same millisecond (a motion
+    burst and a periodic capture) apart.
+    """
+    return f"{prefix}{timestamp:.3f}_{seq}{suffix}"
+
+def parse_capture_timestamp(filename, prefix="capture_", suffix=".jpg"):
+    """
+    Returns the timestamp of a 'capture_{timestamp}.jpg' filename (an int)
+    or of a capture_filename() name (a float), or None if the name does not
+    match.
+    """
+    if not (filename.startswith(prefix) and filename.endswith(suffix)):
+        return None
+    stamp = filename[len(prefix):-len(suffix)].split("_", 1)[0]
+    if stamp.isdigit():
+        return int(stamp)
+    seconds, _, millis = stamp.partition(".")
+    if seconds.isdigit() and millis.isdigit():
+        return float(stamp)
+    return None
+
+class RetentionManager:
+    """
+    Deletes expired captures without rescanning the directory every cycle.
+
+    The directory is scanned once at startup into a deque ordered by capture
+    timestamp. New captures are appended with add(), and expire() pops from
+    the old end, so each call costs O(expired files). Optionally a disk budget
+    (max_bytes) is enforced by deleting the oldest captures first.
+    """
+
+    def __init__(self, directory, retention_seconds, max_bytes=None, prefix="capture_", suffix=".jpg"):
+        self.directory = directory
+        self.retention_seconds = retention_seconds
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.suffix = suffix
+
+        self.total_bytes = 0
+        self.reclaimed_files = 0
+        self.reclaimed_bytes = 0
+
+        self._entries = deque()  # (timestamp, path, size), oldest first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def scan(self):
+        """
+        Builds the index from the files already on disk. Call once at startup.
+        """
+        entries = []
+        if os.path.exists(self.directory):
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    timestamp = parse_capture_timestamp(entry.name, self.prefix, self.suffix)
+                    if timestamp is None or not entry.is_file():
+                        continue
+                    entries.append((timestamp, entry.path, entry.stat().st_size))
+        entries.sort()
+        with self._lock:
+            self._entries = deque(entries)
+            self.total_bytes = sum(e[2] for e in entries)
+        return len(entries)
+
+    def add(self, filepath, timestamp=None, size=None):
+        """
+        Records a newly written capture.
+        """
+        if timestamp is None:
+            timestamp = parse_capture_timestamp(os.path.basename(filepath), self.prefix, self.suffix)
+            if timestamp is None:
+                timestamp = int(time.time())
+        if size is None:
+            try:
+                size = os.path.getsize(filepath)
+            except OSError:
+                return
+        with self._lock:
+            if self._entries and self._entries[-1][1] == filepath:
+                # Same-second capture overwrote the previous file
+                self.total_bytes -= self._entries[-1][2]
+                self._entries.pop()
+            entry = (timestamp, filepath, size)
+            if not self._entries or timestamp >= self._entries[-1][0]:
+                self._entries.append(entry)
+            else:
+                # Out-of-order timestamp (e.g. clock adjustment); insert in place
+                index = len(self._entries)
+                while index > 0 and self._entries[index - 1][0] > timestamp:
+                    index -= 1
+                self._entries.insert(index, entry)
+            self.total_bytes += size
+
+    def expire(self, now=None):
+        """
+        Deletes captures older than the retention period, then the oldest
+        captures until the disk budget is met.
+        Returns (files_deleted, bytes_reclaimed) for this call.
+        """
+        if now is None:
+            now = time.time()
+        cutoff = now - self.retention_seconds
+        files = 0
+        reclaimed = 0
+        with self._lock:
+            while self._entries:
+                timestamp, filepath, size = self._entries[0]
+                over_budget = self.max_bytes is not None and self.total_bytes > self.max_bytes
+                if timestamp >= cutoff and not over_budget:
+                    break
+                self._entries.popleft()
+                self.total_bytes -= size
+                try:
+                    os.remove(filepath)
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    print(f"Error deleting {filepath}: {e}")
+                    continue
+                files += 1
+                reclaimed += size
+            self.reclaimed_files += files
+            self.reclaimed_bytes += reclaimed
+        return files, reclaimed
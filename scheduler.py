@@ -0,0 +1,87 @@
+import threading
+import time
+from pipeline import SheddingQueue
+
+class AnalysisScheduler:
+    """
+    Shares one analyzer between several cameras.
+
+    Each camera gets its own bounded SheddingQueue, so a busy camera only
+    sheds its own frames. get() picks the next job across cameras by policy:
+    - "round-robin": cameras take turns
+    - "highest-score": the queued job with the largest change score
+    - "min-rate": a camera not analyzed for min_interval seconds goes first
+      (most overdue first); otherwise highest-score
+    The scheduler can be used as the inbox of a pipeline Stage.
+    """
+
+    POLICIES = ("round-robin", "highest-score", "min-rate")
+
+    def __init__(self, camera_ids, policy="round-robin", min_interval=30.0,
+                 maxsize=1, shed_policy="drop-oldest", deadline=None, name="analyze"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        self.policy = policy
+        self.min_interval = min_interval
+        self.name = name
+        self.camera_ids = list(camera_ids)
+        self.queues = {
+            cam: SheddingQueue(maxsize, shed_policy, deadline, name=f"{name}-{cam}")
+            for cam in self.camera_ids
+        }
+        self.served = {cam: 0 for cam in self.camera_ids}
+        self._last_served = {cam: time.monotonic() for cam in self.camera_ids}
+        self._turn = 0
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return sum(len(q) for q in self.queues.values())
+
+    @property
+    def dropped(self):
+        return sum(q.dropped for q in self.queues.values())
+
+    @property
+    def expired(self):
+        return sum(q.expired for q in self.queues.values())
+
+    def put(self, job, timeout=None):
+        accepted = self.queues[job.camera_id].put(job, timeout)
+        with self._cond:
+            self._cond.notify_all()
+        return accepted
+
+    def _order(self):
+        """
+        Returns the cameras in the order they should be tried.
+        """
+        if self.policy == "round-robin":
+            n = len(self.camera_ids)
+            return [self.camera_ids[(self._turn + i) % n] for i in range(n)]
+
+        scored = [(cam, self.queues[cam].max_score()) for cam in self.camera_ids]
+        scored = [(cam, score) for cam, score in scored if score is not None]
+        by_score = [cam for cam, _ in sorted(scored, key=lambda item: item[1], reverse=True)]
+        if self.policy == "min-rate":
+            now = time.monotonic()
+            overdue = [cam for cam in by_score if now - self._last_served[cam] >= self.min_interval]
+            overdue.sort(key=lambda cam: self._last_served[cam])
+            by_score = overdue + [cam for cam in by_score if cam not in overdue]
+        return by_score
+
+    def get(self, timeout=None):
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for cam in self._order():
+                    job = self.queues[cam].get(timeout=0)
+                    if job is not None:
+                        self._turn = (self.camera_ids.index(cam) + 1) % len(self.camera_ids)
+                        self._last_served[cam] = time.monotonic()
+                        self.served[cam] += 1
+                        return job
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                # put() notifies; the short cap also picks up deadline expiry
+                self._cond.wait(0.1 if remaining is None else min(remaining, 0.1))
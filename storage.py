@@ -0,0 +1,320 @@
+import mmap
+import os
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from image_utils import Frame
+
+KEYFRAME = 0
+THUMBNAIL = 1
+
+# One index record per stored frame: timestamp, offset, length, kind
+INDEX_RECORD = struct.Struct("<dQIB3x")
+INDEX_DTYPE = np.dtype([("ts", "<f8"), ("offset", "<u8"), ("length", "<u4"), ("kind", "u1"), ("pad", "V3")])
+
+SEGMENT_PREFIX = "seg_"
+
+def make_ref(data_path, offset, length):
+    return f"{data_path}#{offset}:{length}"
+
+def parse_ref(ref):
+    """
+    Splits 'path/seg_123.dat#offset:length' into (path, offset, length),
+    or returns None for a plain file path.
+    """
+    path, sep, span = ref.rpartition("#")
+    if not sep or ":" not in span:
+        return None
+    offset, length = span.split(":", 1)
+    if not (offset.isdigit() and length.isdigit()):
+        return None
+    return path, int(offset), int(length)
+
+_maps = {}
+_maps_lock = threading.Lock()
+
+def read_ref(ref):
+    """
+    Returns the bytes of a stored frame through a memory map of its segment.
+    Works in any process, without a SegmentStore. Plain paths are read as files.
+    """
+    parsed = parse_ref(ref)
+    if parsed is None:
+        with open(ref, "rb") as f:
+            return f.read()
+    path, offset, length = parsed
+    with _maps_lock:
+        cached = _maps.get(path)
+        if cached is None or cached[0] < offset + length:
+            # Remap when the active segment has grown past the cached mapping
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < offset + length:
+                    raise ValueError(f"Reference past the end of {path}")
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if cached is not None:
+                cached[1].close()
+            if len(_maps) >= 64:
+                _, oldest = _maps.pop(next(iter(_maps)))
+                oldest.close()
+            cached = _maps[path] = (size, mapped)
+        return cached[1][offset:offset + length]
+
+def forget_segment(path):
+    with _maps_lock:
+        cached = _maps.pop(path, None)
+    if cached is not None:
+        cached[1].close()
+
+def read_frame(ref, timestamp=None):
+    """
+    Loads a stored frame (or a plain image file) as a Frame, or None.
+    """
+    try:
+        data = read_ref(ref)
+    except (OSError, ValueError):
+        return None
+    return Frame.from_bytes(data, timestamp=timestamp, path=ref)
+
+class Segment:
+    def __init__(self, data_path, start):
+        self.data_path = data_path
+        self.index_path = data_path[:-4] + ".idx"
+        self.start = start
+        self.end = start
+        self.count = 0
+        self.bytes = 0
+
+    def load_index(self):
+        """
+        Returns the index records as a numpy structured array. A trailing
+        partial record (still being written) is ignored.
+        """
+        if not os.path.exists(self.index_path):
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        with open(self.index_path, "rb") as f:
+            data = f.read()
+        usable = len(data) - len(data) % INDEX_RECORD.size
+        return np.frombuffer(data[:usable], dtype=INDEX_DTYPE)
+
+class SegmentStore:
+    """
+    Archives frames in append-only segment files instead of one JPEG per capture.
+
+    Frames that pass change detection (keyframes) are stored at full
+    resolution. Skipped frames are stored as small thumbnails, at full
+    resolution, or not at all, depending on `skipped`. Each segment covers
+    segment_seconds: seg_{start}.dat holds the encoded images back to back
+    and seg_{start}.idx holds one fixed-size record per frame. Frames are read
+    back through memory maps.
+
+    Retention deletes whole segments, so expiring 48 hours of captures is a
+    few unlinks instead of tens of thousands. Same interface as
+    RetentionManager: expire() returns (files, bytes) and the reclaimed_*
+    counters track totals.
+    """
+
+    SKIPPED_MODES = ("thumbnail", "drop", "full")
+
+    def __init__(self, directory, retention_seconds, max_bytes=None, segment_seconds=600,
+                 skipped="thumbnail", thumbnail_size=320, thumbnail_quality=70):
+        if skipped not in self.SKIPPED_MODES:
+            raise ValueError(f"Unknown mode for skipped frames: {skipped}")
+        self.directory = os.path.join(directory, "segments")
+        self.retention_seconds = retention_seconds
+        self.max_bytes = max_bytes
+        self.segment_seconds = segment_seconds
+        self.skipped = skipped
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_quality = thumbnail_quality
+
+        self.total_bytes = 0
+        self.reclaimed_files = 0
+        self.reclaimed_bytes = 0
+        self.written = {KEYFRAME: 0, THUMBNAIL: 0, "dropped": 0}
+
+        self._segments = []  # oldest first; the last one is appended to
+        self._active = None
+        self._data_file = None
+        self._index_file = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(segment.count for segment in self._segments)
+
+    def scan(self, repair=True):
+        """
+        Loads the segment list. Call once at startup. Returns the number of
+        stored frames. With repair, index records torn by a crash are cut
+        off; readers of a store that is still being written pass False.
+        """
+        if not os.path.isdir(self.directory):
+            if not repair:
+                return 0
+            os.makedirs(self.directory)
+        segments = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith(SEGMENT_PREFIX) and name.endswith(".dat")):
+                continue
+            try:
+                start = float(name[len(SEGMENT_PREFIX):-4])
+            except ValueError:
+                continue
+            segment = Segment(os.path.join(self.directory, name), start)
+            self._check(segment, repair)
+            segments.append(segment)
+        segments.sort(key=lambda s: s.start)
+        with self._lock:
+            self._segments = segments
+            self.total_bytes = sum(s.bytes for s in segments)
+        return len(self)
+
+    def _check(self, segment, repair):
+        data_size = os.path.getsize(segment.data_path)
+        index_size = os.path.getsize(segment.index_path) if os.path.exists(segment.index_path) else 0
+        valid = index_size // INDEX_RECORD.size
+        records = segment.load_index()[:valid]
+        if len(records):
+            ends = records["offset"] + records["length"]
+            valid = int(np.argmax(ends > data_size)) if (ends > data_size).any() else len(records)
+            records = records[:valid]
+        if repair and valid * INDEX_RECORD.size != index_size:
+            with open(segment.index_path, "ab") as f:
+                f.truncate(valid * INDEX_RECORD.size)
+        segment.count = len(records)
+        segment.end = float(records["ts"][-1]) if len(records) else segment.start
+        segment.bytes = data_size + valid * INDEX_RECORD.size
+
+    def _roll(self, timestamp):
+        self._seal()
+        start = int(timestamp)
+        data_path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{start}.dat")
+        segment = Segment(data_path, start)
+        if self._segments and self._segments[-1].data_path == data_path:
+            # Restarted within the same second: keep appending to that segment
+            segment = self._segments.pop()
+        self._data_file = open(segment.data_path, "ab")
+        self._index_file = open(segment.index_path, "ab")
+        self._segments.append(segment)
+        self._active = segment
+
+    def _seal(self):
+        if self._active is None:
+            return
+        for f in (self._data_file, self._index_file):
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+        self._active = None
+
+    def _encode(self, frame, keyframe):
+        if keyframe or self.skipped == "full":
+            return frame.jpeg(), KEYFRAME
+        if self.skipped == "drop":
+            return None, None
+        image = frame.image
+        height, width = image.shape[:2]
+        scale = self.thumbnail_size / max(height, width)
+        if scale < 1:
+            image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.thumbnail_quality])
+        if not ok:
+            raise ValueError("Failed to encode thumbnail")
+        return buf.tobytes(), THUMBNAIL
+
+    def put(self, frame, keyframe, timestamp=None):
+        """
+        Archives a frame. Returns its reference (usable with read_ref and
+        read_frame), or None if skipped frames are dropped.
+        """
+        data, kind = self._encode(frame, keyframe)
+        if data is None:
+            self.written["dropped"] += 1
+            return None
+        timestamp = frame.timestamp if timestamp is None else timestamp
+        with self._lock:
+            if self._active is None or timestamp >= self._active.start + self.segment_seconds:
+                self._roll(timestamp)
+            segment = self._active
+            offset = self._data_file.tell()
+            self._data_file.write(data)
+            # Data before index, so a torn write never indexes missing bytes
+            self._data_file.flush()
+            self._index_file.write(INDEX_RECORD.pack(timestamp, offset, len(data), kind))
+            self._index_file.flush()
+            segment.count += 1
+            segment.end = max(segment.end, timestamp)
+            segment.bytes += len(data) + INDEX_RECORD.size
+            self.total_bytes += len(data) + INDEX_RECORD.size
+            self.written[kind] += 1
+        return make_ref(segment.data_path, offset, len(data))
+
+    def entries(self, start=None, end=None, kinds=(KEYFRAME, THUMBNAIL)):
+        """
+        Yields (timestamp, kind, ref) for stored frames in time order.
+        """
+        with self._lock:
+            segments = list(self._segments)
+        for segment in segments:
+            if start is not None and segment.end < start:
+                continue
+            if end is not None and segment.start >= end:
+                break
+            for record in segment.load_index()[:segment.count]:
+                ts = float(record["ts"])
+                if (start is not None and ts < start) or (end is not None and ts >= end):
+                    continue
+                if int(record["kind"]) in kinds:
+                    yield ts, int(record["kind"]), make_ref(segment.data_path, int(record["offset"]),
+                                                            int(record["length"]))
+
+    def expire(self, now=None):
+        """
+        Deletes segments whose newest frame is past the retention period, then
+        the oldest segments until the disk budget is met. The segment being
+        written is never deleted. Returns (files_deleted, bytes_reclaimed).
+        """
+        if now is None:
+            now = time.time()
+        cutoff = now - self.retention_seconds
+        files = 0
+        reclaimed = 0
+        with self._lock:
+            while self._segments and self._segments[0] is not self._active:
+                segment = self._segments[0]
+                over_budget = self.max_bytes is not None and self.total_bytes > self.max_bytes
+                if segment.end >= cutoff and not over_budget:
+                    break
+                self._segments.pop(0)
+                self.total_bytes -= segment.bytes
+                forget_segment(segment.data_path)
+                for path in (segment.data_path, segment.index_path):
+                    try:
+                        os.remove(path)
+                        files += 1
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        print(f"Error deleting {path}: {e}")
+                reclaimed += segment.bytes
+            self.reclaimed_files += files
+            self.reclaimed_bytes += reclaimed
+        return files, reclaimed
+
+    def close(self):
+        with self._lock:
+            self._seal()
+
+    def stats(self):
+        return {
+            "segments": len(self._segments),
+            "keyframes": self.written[KEYFRAME],
+            "thumbnails": self.written[THUMBNAIL],
+            "dropped": self.written["dropped"],
+            "bytes": self.total_bytes,
+        }
@@ -0,0 +1,48 @@
+import os
+import tempfile
+from bench import (run_pipeline_benchmark, run_prompt_benchmark, run_memory_benchmark, synthetic_frames,
+                   populate_captures, percentile)
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([], 50) is None
+
+def test_populate_captures():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        assert populate_captures(temp_dir, hours=0.1, interval=3) == 120
+        assert len(os.listdir(temp_dir)) == 120
+
+def test_pipeline_benchmark_smoke():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        report = run_pipeline_benchmark(synthetic_frames(30, 320, 240), fps=60, detector="tile",
+                                        vlm_first_token=0.01, post_latency=0.0, workdir=temp_dir)
+    assert report["frames"] == 30
+    for stage in ("capture", "diff", "analyze", "post", "cleanup"):
+        assert stage in report["stages"], f"Missing stage {stage}"
+    assert report["analyzed"] >= 1 and report["posted"] == report["stages"]["post"]["count"]
+    print(f"TEST PASSED: Benchmark report: {report['stages']}")
+
+def test_prompt_benchmark_smoke():
+    report = run_prompt_benchmark(synthetic_frames(6, 160, 120), vlm_first_token=0.0, vlm_token_delay=0.001)
+    assert report["full"]["calls"] == report["delta"]["calls"] == 6
+    assert report["delta"]["avg_tokens"] < report["full"]["avg_tokens"]
+    assert "vlm_full" in report["stages"] and "vlm_delta" in report["stages"]
+    print(f"TEST PASSED: Prompt mode report: {report['full']} vs {report['delta']}")
+
+def test_memory_benchmark_smoke():
+    report = run_memory_benchmark(synthetic_frames(4, 320, 240), count=200, max_dim=160)
+    assert report["unpooled"]["frames"] == report["pooled"]["frames"] == 200
+    assert report["unpooled"]["arrays_allocated"] >= 200
+    assert report["pooled"]["arrays_allocated"] < 20, "Buffers are reused instead of allocated per frame"
+    assert report["pooled"]["pool"]["reused"] > 0
+    print(f"TEST PASSED: Memory report: {report['unpooled']} vs {report['pooled']}")
+
+if __name__ == "__main__":
+    test_percentile()
+    test_populate_captures()
+    test_pipeline_benchmark_smoke()
+    test_prompt_benchmark_smoke()
+    test_memory_benchmark_smoke()
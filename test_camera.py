@@ -0,0 +1,129 @@
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import camera
+from camera import BackendCache, CameraSession, open_camera
+
+class FakeCapture:
+    """
+    Stands in for cv2.VideoCapture. Returns numbered frames and can be told
+    to start failing after a number of reads. Like cv2, read(image) writes
+    into image when its shape matches. While paused is set, read() waits
+    before taking a frame.
+    """
+    def __init__(self, fail_after=None):
+        self.reads = 0
+        self.fail_after = fail_after
+        self.released = False
+        self.paused = threading.Event()
+
+    def read(self, image=None):
+        while self.paused.is_set():
+            time.sleep(0.001)
+        self.reads += 1
+        if self.fail_after is not None and self.reads > self.fail_after:
+            return False, None
+        time.sleep(0.005)
+        if image is not None and image.shape == (48, 64, 3):
+            image[:] = self.reads % 256
+            return True, image
+        return True, np.full((48, 64, 3), self.reads % 256, dtype=np.uint8)
+
+    def release(self):
+        self.released = True
+
+class FakeSession(CameraSession):
+    def __init__(self, captures, **kwargs):
+        super().__init__(**kwargs)
+        self.captures = list(captures)
+        self.opens = 0
+
+    def _open(self):
+        self.opens += 1
+        if not self.captures:
+            return None, None
+        return self.captures.pop(0), "fake"
+
+def test_session_returns_latest_frame():
+    capture = FakeCapture()
+    with FakeSession([capture], warmup_frames=2) as session:
+        frame, ts = session.read(timeout=2)
+        assert frame is not None, "Expected a frame from the session"
+        assert frame.shape == (48, 64, 3)
+
+        # Reading again returns the newer frame already grabbed, without touching the camera
+        time.sleep(0.05)
+        capture.paused.set()
+        try:
+            reads = capture.reads
+            frame2, ts2 = session.read(timeout=2)
+            assert ts2 > ts, "Expected a newer frame"
+            assert capture.reads == reads, "read() should not wait for the camera"
+        finally:
+            capture.paused.clear()
+    assert session.opens == 1, "Camera should only be opened once"
+    print("TEST PASSED: Session keeps camera open and returns latest frame.")
+
+def test_session_reconnects_after_failure():
+    first = FakeCapture(fail_after=3)
+    second = FakeCapture()
+    session = FakeSession([first, second], warmup_frames=0, max_failures=2,
+                          reconnect_delay=0.01, max_reconnect_delay=0.05)
+    with session:
+        deadline = time.monotonic() + 3
+        while session.reconnects == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        frame, _ = session.read(timeout=2, max_age=1)
+        assert frame is not None, "Expected frames after reconnect"
+    assert first.released, "Failed capture should be released"
+    assert session.reconnects >= 1, "Expected at least one reconnect"
+    print("TEST PASSED: Session reconnects after camera failure.")
+
+def test_session_read_timeout_without_camera():
+    with FakeSession([], reconnect_delay=0.01, max_reconnect_delay=0.02) as session:
+        frame, ts = session.read(timeout=0.1)
+        assert frame is None and ts is None
+    assert session.opens >= 2, "Expected repeated open attempts with backoff"
+    print("TEST PASSED: Session times out cleanly when no camera is available.")
+
+def test_backend_cache_skips_failing_probe():
+    attempts = []
+
+    def opener(name, works):
+        def open_backend(index):
+            attempts.append(name)
+            return FakeCapture() if works else None
+        return open_backend
+
+    original = dict(camera.CAMERA_BACKENDS)
+    camera.CAMERA_BACKENDS.update(gstreamer=opener("gstreamer", False), v4l2=opener("v4l2", True))
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "camera_backend.json")
+            session = CameraSession(sensor_id=0, device=2, warmup_frames=0, backend_cache=BackendCache(path))
+            with session:
+                assert session.read(timeout=2)[0] is not None
+            assert attempts[:2] == ["gstreamer", "v4l2"], "First start probes GStreamer first"
+            assert session.opened_at is not None and session.first_frame_at >= session.opened_at
+
+            attempts.clear()
+            # Next start: the cached backend is tried first and the probe is skipped
+            assert BackendCache(path).get(0, 2) == "v4l2"
+            cap, backend = open_camera(sensor_id=0, device=2, prefer=BackendCache(path).get(0, 2))
+            assert backend == "v4l2" and attempts == ["v4l2"]
+            # A stale entry still falls back to the other backend
+            attempts.clear()
+            camera.CAMERA_BACKENDS["v4l2"] = opener("v4l2", False)
+            camera.CAMERA_BACKENDS["gstreamer"] = opener("gstreamer", True)
+            assert open_camera(prefer="v4l2")[1] == "gstreamer" and attempts == ["v4l2", "gstreamer"]
+    finally:
+        camera.CAMERA_BACKENDS.update(original)
+    print("TEST PASSED: The last working camera backend is tried first.")
+
+if __name__ == "__main__":
+    test_session_returns_latest_frame()
+    test_session_reconnects_after_failure()
+    test_session_read_timeout_without_camera()
+    test_backend_cache_skips_failing_probe()
@@ -0,0 +1,99 @@
+import threading
+import time
+from capture_scheduler import CaptureScheduler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def make_scheduler(clock, **kwargs):
+    kwargs.setdefault("min_interval", 1.0)
+    kwargs.setdefault("max_interval", 20.0)
+    kwargs.setdefault("idle_after", 5.0)
+    return CaptureScheduler(3.0, clock=clock, sleep=clock.sleep, **kwargs)
+
+def test_deadlines_do_not_drift():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, min_interval=3.0, max_interval=3.0)
+    fired = []
+    for _ in range(5):
+        scheduler.wait()
+        fired.append(clock.now)
+        clock.now += 0.7  # capture and processing time
+    assert fired == [1000.0, 1003.0, 1006.0, 1009.0, 1012.0], fired
+    assert scheduler.effective_rate() == 20.0
+    print("TEST PASSED: Processing time does not stretch the capture period.")
+
+def test_overrun_skips_missed_ticks():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, min_interval=3.0, max_interval=3.0)
+    scheduler.wait()
+    clock.now += 10.0  # one cycle took longer than three periods
+    scheduler.wait()
+    assert clock.sleeps == []
+    # The overdue tick fires late; the two after it are dropped
+    assert scheduler.missed == 2
+    scheduler.wait()
+    assert clock.now == 1012.0, "Next tick stays on the original grid"
+    print("TEST PASSED: Overruns skip ticks instead of bursting.")
+
+def test_activity_speeds_up_and_static_scene_backs_off():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.report(50.0, 10.0)
+    scheduler.wait()
+    assert scheduler.current == 1.0, "Active scenes use the fastest interval"
+
+    intervals = []
+    for _ in range(12):
+        scheduler.report(0.5, 10.0)
+        scheduler.wait()
+        intervals.append(scheduler.current)
+    assert intervals[0] == 1.0, "Stays fast until the scene has been quiet for idle_after"
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == 20.0
+
+    last = clock.now
+    scheduler.report(40.0, 10.0)
+    scheduler.wait()
+    assert clock.now == last + 1.0, "Activity cuts the idle wait short"
+    assert scheduler.current == 1.0
+    print("TEST PASSED: Capture rate follows scene activity.")
+
+def test_backlog_blocks_speed_up():
+    clock = FakeClock()
+    backlog = {"depth": 1}
+    scheduler = make_scheduler(clock, backlog=lambda: backlog["depth"])
+    scheduler.report(50.0, 10.0)
+    scheduler.wait()
+    assert scheduler.current == 3.0, "No faster than the base interval while analysis is behind"
+    backlog["depth"] = 0
+    scheduler.wait()
+    assert scheduler.current == 1.0
+    print("TEST PASSED: Analysis backlog holds capture at the base rate.")
+
+def test_report_wakes_a_waiting_cycle():
+    scheduler = CaptureScheduler(3.0, min_interval=0.05, max_interval=30.0, idle_after=0.0)
+    scheduler.wait()
+    scheduler.wait()  # static scene: the next deadline is pushed out
+    assert scheduler.current > 3.0
+    start = time.monotonic()
+    threading.Timer(0.1, scheduler.report, args=(50.0, 10.0)).start()
+    scheduler.wait()
+    assert time.monotonic() - start < 1.0
+    print("TEST PASSED: A detected change wakes the capture loop early.")
+
+if __name__ == "__main__":
+    test_deadlines_do_not_drift()
+    test_overrun_skips_missed_ticks()
+    test_activity_speeds_up_and_static_scene_backs_off()
+    test_backlog_blocks_speed_up()
+    test_report_wakes_a_waiting_cycle()
@@ -0,0 +1,104 @@
+import tempfile
+import numpy as np
+from cascade import BlobCounter, Cascade, person_shaped
+from image_utils import Frame
+from main import gate_frame
+from pipeline import FrameJob
+from storage import KEYFRAME, THUMBNAIL, SegmentStore
+
+def scene(timestamp, boxes=(), seed=0):
+    """
+    A textured static background with solid white boxes (x, y, w, h) on top.
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((240, 320, 3), 90, dtype=np.uint8)
+    image[:, ::16] = 60
+    image += rng.integers(0, 3, image.shape, dtype=np.uint8)
+    for x, y, w, h in boxes:
+        image[y:y + h, x:x + w] = 250
+    return Frame(image, timestamp=timestamp)
+
+def warmed(tiers, **kwargs):
+    cascade = Cascade(tiers=tiers, **kwargs)
+    for i in range(20):
+        cascade.observe(scene(i, seed=i))
+    return cascade
+
+def test_blob_counter_finds_foreground():
+    counter = BlobCounter()
+    for i in range(20):
+        blobs, foreground = counter.apply(scene(i, seed=i).image)
+    assert blobs == [] and foreground == 0.0, "Sensor noise is background"
+    blobs, foreground = counter.apply(scene(20, boxes=[(100, 60, 40, 120)]).image)
+    assert len(blobs) == 1 and 0.04 < foreground < 0.08
+    assert person_shaped(blobs, counter.size[1]), "A tall upright blob looks like a standing person"
+    assert not person_shaped([(0, 0, 40, 20)], counter.size[1])
+    print(f"TEST PASSED: Foreground blobs are found ({blobs}, {foreground:.3f}).")
+
+def test_motion_tier_skips_frames_without_foreground():
+    cascade = warmed(["motion"], refresh=60)
+    assert cascade.route(scene(100, seed=1)) == Cascade.LARGE, "The first frame of a camera is always described"
+    assert cascade.route(scene(101, seed=2)) == Cascade.SKIP
+    assert cascade.route(scene(102, boxes=[(10, 10, 30, 30)])) == Cascade.LARGE, "Only escalation tiers pick the small model"
+    assert cascade.route(scene(200, seed=3)) == Cascade.LARGE, "A camera is described again after refresh seconds"
+
+    stats = cascade.stats()
+    assert stats["vlm_calls_avoided"] == 1 and stats["routes"][Cascade.LARGE] == 3
+    assert stats["tiers"]["motion"]["runs"] == 4 and stats["tiers"]["motion"]["hits"] == 1
+    print(f"TEST PASSED: Frames without foreground skip the VLM ({stats}).")
+
+def test_escalation_tiers_pick_the_model():
+    cascade = warmed(["motion", "person", "objects"], escalate_foreground=0.1)
+    cascade.person_detector = None  # The blob-shape check, whatever this OpenCV build has
+    assert cascade.route(scene(100, seed=1)) == Cascade.SMALL, "An empty scene goes to the small model"
+    assert cascade.route(scene(101, boxes=[(20, 20, 40, 30)])) == Cascade.SMALL, "So does a small object"
+    assert cascade.route(scene(102, boxes=[(100, 40, 40, 150)])) == Cascade.LARGE, "A person escalates"
+    assert cascade.route(scene(103, boxes=[(0, 0, 200, 100)])) == Cascade.LARGE, "A lot of foreground escalates"
+
+    stats = cascade.stats()
+    assert stats["tiers"]["person"]["hits"] == 1 and stats["tiers"]["objects"]["hits"] == 1
+    assert stats["tiers"]["objects"]["runs"] == 3, "Frames already escalated skip the later tiers"
+    assert stats["tiers"]["person"]["avg_ms"] is not None
+    print(f"TEST PASSED: People and busy scenes escalate to the large model ({stats}).")
+
+def test_person_detector_and_cameras():
+    class FakeDetector:
+        def detect(self, image):
+            return [(0, 0, 10, 20)] if image[0, 0, 0] == 0 else []
+
+    cascade = warmed(["person"], person_detector=FakeDetector())
+    dark = scene(100)
+    dark.image[0, 0] = 0
+    assert cascade.route(dark, camera_id=0) == Cascade.LARGE
+    assert cascade.route(scene(101), camera_id=1) == Cascade.SMALL
+    assert set(cascade._counters) == {0, 1}, "Each camera has its own background model"
+
+    try:
+        Cascade(tiers=["motion", "faces"])
+        assert False, "Unknown tiers are rejected"
+    except ValueError:
+        pass
+    print("TEST PASSED: The person detector escalates and cameras are tracked separately.")
+
+def test_skipped_frames_are_archived_as_thumbnails():
+    cascade = warmed(["motion"], refresh=60)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = SegmentStore(temp_dir, retention_seconds=3600)
+        store.scan()
+        kept, skipped, below = FrameJob(scene(100, seed=1)), FrameJob(scene(101, seed=2)), FrameJob(scene(102, seed=3))
+        kept.score = skipped.score = 30.0
+        below.score = 1.0
+        assert gate_frame(kept, 10.0, cascade=cascade, store=store) is kept and kept.tier == Cascade.LARGE
+        assert gate_frame(skipped, 10.0, cascade=cascade, store=store) is None, "Passed the diff, skipped by the cascade"
+        assert gate_frame(below, 10.0, cascade=cascade, store=store) is None
+        assert [kind for _, kind, _ in store.entries()] == [KEYFRAME, THUMBNAIL, THUMBNAIL]
+        assert skipped.frame.path is not None
+        store.close()
+    print("TEST PASSED: Frames the cascade skips keep only a thumbnail.")
+
+if __name__ == "__main__":
+    test_blob_counter_finds_foreground()
+    test_motion_tier_skips_frames_without_foreground()
+    test_escalation_tiers_pick_the_model()
+    test_person_detector_and_cameras()
+    test_skipped_frames_are_archived_as_thumbnails()
@@ -0,0 +1,71 @@
+import numpy as np
+from change_detection import create_detector, build_mask, phash, hamming, DETECTORS
+from image_utils import Frame, calculate_frame_difference
+
+def make_scene(brightness=100, person=False, size=(240, 320)):
+    rng = np.random.default_rng(0)
+    image = np.full(size + (3,), brightness, dtype=np.uint8)
+    # Some static texture so structure-based detectors have something to compare
+    image[::16, :, :] = np.clip(brightness + 60, 0, 255)
+    image[:, ::16, :] = np.clip(brightness - 60, 0, 255)
+    image = np.clip(image.astype(np.int16) + rng.integers(-3, 4, image.shape), 0, 255).astype(np.uint8)
+    if person:
+        # A dark figure in the bottom-right corner
+        image[170:235, 280:315] = 20
+    return image
+
+def test_mean_detector_matches_frame_difference():
+    a, b = make_scene(), make_scene(person=True)
+    detector = create_detector("mean")
+    assert detector.update(Frame(a)) == float("inf")
+    score = detector.update(Frame(b))
+    expected = calculate_frame_difference(Frame(a), Frame(b))
+    assert abs(score - expected) < 1e-6, (score, expected)
+
+def test_detectors_ignore_lighting_but_catch_corner_person():
+    for name in ("background", "tile", "ssim"):
+        detector = create_detector(name)
+        detector.update(make_scene(100))
+        lighting = detector.update(make_scene(130))
+
+        detector = create_detector(name)
+        detector.update(make_scene(100))
+        person = detector.update(make_scene(100, person=True))
+        assert person > lighting * 2, f"{name}: person {person:.2f} vs lighting {lighting:.2f}"
+        print(f"{name}: lighting={lighting:.2f} person={person:.2f}")
+
+    # The global mean metric is the opposite: lighting dominates
+    mean = create_detector("mean")
+    mean.update(make_scene(100))
+    assert mean.update(make_scene(130)) > 20
+    print("TEST PASSED: Local detectors favour a corner person over a lighting change.")
+
+def test_ignore_mask_hides_changes():
+    # Ignore the bottom-right quarter where the person appears
+    for name in DETECTORS:
+        detector = create_detector(name, ignore="0.75,0.5,0.25,0.5")
+        detector.update(make_scene())
+        masked = detector.update(make_scene(person=True))
+
+        detector = create_detector(name)
+        detector.update(make_scene())
+        unmasked = detector.update(make_scene(person=True))
+        assert masked < unmasked, f"{name}: masked {masked} should be below unmasked {unmasked}"
+    print("TEST PASSED: Ignore masks suppress changes in ignored regions.")
+
+def test_build_mask_and_phash():
+    mask = build_mask((10, 10), roi="0,0,0.5,1", ignore="0,0,0.5,0.5")
+    assert mask[0:5, 0:5].max() == 0
+    assert mask[5:, 0:5].min() == 255
+    assert mask[:, 5:].max() == 0
+    assert build_mask((10, 10)) is None
+
+    gray = make_scene()[:, :, 0]
+    assert hamming(phash(gray), phash(gray.copy())) == 0
+    assert hamming(phash(gray), phash(make_scene(person=True)[:, :, 0])) > 0
+
+if __name__ == "__main__":
+    test_mean_detector_matches_frame_difference()
+    test_detectors_ignore_lighting_but_catch_corner_person()
+    test_ignore_mask_hides_changes()
+    test_build_mask_and_phash()
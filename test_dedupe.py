@@ -0,0 +1,89 @@
+from dedupe import DescriptionDeduper, MinHasher, description_features, normalize_words
+
+EMPTY_OFFICE = """**1. Environment**
+- Indoor office, bright artificial lighting.
+
+**2. Objects**
+- Desk, office chair, laptop, bookshelf
+
+**3. People**
+No people visible"""
+
+REWORDED = """**1. Environment**
+- An indoor office with bright artificial lighting.
+
+**2. Objects**
+- Laptop, desk, office chairs, a bookshelf
+
+**3. People**
+- No people are visible."""
+
+WITH_PERSON = """**1. Environment**
+- Indoor office, bright artificial lighting.
+
+**2. Objects**
+- Desk, office chair, laptop, bookshelf
+
+**3. People**
+- **Traits**: Male, 30-40, black hair
+- **Appearance**: Blue shirt
+- **Action/State**: Sitting at the desk"""
+
+PARKING_LOT = """**1. Environment**
+- Outdoor parking lot at night, lit by street lamps.
+
+**2. Objects**
+- Car, bicycle, trash can
+
+**3. People**
+No people visible"""
+
+def test_features_ignore_wording():
+    assert normalize_words("The **Chairs** are visible!") == ["chair"]
+    people, shingles = description_features(REWORDED)
+    assert people == 0 and "object:office chair" in shingles and "indoor office" in shingles
+    assert description_features(WITH_PERSON)[0] == 1
+    print("TEST PASSED: Descriptions are reduced to normalized fields.")
+
+def test_minhash_estimates_jaccard():
+    hasher = MinHasher(num_perm=128)
+    a = {f"w{i}" for i in range(100)}
+    b = {f"w{i}" for i in range(50, 150)}
+    estimate = hasher.similarity(hasher.signature(a), hasher.signature(b))
+    assert abs(estimate - 50 / 150) < 0.12, estimate
+    assert hasher.similarity(hasher.signature(a), hasher.signature(set(a))) == 1.0
+    print(f"TEST PASSED: MinHash similarity {estimate:.2f} for Jaccard 0.33.")
+
+def test_deduper_suppresses_repeats():
+    deduper = DescriptionDeduper(threshold=0.7, heartbeat=600)
+    post, dup = deduper.POST, deduper.DUPLICATE
+    assert deduper.check(EMPTY_OFFICE, camera_id=0, timestamp=0)[0] == post
+    assert deduper.check(REWORDED, camera_id=0, timestamp=10)[0] == dup
+    assert deduper.check(WITH_PERSON, camera_id=0, timestamp=20)[0] == post, "A person appearing is always posted"
+    assert deduper.check(PARKING_LOT, camera_id=0, timestamp=30)[0] == post
+    assert deduper.check(EMPTY_OFFICE, camera_id=0, timestamp=40)[0] == dup, "Still in the recent history"
+    assert deduper.check(EMPTY_OFFICE, camera_id=1, timestamp=40)[0] == post, "Cameras are compared separately"
+    assert deduper.check("Error: model crashed", camera_id=0)[0] == post
+    assert deduper.check("Error: model crashed", camera_id=0)[0] == post
+
+    stats = deduper.stats()
+    assert stats["suppressed"] == 2 and stats["posted"] == 4 and stats["checked"] == 6
+    print(f"TEST PASSED: Repeated descriptions are suppressed ({stats}).")
+
+def test_deduper_heartbeat_and_history():
+    deduper = DescriptionDeduper(threshold=0.7, heartbeat=60, history=1)
+    assert deduper.check(EMPTY_OFFICE, timestamp=0)[0] == deduper.POST
+    assert deduper.check(REWORDED, timestamp=30)[0] == deduper.DUPLICATE
+    assert deduper.check(REWORDED, timestamp=61)[0] == deduper.HEARTBEAT, "A long unchanged scene still reports"
+    assert deduper.check(EMPTY_OFFICE, timestamp=90)[0] == deduper.DUPLICATE, "The heartbeat restarts the period"
+
+    assert deduper.check(PARKING_LOT, timestamp=100)[0] == deduper.POST
+    assert deduper.check(EMPTY_OFFICE, timestamp=110)[0] == deduper.POST, "Only history posts are remembered"
+    assert deduper.stats()["heartbeats"] == 1
+    print("TEST PASSED: Heartbeats are posted and the history is bounded.")
+
+if __name__ == "__main__":
+    test_features_ignore_wording()
+    test_minhash_estimates_jaccard()
+    test_deduper_suppresses_repeats()
+    test_deduper_heartbeat_and_history()
@@ -0,0 +1,134 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from analyzer import ImageAnalyzer
+from delta_prompt import IncrementalAnalyzer, SYSTEM_PROMPT, merge_delta, split_sections
+from fake_servers import FakeOllamaServer
+from image_utils import Frame
+from ollama_backend import OllamaBackend
+
+FULL = """**1. Environment**
+- Indoor office, bright artificial lighting.
+
+**2. Objects**
+- Desk, office chair, laptop
+
+**3. People**
+No people visible"""
+
+PERSON_DELTA = """**3. People**
+- **Traits**: Male, 30-40, black hair
+- **Appearance**: Blue shirt
+- **Action/State**: Sitting at the desk"""
+
+def test_merge_delta():
+    merged = merge_delta(FULL, PERSON_DELTA)
+    sections = split_sections(merged)
+    assert sections["environment"] == ["- Indoor office, bright artificial lighting."]
+    assert sections["objects"] == ["- Desk, office chair, laptop"]
+    assert sections["people"][1] == "- **Appearance**: Blue shirt"
+    assert merged.startswith("**1. Environment**") and "No people visible" not in merged
+
+    assert merge_delta(FULL, "NO CHANGE") is FULL
+    assert merge_delta(FULL, "No change.") is FULL
+    assert merge_delta(FULL, "The man sat down.") is None
+    print("TEST PASSED: Delta replies are merged into the full description.")
+
+def test_incremental_analyzer_sends_only_deltas():
+    replies = iter([FULL, PERSON_DELTA, "NO CHANGE", "He sat down.", FULL, FULL])
+
+    def reply(body):
+        return next(replies)
+
+    frame = Frame(np.zeros((64, 64, 3), dtype=np.uint8))
+    with FakeOllamaServer(reply=reply) as server:
+        backend = OllamaBackend("fake-model", host=server.url, deadline=5)
+        describer = IncrementalAnalyzer(ImageAnalyzer(model_id="fake-model", backend=backend), refresh=4)
+
+        assert describer.analyze(frame) == FULL
+        with_person = describer.analyze(frame)
+        assert "Blue shirt" in with_person and "laptop" in with_person
+        assert describer.analyze(frame) == with_person, "NO CHANGE keeps the previous record"
+        # An unmergeable reply falls back to a full description
+        assert describer.analyze(frame) == FULL
+        # Another camera starts from a full description of its own
+        assert describer.analyze(frame, camera_id=1) == FULL
+
+        requests = server.chat_requests()
+        assert len(requests) == 6
+        for body in requests:
+            assert body["messages"][0] == {"role": "system", "content": SYSTEM_PROMPT}, \
+                "Every request starts with the same system prefix"
+        assert "Previous description" not in requests[0]["messages"][1]["content"]
+        assert FULL in requests[1]["messages"][1]["content"]
+        assert with_person in requests[3]["messages"][1]["content"]
+        assert "Previous description" not in requests[5]["messages"][1]["content"]
+        backend.close()
+
+    stats = describer.stats()
+    assert stats["full"]["calls"] == 3 and stats["delta"]["calls"] == 3
+    assert stats["unchanged"] == 1 and stats["fallbacks"] == 1
+    print("TEST PASSED: Only changes are requested between full descriptions.")
+
+def test_incremental_analyzer_refreshes():
+    with FakeOllamaServer(reply=lambda body: "NO CHANGE" if "Previous" in body["messages"][-1]["content"]
+                          else FULL) as server:
+        backend = OllamaBackend("fake-model", host=server.url, deadline=5)
+        describer = IncrementalAnalyzer(ImageAnalyzer(model_id="fake-model", backend=backend), refresh=3)
+        frame = Frame(np.zeros((64, 64, 3), dtype=np.uint8))
+        for _ in range(7):
+            assert describer.analyze(frame) == FULL
+        backend.close()
+    assert describer.stats()["full"]["calls"] == 3, "Full description on calls 1, 4 and 7"
+    print("TEST PASSED: A full description is requested every refresh calls.")
+
+def test_concurrent_calls_are_counted_once():
+    with FakeOllamaServer(reply=lambda body: "NO CHANGE" if "Previous" in body["messages"][-1]["content"]
+                          else FULL, first_token_delay=0.05) as server:
+        backend = OllamaBackend("fake-model", host=server.url, deadline=5, max_in_flight=8)
+        describer = IncrementalAnalyzer(ImageAnalyzer(model_id="fake-model", backend=backend), refresh=10)
+        frame = Frame(np.zeros((64, 64, 3), dtype=np.uint8))
+
+        def camera(camera_id):
+            for _ in range(3):
+                describer.analyze(frame, camera_id=camera_id)
+
+        # Requests of different cameras overlap, as with --analyze-workers > 1
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(camera, range(8)))
+        backend.close()
+
+    stats = describer.stats()
+    assert stats["full"]["calls"] == 8 and stats["delta"]["calls"] == 16, stats
+    assert stats["full"]["avg_tokens"] == len(FULL.split(" ")) and stats["delta"]["avg_tokens"] == 2, stats
+    print("TEST PASSED: Concurrent requests are each counted once, under their own mode.")
+
+def test_last_result_is_per_thread():
+    with FakeOllamaServer(reply=lambda body: body["messages"][-1]["content"]) as server:
+        backend = OllamaBackend("fake-model", host=server.url, deadline=5, max_in_flight=2)
+        analyzer = ImageAnalyzer(model_id="fake-model", backend=backend)
+        frame = Frame(np.zeros((64, 64, 3), dtype=np.uint8))
+        both_done = threading.Barrier(2)
+        seen = {}
+
+        def call(prompt):
+            analyzer.analyze(frame, prompt=prompt)
+            both_done.wait()
+            seen[prompt] = analyzer.last_result.content
+
+        threads = [threading.Thread(target=call, args=(prompt,)) for prompt in ("first", "second")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        backend.close()
+    assert seen == {"first": "first", "second": "second"}, seen
+    assert analyzer.last_result is None, "This thread made no request"
+    print("TEST PASSED: Each thread sees the result of its own request.")
+
+if __name__ == "__main__":
+    test_merge_delta()
+    test_incremental_analyzer_sends_only_deltas()
+    test_incremental_analyzer_refreshes()
+    test_concurrent_calls_are_counted_once()
+    test_last_result_is_per_thread()
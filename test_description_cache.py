@@ -0,0 +1,73 @@
+import os
+import tempfile
+import time
+import numpy as np
+import analyzer
+from description_cache import DescriptionCache
+from fake_servers import FakeOllamaServer
+from image_utils import Frame
+from ollama_backend import OllamaBackend
+
+PROMPT = "Describe this image."
+
+def test_cache_matches_within_radius():
+    cache = DescriptionCache(radius=4)
+    empty_room = 0b1010_1100_1111_0000
+    cache.store(empty_room, "llava-phi3:3.8b", PROMPT, "Empty room", latency=3.0)
+
+    # Two bits of sensor noise still match
+    description, distance = cache.lookup(empty_room ^ 0b11, "llava-phi3:3.8b", PROMPT)
+    assert description == "Empty room" and distance == 2
+
+    # Too far, other model, or other prompt all miss
+    assert cache.lookup(empty_room ^ 0b11111, "llava-phi3:3.8b", PROMPT) == (None, None)
+    assert cache.lookup(empty_room, "gemma3:4b", PROMPT) == (None, None)
+    assert cache.lookup(empty_room, "llava-phi3:3.8b", "Other prompt") == (None, None)
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 3
+    assert stats["saved_seconds"] == 3.0
+    print(f"TEST PASSED: Cache matches nearby hashes only. {stats}")
+
+def test_cache_lru_and_ttl_eviction():
+    cache = DescriptionCache(max_entries=2, radius=0)
+    cache.store(1, "m", PROMPT, "one")
+    cache.store(2, "m", PROMPT, "two")
+    cache.lookup(1, "m", PROMPT)  # 1 becomes most recently used
+    cache.store(4, "m", PROMPT, "four")
+    assert cache.lookup(2, "m", PROMPT) == (None, None), "LRU entry should be evicted"
+    assert cache.lookup(1, "m", PROMPT)[0] == "one"
+
+    cache = DescriptionCache(radius=0, ttl=0.05)
+    cache.store(1, "m", PROMPT, "one")
+    time.sleep(0.1)
+    assert cache.lookup(1, "m", PROMPT) == (None, None), "Expired entry should not match"
+    print("TEST PASSED: Cache evicts least recently used and expired entries.")
+
+def test_cache_survives_restart():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "cache.json")
+        cache = DescriptionCache(path=path)
+        cache.store(123, "m", PROMPT, "Door closed", latency=2.5)
+
+        reloaded = DescriptionCache(path=path)
+        assert len(reloaded) == 1
+        assert reloaded.lookup(123, "m", PROMPT)[0] == "Door closed"
+    print("TEST PASSED: Cache is reloaded from disk.")
+
+def test_analyzer_skips_vlm_on_cache_hit():
+    with FakeOllamaServer(reply="Empty room") as server:
+        image_analyzer = analyzer.ImageAnalyzer(cache=DescriptionCache(),
+                                                backend=OllamaBackend("m", host=server.url))
+        scene = np.zeros((120, 160, 3), dtype=np.uint8)
+        scene[20:60, 30:90] = 200
+
+        assert image_analyzer.analyze(Frame(scene)) == "Empty room"
+        assert image_analyzer.analyze(Frame(scene.copy())) == "Empty room"
+        assert len(server.chat_requests()) == 1, "Second analysis of the same scene should hit the cache"
+
+if __name__ == "__main__":
+    test_cache_matches_within_radius()
+    test_cache_lru_and_ttl_eviction()
+    test_cache_survives_restart()
+    test_analyzer_skips_vlm_on_cache_hit()
@@ -2,7 +2,8 @@ import os
 import cv2
 import numpy as np
 import time
-from image_utils import calculate_image_difference
+import tempfile
+from image_utils import calculate_image_difference, calculate_frame_difference, Frame
 
 def create_test_images():
     # Base image: Solid gray
@@ -42,5 +43,29 @@ def run_test():
         if os.path.exists(f):
             os.remove(f)
 
+def test_frame_difference_matches_file_difference():
+    base = np.full((100, 100, 3), 128, dtype=np.uint8)
+    noise = np.random.randint(0, 256, (100, 100, 3), dtype=np.uint8)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        frame1 = Frame(base)
+        frame2 = Frame(noise)
+        path1 = frame1.save(os.path.join(temp_dir, "base.jpg"))
+        path2 = frame2.save(os.path.join(temp_dir, "noise.jpg"))
+
+        # Frames reloaded from disk reuse the file bytes instead of re-encoding
+        loaded = Frame.from_file(path1)
+        assert loaded.jpeg() == frame1.jpeg()
+
+        file_score = calculate_image_difference(path1, path2)
+        memory_score = calculate_frame_difference(Frame.from_file(path1), Frame.from_file(path2))
+        assert abs(file_score - memory_score) < 1e-9
+
+    # Thumbnails are cached per size
+    assert frame1.thumbnail() is frame1.thumbnail()
+    assert calculate_frame_difference(frame1, Frame(base.copy())) == 0
+    print("TEST PASSED: In-memory frame difference matches file-based difference.")
+
 if __name__ == "__main__":
     run_test()
+    test_frame_difference_matches_file_difference()
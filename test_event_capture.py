@@ -0,0 +1,101 @@
+import time
+import cv2
+import numpy as np
+from event_capture import MotionWatcher, exposure, frame_quality, pick_best_frame
+from test_camera import FakeSession
+
+def make_scene(person_x=None, blur=0, gain=1.0, seed=0):
+    rng = np.random.default_rng(seed)
+    image = np.full((360, 640, 3), 110, dtype=np.uint8)
+    # Textured background so sharpness has edges to measure
+    image[::8, :] = 60
+    image[:, ::8] = 60
+    image[200:300, 400:600] = rng.integers(0, 255, (100, 200, 3), dtype=np.uint8)
+    if person_x is not None:
+        image[80:320, person_x:person_x + 60] = 30
+        image[80:140, person_x + 15:person_x + 45] = 200
+    if blur:
+        image = cv2.blur(image, (blur, blur))
+    return np.clip(image.astype(np.float32) * gain, 0, 255).astype(np.uint8)
+
+def test_quality_prefers_sharp_well_exposed_frames():
+    sharp = make_scene(person_x=100)
+    blurred = make_scene(person_x=100, blur=9)
+    dark = make_scene(person_x=100, gain=0.2)
+    blown = make_scene(person_x=100, gain=3.0)
+    assert frame_quality(sharp) > frame_quality(blurred) * 2
+    assert frame_quality(sharp) > frame_quality(dark)
+    assert frame_quality(sharp) > frame_quality(blown)
+    assert exposure(np.zeros((10, 10), np.uint8)) == 0.0
+    burst = [(blurred, 1.0), (dark, 1.1), (sharp, 1.2), (blown, 1.3)]
+    assert pick_best_frame(burst)[0] == 2
+    print("TEST PASSED: Burst frames are ranked by sharpness and exposure.")
+
+def test_watcher_triggers_burst_and_picks_best_frame():
+    watcher = MotionWatcher(session=None, on_event=None, threshold=1.0, trigger_frames=2,
+                            burst_frames=4, burst_seconds=1.0, cooldown=5.0)
+    t = 1000.0
+    events = []
+    # A static scene never triggers
+    for i in range(30):
+        events.append(watcher.process(make_scene(), t + i / 30))
+    assert not any(events)
+
+    # A person walks in: two frames of motion, then a burst with one sharp frame
+    t += 1
+    frames = [make_scene(person_x=50, blur=7), make_scene(person_x=80, blur=7),
+              make_scene(person_x=110, blur=7), make_scene(person_x=140),
+              make_scene(person_x=170, blur=7), make_scene(person_x=200, blur=7)]
+    results = [watcher.process(image, t + i / 30) for i, image in enumerate(frames)]
+    fired = [r for r in results if r is not None]
+    assert len(fired) == 1, results
+    frame, score = fired[0]
+    assert score >= 1.0
+    assert frame.timestamp == t + 3 / 30, "The sharp frame should be picked"
+    assert frame.shape == (360, 640, 3)
+
+    # Continued motion within the cooldown does not fire again
+    for i in range(60):
+        assert watcher.process(make_scene(person_x=(230 + 7 * i) % 560), t + 0.5 + i / 30) is None
+    # After the cooldown, motion fires a new event
+    later = [watcher.process(make_scene(person_x=(20 * i) % 560, seed=i), t + 10 + i / 30) for i in range(8)]
+    assert sum(r is not None for r in later) == 1
+    assert watcher.events == 2
+    print("TEST PASSED: Motion triggers one burst per cooldown and the sharpest frame wins.")
+
+class SceneCapture:
+    """
+    Stands in for cv2.VideoCapture at ~100 fps: a static scene, then a moving person.
+    """
+    def __init__(self, motion_after):
+        self.reads = 0
+        self.motion_after = motion_after
+
+    def read(self):
+        self.reads += 1
+        time.sleep(0.01)
+        if self.reads <= self.motion_after:
+            return True, make_scene()
+        return True, make_scene(person_x=(10 * self.reads) % 560)
+
+    def release(self):
+        pass
+
+def test_watcher_follows_session_frames():
+    events = []
+    capture = SceneCapture(motion_after=20)
+    with FakeSession([capture], warmup_frames=0) as session:
+        watcher = MotionWatcher(session, lambda frame, score: events.append((frame, score)),
+                                burst_frames=3, cooldown=60).start()
+        deadline = time.monotonic() + 5
+        while not events and time.monotonic() < deadline:
+            time.sleep(0.02)
+        watcher.stop()
+    assert len(events) == 1, "Expected one motion event"
+    assert watcher.frames_watched > 20, "The watcher should see frames at camera rate"
+    print("TEST PASSED: The watcher reads every new frame from the camera session.")
+
+if __name__ == "__main__":
+    test_quality_prefers_sharp_well_exposed_frames()
+    test_watcher_triggers_burst_and_picks_best_frame()
+    test_watcher_follows_session_frames()
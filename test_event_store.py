@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import tempfile
+import time
+from event_store import EventStore, parse_description
+from fake_servers import FakeIngestServer
+from poster import Poster
+
+PERSON = """**1. Environment**
+- Indoor office, bright artificial lighting.
+
+**2. Objects**
+- Desk, office chair, laptop
+- Potted plant
+
+**3. People**
+- **Traits**: Male, 30-40, black hair
+- **Appearance**: Blue shirt, glasses
+- **Action/State**: Sitting at the desk, typing, neutral expression
+- **Traits**: Female, 20-30, blonde hair
+- **Appearance**: Red jacket
+- **Action/State**: Walking toward the door"""
+
+EMPTY = """**1. Environment**
+- Indoor office, dim lighting.
+
+**2. Objects**
+- Desk, office chair
+
+**3. People**
+No people visible"""
+
+def test_parse_description():
+    parsed = parse_description(PERSON)
+    assert parsed["environment"] == "Indoor office, bright artificial lighting."
+    assert parsed["objects"] == ["Desk", "office chair", "laptop", "Potted plant"]
+    assert len(parsed["people"]) == 2
+    assert parsed["people"][0]["appearance"] == "Blue shirt, glasses"
+    assert parsed["people"][1]["action"] == "Walking toward the door"
+
+    assert parse_description(EMPTY)["people"] == []
+    unstructured = parse_description("A dark hallway.")
+    assert unstructured["environment"] == "A dark hallway." and unstructured["people"] == []
+    print("TEST PASSED: Descriptions are parsed into environment, objects and people.")
+
+def test_store_queries_and_batched_writes():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = EventStore(os.path.join(temp_dir, "events.db"), batch_size=100, flush_interval=60)
+        start = 1700000000
+        for i in range(300):
+            store.add(PERSON if i % 50 == 0 else EMPTY, timestamp=start + i * 3, camera_id=i % 2)
+        store.flush()
+        assert store.written == 300
+        assert store.commits <= 3, f"Expected batched commits, got {store.commits}"
+
+        last = store.last_seen_person()
+        assert last["ts"] == start + 250 * 3 and last["people_count"] == 2
+        assert last["people"][1]["traits"] == "Female, 20-30, blonde hair"
+
+        window = store.query(start=start + 300, end=start + 600, limit=1000)
+        assert len(window) == 100 and all(start + 300 <= e["ts"] < start + 600 for e in window)
+        assert [e["ts"] for e in store.query(camera_id=1, limit=2)] == [start + 299 * 3, start + 297 * 3]
+        assert len(store.query(obj="laptop", limit=1000)) == 6
+        assert len(store.query(attribute="red jacket", limit=1000)) == 6
+        assert store.last_seen_person(camera_id=1) is None
+
+        # Time and person lookups go through the indexes, not a full scan
+        plan = " ".join(row[3] for row in store._db.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM events WHERE people_count > 0 ORDER BY ts DESC LIMIT 1"))
+        assert "idx_events_person_ts" in plan, plan
+        store.close()
+    print("TEST PASSED: Event store answers time, camera, object and person queries.")
+
+def test_store_rotation_and_vacuum():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "events.db")
+        store = EventStore(path, max_age=3600, max_rows=500)
+        now = time.time()
+        for i in range(2000):
+            store.add(PERSON, timestamp=now - 7200 + i * 3)
+        store.flush()
+        deleted = store.rotate(now=now)
+        assert store.count() == 500, store.count()
+        assert deleted == 1500
+        orphans = store._db.execute("SELECT COUNT(*) FROM people WHERE event_id NOT IN (SELECT id FROM events)")
+        assert orphans.fetchone()[0] == 0, "People rows must go with their events"
+        freelist = store._db.execute("PRAGMA freelist_count").fetchone()[0]
+        assert freelist == 0, "Freed pages should be returned by the vacuum"
+        store.close()
+        assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM events").fetchone()[0] == 500
+    print("TEST PASSED: Old events are rotated out and space is reclaimed.")
+
+def test_poster_records_delivery_in_store():
+    with tempfile.TemporaryDirectory() as temp_dir, FakeIngestServer() as server:
+        store = EventStore(os.path.join(temp_dir, "events.db"))
+        log_path = os.path.join(temp_dir, "log.jsonl")
+        poster = Poster(api_uri=server.url, spool_path=os.path.join(temp_dir, "spool.jsonl"),
+                        log_path=log_path, batch_wait=0, store=store).start()
+        poster.submit(PERSON, "/captures/capture_1.jpg", camera_id=0)
+        assert poster.flush(timeout=5)
+        poster.stop()
+        store.flush()
+
+        events = store.query()
+        assert len(events) == 1
+        assert events[0]["status"] == "sent" and events[0]["image_path"] == "/captures/capture_1.jpg"
+        assert not os.path.exists(log_path), "The event store replaces the JSONL log"
+        store.close()
+    print("TEST PASSED: Poster stores events and their delivery status.")
+
+if __name__ == "__main__":
+    test_parse_description()
+    test_store_queries_and_batched_writes()
+    test_store_rotation_and_vacuum()
+    test_poster_records_delivery_in_store()
@@ -0,0 +1,78 @@
+import numpy as np
+from camera import capture_frame, resize_for_vlm
+from change_detection import MeanDiffDetector
+from image_utils import FramePool, calculate_frame_difference, Frame
+from test_camera import FakeCapture, FakeSession
+
+def test_pool_reuses_released_buffers():
+    pool = FramePool(size=2)
+    first = pool.acquire((48, 64, 3))
+    address = first.ctypes.data
+    del first
+    again = pool.acquire((48, 64, 3))
+    assert again.ctypes.data == address, "A released buffer is reused"
+    assert pool.acquire((24, 32, 3)).shape == (24, 32, 3), "Each shape has its own buffers"
+    stats = pool.stats()
+    assert stats["reused"] == 1 and stats["allocated"] == 2 and stats["pooled"] == 2
+    print("TEST PASSED: Released buffers are handed out again.")
+
+def test_pool_never_reuses_held_buffers():
+    pool = FramePool(size=2)
+    held = pool.acquire((8, 8))
+    frame = Frame(pool.acquire((8, 8)))
+    view = pool.acquire((8, 8))[2:4]
+    assert not any(np.shares_memory(buffer, other) for buffer, other in
+                   [(held, frame.image), (held, view), (frame.image, view)])
+    extra = pool.acquire((8, 8))
+    for other in (held, frame.image, view):
+        assert not np.shares_memory(extra, other), "Buffers still referenced are not reused"
+    assert pool.stats()["pooled"] == 2, "Buffers beyond size are not kept"
+    print("TEST PASSED: Buffers referenced by frames or views are never reused.")
+
+def test_resize_writes_into_pool():
+    pool = FramePool()
+    image = np.full((720, 1280, 3), 100, dtype=np.uint8)
+    small = resize_for_vlm(image, 640, pool=pool)
+    address = small.ctypes.data
+    assert small.shape == (360, 640, 3) and small.mean() == 100
+    del small
+    assert resize_for_vlm(image, 640, pool=pool).ctypes.data == address
+    print("TEST PASSED: Downscaling reuses pooled buffers.")
+
+def test_session_reads_into_pool():
+    pool = FramePool()
+    with FakeSession([FakeCapture()], warmup_frames=0, pool=pool) as session:
+        frames = []
+        seq = 0
+        while len(frames) < 20:
+            image, _, seq = session.read_next(seq, timeout=2)
+            frames.append(image.copy())
+    assert all(len(np.unique(f)) == 1 for f in frames), "No frame was overwritten while being read"
+    stats = pool.stats()
+    assert stats["reused"] > 10 and stats["allocated"] <= 4, stats
+    print(f"TEST PASSED: The grab thread reads into pooled buffers ({stats}).")
+
+def test_capture_frame_uses_session_pool():
+    pool = FramePool()
+    with FakeSession([FakeCapture()], warmup_frames=0, pool=pool) as session:
+        frame = capture_frame(session=session, max_dim=32)
+    assert frame.shape == (24, 32, 3)
+    assert any(frame.image is buffer for buffer in pool._buffers[(24, 32, 3)])
+    print("TEST PASSED: capture_frame downscales into the session's pool.")
+
+def test_mean_detector_double_buffering():
+    detector = MeanDiffDetector()
+    frames = [Frame(np.full((48, 64, 3), value, dtype=np.uint8)) for value in (10, 30, 30, 0)]
+    scores = [detector.update(frame) for frame in frames]
+    assert scores[0] == float("inf")
+    for previous, frame, score in zip(frames, frames[1:], scores[1:]):
+        assert score == calculate_frame_difference(previous, frame)
+    print("TEST PASSED: Swapping thumbnail buffers gives the same scores.")
+
+if __name__ == "__main__":
+    test_pool_reuses_released_buffers()
+    test_pool_never_reuses_held_buffers()
+    test_resize_writes_into_pool()
+    test_session_reads_into_pool()
+    test_capture_frame_uses_session_pool()
+    test_mean_detector_double_buffering()
@@ -0,0 +1,80 @@
+import json
+import time
+import requests
+from metrics import Registry, MetricsServer, StartupTimer
+
+def test_disabled_registry_records_nothing():
+    registry = Registry()
+    latency = registry.histogram("vlm_seconds", "VLM latency")
+    skipped = registry.counter("frames_skipped_total", "Skipped frames")
+    latency.observe(1.5)
+    skipped.inc()
+    with latency.time():
+        pass
+    assert latency.count == 0 and skipped.value == 0
+
+    # The disabled hot path should be a single attribute check
+    start = time.perf_counter()
+    for _ in range(100000):
+        latency.observe(0.1)
+    per_call = (time.perf_counter() - start) / 100000
+    assert per_call < 5e-6, per_call
+    print(f"TEST PASSED: Disabled metrics cost {per_call * 1e9:.0f}ns per call.")
+
+def test_histogram_quantiles_and_export():
+    registry = Registry()
+    registry.enable()
+    latency = registry.histogram("diff_seconds", "Diff time", buckets=(0.01, 0.1, 1.0))
+    for value in [0.005] * 50 + [0.05] * 45 + [0.5] * 5:
+        latency.observe(value)
+    registry.counter("cache_hits_total", "Cache hits").inc(3)
+    registry.add_collector(lambda: {"queue_depth_diff": 2})
+
+    assert latency.count == 100
+    assert latency.quantile(0.5) <= 0.01
+    assert 0.01 < latency.quantile(0.95) <= 0.1
+    assert latency.quantile(1.0) == 0.5
+
+    text = registry.render_prometheus()
+    assert '# TYPE semcam_diff_seconds histogram' in text
+    assert 'semcam_diff_seconds_bucket{le="0.1"} 95' in text
+    assert 'semcam_diff_seconds_bucket{le="+Inf"} 100' in text
+    assert 'semcam_cache_hits_total 3' in text
+    assert 'semcam_queue_depth_diff 2' in text
+
+    data = registry.to_dict()
+    assert data["diff_seconds"]["count"] == 100
+    assert data["cache_hits_total"] == 3
+    assert "diff p50=" in registry.summary_line()
+    print("TEST PASSED: Histograms export Prometheus text, JSON and a summary line.")
+
+def test_metrics_endpoint():
+    registry = Registry()
+    registry.enable()
+    registry.histogram("post_seconds", "Post latency").observe(0.2)
+    server = MetricsServer(registry, port=0).start()
+    try:
+        text = requests.get(f"{server.url}/metrics", timeout=5).text
+        assert "semcam_post_seconds_count 1" in text
+        stats = json.loads(requests.get(f"{server.url}/stats", timeout=5).text)
+        assert stats["post_seconds"]["count"] == 1
+        assert requests.get(f"{server.url}/other", timeout=5).status_code == 404
+    finally:
+        server.stop()
+    print("TEST PASSED: /metrics and /stats are served locally.")
+
+def test_startup_timer():
+    timer = StartupTimer(start=100.0)
+    assert timer.mark("imports", at=100.2)
+    assert timer.mark("model_loaded", at=103.0)
+    assert timer.mark("cam0_open", at=100.9)
+    assert not timer.mark("imports", at=105.0), "A milestone is only recorded once"
+    assert timer.summary_line() == "imports 0.20s | cam0_open 0.90s | model_loaded 3.00s"
+    assert timer.gauges()["startup_model_loaded_seconds"] == 3.0
+    print("TEST PASSED: Startup milestones are reported as a timeline.")
+
+if __name__ == "__main__":
+    test_disabled_registry_records_nothing()
+    test_histogram_quantiles_and_export()
+    test_metrics_endpoint()
+    test_startup_timer()
@@ -0,0 +1,78 @@
+import base64
+import time
+import threading
+import numpy as np
+from analyzer import ImageAnalyzer
+from fake_servers import FakeOllamaServer
+from image_utils import Frame
+from ollama_backend import OllamaBackend
+
+def test_warm_up_and_streaming():
+    with FakeOllamaServer(reply="An empty room with a desk.", first_token_delay=0.05, token_delay=0.01) as server:
+        backend = OllamaBackend("llava-phi3:3.8b", host=server.url, keep_alive="1h")
+        assert backend.warm_up() is not None
+        assert server.loaded == {"llava-phi3:3.8b": "1h"}
+
+        partials = []
+        result = backend.chat("Describe", images=[b"jpeg-bytes"], on_token=partials.append)
+        assert result.content == "An empty room with a desk."
+        assert not result.timed_out and result.error is None
+        assert result.ttft >= 0.05 and result.latency >= result.ttft
+        assert result.eval_count == 6
+        assert partials[0] == "An" and partials[-1] == result.content
+
+        body = server.chat_requests()[0]
+        assert body["keep_alive"] == "1h"
+        assert body["options"]["num_ctx"] == 1024
+        assert base64.b64decode(body["messages"][0]["images"][0]) == b"jpeg-bytes"
+    print(f"TEST PASSED: Warm-up and streaming work. {result}")
+
+def test_deadline_returns_partial_output_and_cancels():
+    reply = " ".join(f"word{i}" for i in range(100))
+    with FakeOllamaServer(reply=reply, token_delay=0.02) as server:
+        backend = OllamaBackend("m", host=server.url, deadline=5)
+        start = time.monotonic()
+        result = backend.chat("Describe", deadline=0.3)
+        elapsed = time.monotonic() - start
+        assert result.timed_out
+        assert elapsed < 0.5, f"Deadline not enforced: {elapsed:.2f}s"
+        assert result.content.startswith("word0"), "Partial output should be kept"
+
+        # The stream is closed, so the server stops generating
+        deadline = time.monotonic() + 3
+        while server.cancelled == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert server.cancelled == 1 and server.completed == 0
+    print("TEST PASSED: Deadline returns partial output and cancels the request.")
+
+def test_concurrent_requests_are_limited():
+    with FakeOllamaServer(reply="ok", first_token_delay=0.2) as server:
+        backend = OllamaBackend("m", host=server.url, max_in_flight=2)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(backend.chat("x"))) for _ in range(4)]
+        start = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - start
+        assert all(r.content == "ok" for r in results)
+        # Two at a time: about two rounds of 0.2s
+        assert 0.35 < elapsed < 1.0, f"Unexpected elapsed time {elapsed:.2f}s"
+    print("TEST PASSED: In-flight requests are limited.")
+
+def test_analyzer_uses_backend():
+    with FakeOllamaServer(reply="**3. People**\nNo people visible") as server:
+        analyzer = ImageAnalyzer(backend=OllamaBackend("m", host=server.url))
+        frame = Frame(np.zeros((32, 32, 3), dtype=np.uint8))
+        assert analyzer.analyze(frame) == "**3. People**\nNo people visible"
+        assert analyzer.last_result.latency is not None
+
+    # Server gone: the analyzer reports an error instead of raising
+    assert analyzer.analyze(frame).startswith("Error during analysis")
+
+if __name__ == "__main__":
+    test_warm_up_and_streaming()
+    test_deadline_returns_partial_output_and_cancels()
+    test_concurrent_requests_are_limited()
+    test_analyzer_uses_backend()
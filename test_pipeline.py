@@ -0,0 +1,74 @@
+import time
+from pipeline import Pipeline, SheddingQueue, FrameJob
+
+def make_job(score=None):
+    job = FrameJob(frame=None)
+    job.score = score
+    return job
+
+def test_drop_oldest():
+    q = SheddingQueue(maxsize=2, policy="drop-oldest")
+    jobs = [make_job(i) for i in range(4)]
+    for job in jobs:
+        assert q.put(job)
+    assert q.dropped == 2
+    assert q.get(timeout=0) is jobs[2]
+    assert q.get(timeout=0) is jobs[3]
+    assert q.get(timeout=0) is None
+    print("TEST PASSED: drop-oldest keeps the newest jobs.")
+
+def test_keep_highest_score():
+    q = SheddingQueue(maxsize=2, policy="keep-highest-score")
+    q.put(make_job(5))
+    q.put(make_job(20))
+    assert not q.put(make_job(3)), "Low-score job should be shed"
+    assert q.put(make_job(50)), "High-score job should replace the lowest"
+    scores = sorted([q.get(timeout=0).score, q.get(timeout=0).score])
+    assert scores == [20, 50], f"Unexpected scores kept: {scores}"
+    assert q.dropped == 2
+    print("TEST PASSED: keep-highest-score keeps the biggest changes.")
+
+def test_deadline_expires_stale_jobs():
+    q = SheddingQueue(maxsize=4, policy="deadline", deadline=0.05)
+    stale = make_job(1)
+    stale.created -= 1
+    fresh = make_job(2)
+    q.put(stale)
+    q.put(fresh)
+    assert q.get(timeout=0) is fresh
+    assert q.expired == 1
+    print("TEST PASSED: deadline policy discards stale jobs.")
+
+def test_slow_stage_does_not_stall_producer():
+    pipeline = Pipeline()
+    inbox = pipeline.queue(maxsize=1, policy="drop-oldest", name="analyze")
+    outbox = pipeline.queue(maxsize=100, policy="block", name="post")
+    results = []
+
+    def slow_analyze(job):
+        time.sleep(0.1)
+        return job
+
+    pipeline.add_stage("analyze", slow_analyze, inbox, outbox)
+    pipeline.add_stage("post", results.append, outbox)
+    pipeline.start()
+
+    start = time.monotonic()
+    for i in range(20):
+        inbox.put(make_job(i))
+        time.sleep(0.005)
+    produce_time = time.monotonic() - start
+    time.sleep(0.3)
+    pipeline.stop()
+
+    assert produce_time < 0.5, f"Producer was stalled: {produce_time:.2f}s"
+    assert inbox.dropped > 0, "Expected load shedding while the analyzer is busy"
+    assert results, "Expected some jobs to reach the post stage"
+    assert results[-1].score == 19, "The newest job should be analyzed last"
+    print(f"TEST PASSED: Producer ran at full rate, {inbox.dropped} jobs shed. Stats: {pipeline.stats()}")
+
+if __name__ == "__main__":
+    test_drop_oldest()
+    test_keep_highest_score()
+    test_deadline_expires_stale_jobs()
+    test_slow_stage_does_not_stall_producer()
@@ -0,0 +1,107 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+from fake_servers import FakeIngestServer
+from poster import Poster, PostSpool
+
+def test_poster_delivers_over_one_connection():
+    with tempfile.TemporaryDirectory() as temp_dir, FakeIngestServer() as server:
+        poster = Poster(api_uri=server.url, spool_path=os.path.join(temp_dir, "spool.jsonl"),
+                        log_path=os.path.join(temp_dir, "log.jsonl"), batch_wait=0).start()
+        for i in range(5):
+            poster.submit(f"event {i}")
+        assert poster.flush(timeout=5), "Poster did not drain"
+        poster.stop()
+
+        texts = [body["inputData"]["englishText"] for body in server.received]
+        assert texts == [f"event {i}" for i in range(5)]
+        assert len(server.connections) == 1, f"Expected one keep-alive connection, got {len(server.connections)}"
+        assert os.path.getsize(os.path.join(temp_dir, "spool.jsonl")) == 0, "Spool should be empty"
+    print("TEST PASSED: Poster delivers in order over a pooled connection.")
+
+def test_poster_batches_records():
+    with tempfile.TemporaryDirectory() as temp_dir, FakeIngestServer() as server:
+        poster = Poster(api_uri=server.url, spool_path=os.path.join(temp_dir, "spool.jsonl"),
+                        log_path=os.path.join(temp_dir, "log.jsonl"), batch_size=3, batch_wait=0.5)
+        for i in range(6):
+            poster.submit(f"event {i}")
+        poster.start()
+        assert poster.flush(timeout=5)
+        poster.stop()
+
+        assert len(server.received) == 2, f"Expected 2 batched requests, got {len(server.received)}"
+        assert [r["englishText"] for r in server.received[0]["inputData"]] == ["event 0", "event 1", "event 2"]
+    print("TEST PASSED: Poster batches several records per request.")
+
+def test_poster_retries_after_failure():
+    with tempfile.TemporaryDirectory() as temp_dir, FakeIngestServer() as server:
+        server.fail_next = 2
+        poster = Poster(api_uri=server.url, spool_path=os.path.join(temp_dir, "spool.jsonl"),
+                        log_path=os.path.join(temp_dir, "log.jsonl"), batch_wait=0,
+                        retry_delay=0.01, max_retry_delay=0.05).start()
+        poster.submit("survives outage")
+        assert poster.flush(timeout=5)
+        poster.stop()
+
+        assert poster.failures == 2
+        assert server.received[0]["inputData"]["englishText"] == "survives outage"
+    print("TEST PASSED: Poster retries with backoff until the API recovers.")
+
+def test_spool_replays_unsent_posts_after_restart():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        spool_path = os.path.join(temp_dir, "spool.jsonl")
+        log_path = os.path.join(temp_dir, "log.jsonl")
+
+        # API is unreachable: grab a free port and leave nothing listening on it
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        dead_url = f"http://127.0.0.1:{sock.getsockname()[1]}/"
+        sock.close()
+
+        poster = Poster(api_uri=dead_url, spool_path=spool_path, log_path=log_path,
+                        batch_wait=0, timeout=0.5, retry_delay=0.01, max_retry_delay=0.02).start()
+        poster.submit("first")
+        poster.submit("second")
+        poster.stop(timeout=0.2)
+        assert poster.pending() == 2
+
+        # Simulate a torn write at the end of the spool
+        with open(spool_path, "a") as f:
+            f.write('{"op": "add", "id": ')
+        assert [r["content"] for r in PostSpool(spool_path).load()] == ["first", "second"]
+
+        with FakeIngestServer() as server:
+            poster = Poster(api_uri=server.url, spool_path=spool_path, log_path=log_path,
+                            batch_wait=0).start()
+            assert poster.flush(timeout=5)
+            poster.stop()
+            texts = [body["inputData"]["englishText"] for body in server.received]
+            assert texts == ["first", "second"], texts
+    print("TEST PASSED: Unsent posts are replayed from the spool after a restart.")
+
+def test_dotenv_is_loaded_on_first_use():
+    with tempfile.TemporaryDirectory() as temp_dir, FakeIngestServer() as server:
+        with open(os.path.join(temp_dir, ".env"), "w") as f:
+            f.write(f"API_URI={server.url}\n")
+        script = ("import sys, main, poster\n"
+                  "assert 'dotenv' not in sys.modules, 'dotenv imported at startup'\n"
+                  "p = poster.Poster(spool_path='spool.jsonl', batch_wait=0).start()\n"
+                  "p.submit('hello', None)\n"
+                  "assert p.flush(timeout=5)\n"
+                  "p.stop()\n")
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        env.pop("API_URI", None)
+        result = subprocess.run([sys.executable, "-c", script], cwd=temp_dir, env=env,
+                                capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+        assert [body["inputData"]["englishText"] for body in server.received] == ["hello"]
+    print("TEST PASSED: .env is read when the poster starts, not at import.")
+
+if __name__ == "__main__":
+    test_poster_delivers_over_one_connection()
+    test_poster_batches_records()
+    test_poster_retries_after_failure()
+    test_spool_replays_unsent_posts_after_restart()
+    test_dotenv_is_loaded_on_first_use()
@@ -0,0 +1,52 @@
+import numpy as np
+import cv2
+from image_utils import Frame
+from preprocess import Preprocessor, MODEL_PROFILES, profile_for_model
+
+def decode(data):
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+def test_profile_selection():
+    assert profile_for_model("llava-phi3:3.8b").name == "llava-phi3"
+    assert profile_for_model("llava:13b").name == "llava"
+    assert profile_for_model("qwen2.5vl:3b").name == "qwen2.5vl"
+    assert profile_for_model("gemma3:4b").name == "gemma3"
+    assert profile_for_model("some-new-model").name == "default"
+
+def test_letterbox_to_native_size():
+    frame = Frame(np.full((576, 1024, 3), 200, dtype=np.uint8))
+    preprocessor = Preprocessor(MODEL_PROFILES["llava-phi3"])
+    data = preprocessor.process(frame)
+    image = decode(data)
+    assert image.shape == (336, 336, 3)
+    # Top and bottom are padding, the middle is the picture
+    assert image[0, 168].max() < 10 and image[168, 168].min() > 190
+    assert len(data) < len(frame.jpeg())
+    print(f"TEST PASSED: llava-phi3 letterbox sends {len(data)} bytes instead of {len(frame.jpeg())}.")
+
+def test_resize_rounds_to_patch_multiple_and_crops():
+    frame = Frame(np.zeros((768, 1024, 3), dtype=np.uint8))
+    preprocessor = Preprocessor(MODEL_PROFILES["qwen2.5vl"])
+    image = decode(preprocessor.process(frame))
+    assert image.shape[1] == 448 and image.shape[0] % 28 == 0
+
+    # Crop the left half before resizing
+    preprocessor = Preprocessor(MODEL_PROFILES["default"], crop="0,0,0.5,1")
+    assert preprocessor.prepare(frame.image).shape == (768, 512, 3)
+
+def test_stats_and_formats():
+    frame = Frame(np.random.randint(0, 256, (480, 640, 3), dtype=np.uint8))
+    jpeg = Preprocessor(MODEL_PROFILES["moondream"], quality=50)
+    png = Preprocessor(MODEL_PROFILES["moondream"], fmt="png")
+    assert len(jpeg.process(frame)) < len(png.process(frame))
+    jpeg.record_latency(2.0)
+    jpeg.record_latency(4.0)
+    stats = jpeg.stats()
+    assert stats["images"] == 1 and stats["avg_vlm_seconds"] == 3.0
+    print(f"TEST PASSED: Preprocessor stats: {stats}")
+
+if __name__ == "__main__":
+    test_profile_selection()
+    test_letterbox_to_native_size()
+    test_resize_rounds_to_patch_multiple_and_crops()
+    test_stats_and_formats()
@@ -0,0 +1,116 @@
+import base64
+import numpy as np
+import cv2
+from analyzer import ImageAnalyzer
+from fake_servers import FakeOllamaServer
+from image_utils import Frame
+from ollama_backend import OllamaBackend
+from regions import RegionAnalyzer, RegionExtractor, merge_boxes
+
+FULL = """**1. Environment**
+- Indoor office, bright artificial lighting.
+
+**2. Objects**
+- Desk, office chair, laptop
+
+**3. People**
+No people visible"""
+
+PERSON = """**3. People**
+- **Traits**: Male, 30-40, black hair
+- **Appearance**: Blue shirt"""
+
+def make_room(seed=0):
+    rng = np.random.default_rng(seed)
+    room = np.full((720, 1280, 3), 120, dtype=np.uint8)
+    cv2.rectangle(room, (100, 400), (500, 700), (60, 80, 120), -1)
+    noise = rng.integers(-3, 4, room.shape)
+    return np.clip(room.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+def with_person(image, x, y):
+    image = image.copy()
+    cv2.rectangle(image, (x, y), (x + 80, y + 220), (30, 40, 160), -1)
+    return image
+
+def test_merge_boxes():
+    assert merge_boxes([(0, 0, 10, 10), (5, 5, 10, 10), (50, 50, 5, 5)]) == [(0, 0, 15, 15), (50, 50, 5, 5)]
+    assert merge_boxes([(0, 0, 10, 10), (12, 0, 10, 10)], gap=3) == [(0, 0, 22, 10)]
+    assert merge_boxes([(0, 0, 10, 10), (100, 0, 10, 10), (30, 0, 10, 10)], max_boxes=2) == [(0, 0, 40, 10), (100, 0, 10, 10)]
+    print("TEST PASSED: Boxes are merged when close or over the limit.")
+
+def test_extractor_finds_changed_regions():
+    room = make_room()
+    extractor = RegionExtractor(max_regions=2)
+    assert extractor.find(room) is None, "No reference yet"
+    extractor.set_reference(room)
+
+    # Noise and a global lighting change are not regions
+    assert extractor.find(make_room(seed=1)) == []
+    assert extractor.find(cv2.add(make_room(seed=2), 20)) == []
+
+    boxes = extractor.find(with_person(make_room(seed=3), 1000, 100))
+    assert len(boxes) == 1
+    x, y, w, h = boxes[0]
+    assert x <= 1000 and y <= 100 and x + w >= 1080 and y + h >= 320, "The crop covers the person"
+    assert w * h < 0.1 * 1280 * 720, "The crop is a small part of the frame"
+
+    two = with_person(with_person(make_room(seed=4), 1000, 100), 150, 50)
+    assert len(extractor.find(two)) == 2
+    single = RegionExtractor(max_regions=1, max_coverage=0.9)
+    single.set_reference(room)
+    assert len(single.find(two)) == 1
+
+    # A change across most of the frame is better described in full
+    covered = cv2.rectangle(room.copy(), (0, 0), (800, 500), (20, 20, 20), -1)
+    assert extractor.find(covered) is None
+    print("TEST PASSED: Changed regions are found and mapped to full resolution.")
+
+def test_region_analyzer_sends_crops_with_context():
+    replies = iter([FULL, PERSON, "no reply format", FULL])
+    with FakeOllamaServer(reply=lambda body: next(replies)) as server:
+        backend = OllamaBackend("fake-model", host=server.url, deadline=5)
+        describer = RegionAnalyzer(ImageAnalyzer(model_id="fake-model", backend=backend))
+        room = make_room()
+
+        assert describer.analyze(Frame(room)) == FULL
+        described = describer.analyze(Frame(with_person(make_room(seed=1), 1000, 100)))
+        assert "Blue shirt" in described and "laptop" in described
+        # An unmergeable reply falls back to a full description of the frame
+        assert describer.analyze(Frame(with_person(make_room(seed=2), 900, 100))) == FULL
+
+        requests = server.chat_requests()
+        assert len(requests) == 4
+        crop_request = requests[1]["messages"][-1]
+        assert FULL in crop_request["content"], "The last full description is the context"
+        crop = cv2.imdecode(np.frombuffer(base64.b64decode(crop_request["images"][0]), np.uint8), cv2.IMREAD_COLOR)
+        full = cv2.imdecode(np.frombuffer(base64.b64decode(requests[0]["messages"][-1]["images"][0]), np.uint8),
+                            cv2.IMREAD_COLOR)
+        assert crop.size < full.size, "Only the crop is sent"
+        backend.close()
+
+    stats = describer.stats()
+    assert stats["full"]["calls"] == 2 and stats["regions"]["calls"] == 2
+    assert stats["crops"] == 1 and stats["fallbacks"] == 1 and stats["avg_crop_fraction"] < 0.1
+    print("TEST PASSED: Crops of changed regions are sent with the scene context.")
+
+def test_region_analyzer_skips_frames_without_regions():
+    with FakeOllamaServer(reply=FULL) as server:
+        backend = OllamaBackend("fake-model", host=server.url, deadline=5)
+        describer = RegionAnalyzer(ImageAnalyzer(model_id="fake-model", backend=backend), refresh=3)
+        assert describer.analyze(Frame(make_room())) == FULL
+        # Sensor noise only: the reference frame still describes the scene
+        assert describer.analyze(Frame(make_room(seed=1))) == FULL
+        assert describer.analyze(Frame(make_room(seed=2))) == FULL
+        assert len(server.chat_requests()) == 1, "No request when no region changed"
+        assert describer.analyze(Frame(make_room(seed=3))) == FULL
+        assert len(server.chat_requests()) == 2, "Still a full description every refresh analyses"
+        backend.close()
+    stats = describer.stats()
+    assert stats["unchanged"] == 2 and stats["full"]["calls"] == 2 and stats["regions"]["calls"] == 0
+    print("TEST PASSED: Frames without changed regions reuse the last description.")
+
+if __name__ == "__main__":
+    test_merge_boxes()
+    test_extractor_finds_changed_regions()
+    test_region_analyzer_sends_crops_with_context()
+    test_region_analyzer_skips_frames_without_regions()
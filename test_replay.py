@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+import cv2
+import numpy as np
+from analyzer import ImageAnalyzer
+from fake_servers import FakeOllamaServer
+from ollama_backend import OllamaBackend
+from replay import list_captures, list_video_frames, run_replay, JsonlSink, ReplayCheckpoint
+
+def make_analyzer(server):
+    return ImageAnalyzer(model_id="m", backend=OllamaBackend("m", host=server.url))
+
+def write_captures(directory, levels, start=1700000000, interval=3):
+    for i, level in enumerate(levels):
+        image = np.full((120, 160, 3), level, dtype=np.uint8)
+        cv2.imwrite(os.path.join(directory, f"capture_{start + i * interval}.jpg"), image)
+
+def read_records(path):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f]
+
+def test_replay_captures_in_order_and_in_chunks():
+    with tempfile.TemporaryDirectory() as temp_dir, FakeOllamaServer(reply="A room.") as server:
+        write_captures(temp_dir, [50] * 4 + [150] * 4 + [50] * 4)
+        items = list_captures(temp_dir)
+        assert [item[0] for item in items] == sorted(item[0] for item in items)
+
+        results = {}
+        for chunk_size, workers in [(100, 1), (2, 3)]:
+            output = os.path.join(temp_dir, f"out_{chunk_size}.jsonl")
+            sink = JsonlSink(output)
+            stats = run_replay(items, "captures", temp_dir, make_analyzer(server), sink,
+                               workers=workers, analyze_workers=2, chunk_size=chunk_size)
+            sink.close()
+            records = read_records(output)
+            results[chunk_size] = [r["image_path"] for r in records]
+            assert stats["frames"] == 12 and stats["analyzed"] == 3, stats
+            assert all(r["content"] == "A room." for r in records)
+
+        # Chunk boundaries must not change which frames pass
+        assert results[100] == results[2]
+        assert [os.path.basename(p) for p in results[2]] == [
+            "capture_1700000000.jpg", "capture_1700000012.jpg", "capture_1700000024.jpg"]
+    print("TEST PASSED: Captures are replayed in order, identically across chunk sizes.")
+
+def test_replay_resumes_from_checkpoint():
+    with tempfile.TemporaryDirectory() as temp_dir, FakeOllamaServer(reply="A room.") as server:
+        captures = os.path.join(temp_dir, "captures")
+        os.makedirs(captures)
+        write_captures(captures, [50] * 4 + [150] * 4 + [50] * 4)
+        items = list_captures(captures)
+        output = os.path.join(temp_dir, "out.jsonl")
+        checkpoint = ReplayCheckpoint(output + ".checkpoint", {"source": captures})
+
+        class InterruptingSink(JsonlSink):
+            def __call__(self, record):
+                if len(read_records(self.path)) == 1:
+                    raise KeyboardInterrupt
+                super().__call__(record)
+
+        sink = InterruptingSink(output)
+        try:
+            run_replay(items, "captures", captures, make_analyzer(server), sink,
+                       workers=2, chunk_size=3, checkpoint=checkpoint)
+            assert False, "Replay should have been interrupted"
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sink.close()
+        assert len(read_records(output)) == 1
+        before = len(server.chat_requests())
+
+        sink = JsonlSink(output)
+        stats = run_replay(items, "captures", captures, make_analyzer(server), sink,
+                           workers=2, chunk_size=3, checkpoint=checkpoint)
+        sink.close()
+        paths = [r["image_path"] for r in read_records(output)]
+        assert len(paths) == 3 and len(set(paths)) == 3, paths
+        assert stats["skipped_resume"] > 0
+        # Only frames without a written result are analyzed again
+        assert len(server.chat_requests()) - before == 2
+    print("TEST PASSED: An interrupted replay continues where it stopped.")
+
+def test_replay_retries_failed_frames_on_resume():
+    with tempfile.TemporaryDirectory() as temp_dir, FakeOllamaServer(reply="A room.") as server:
+        captures = os.path.join(temp_dir, "captures")
+        os.makedirs(captures)
+        write_captures(captures, [50] * 4 + [150] * 4 + [50] * 4)
+        items = list_captures(captures)
+        output = os.path.join(temp_dir, "out.jsonl")
+        checkpoint = ReplayCheckpoint(output + ".checkpoint", {"source": captures})
+
+        server.fail_next = 1
+        sink = JsonlSink(output)
+        stats = run_replay(items, "captures", captures, make_analyzer(server), sink,
+                           workers=2, chunk_size=3, checkpoint=checkpoint)
+        sink.close()
+        records = read_records(output)
+        assert stats["failed"] == 1 and stats["analyzed"] == 2, stats
+        assert not any(r["content"].startswith("Error") for r in records), "Failures are not written"
+        assert [os.path.basename(r["image_path"]) for r in records] == [
+            "capture_1700000012.jpg", "capture_1700000024.jpg"]
+
+        sink = JsonlSink(output)
+        stats = run_replay(items, "captures", captures, make_analyzer(server), sink,
+                           workers=2, chunk_size=3, checkpoint=checkpoint)
+        sink.close()
+        records = read_records(output)
+        assert stats["analyzed"] == 1 and stats["failed"] == 0 and stats["passed"] == 0, stats
+        assert os.path.basename(records[-1]["image_path"]) == "capture_1700000000.jpg"
+        assert records[-1]["content"] == "A room."
+        assert checkpoint.load()[1] == [], "Nothing is left to retry"
+    print("TEST PASSED: Failed analyses are not written and are retried on resume.")
+
+def test_replay_video():
+    with tempfile.TemporaryDirectory() as temp_dir, FakeOllamaServer(reply="A hallway.") as server:
+        path = os.path.join(temp_dir, "clip.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (160, 120))
+        for i in range(40):
+            writer.write(np.full((120, 160, 3), 40 if i < 20 else 200, dtype=np.uint8))
+        writer.release()
+
+        items = list_video_frames(path, every=0.5, start_time=1700000000)
+        assert [item[2] for item in items] == list(range(0, 40, 5))
+        output = os.path.join(temp_dir, "out.jsonl")
+        sink = JsonlSink(output)
+        stats = run_replay(items, "video", path, make_analyzer(server), sink, workers=2, chunk_size=3)
+        sink.close()
+        records = read_records(output)
+        assert [r["image_path"].split("#frame=")[1] for r in records] == ["0", "20"], records
+        assert records[1]["timestamp"] == datetime.fromtimestamp(1700000000 + 2.0).isoformat()
+        assert stats["frames"] == 8
+    print("TEST PASSED: Video files are sampled and replayed.")
+
+if __name__ == "__main__":
+    test_replay_captures_in_order_and_in_chunks()
+    test_replay_resumes_from_checkpoint()
+    test_replay_retries_failed_frames_on_resume()
+    test_replay_video()
@@ -0,0 +1,84 @@
+import os
+import time
+import tempfile
+from retention import RetentionManager, capture_filename, parse_capture_timestamp
+
+def write_capture(directory, timestamp, size=10):
+    path = os.path.join(directory, f"capture_{timestamp}.jpg")
+    with open(path, 'wb') as f:
+        f.write(b"x" * size)
+    return path
+
+def test_parse_capture_timestamp():
+    assert parse_capture_timestamp("capture_1700000000.jpg") == 1700000000
+    assert parse_capture_timestamp(capture_filename(1700000000.5, 7)) == 1700000000.5
+    assert capture_filename(1700000000.5, 7) != capture_filename(1700000000.5, 8), "Same-time captures get their own files"
+    assert parse_capture_timestamp("capture_1700000000.inf_1.jpg") is None
+    assert parse_capture_timestamp("other_image.jpg") is None
+    assert parse_capture_timestamp("capture_abc.jpg") is None
+
+def test_retention_expires_only_old_files():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        now = int(time.time())
+        retention_period = 48 * 3600
+        old = write_capture(temp_dir, now - 49 * 3600)
+        new = write_capture(temp_dir, now - 3600)
+        other = os.path.join(temp_dir, "other_image.jpg")
+        with open(other, 'w') as f:
+            f.write("dummy data")
+
+        manager = RetentionManager(temp_dir, retention_period)
+        assert manager.scan() == 2
+
+        # A capture written after startup is tracked without rescanning
+        latest = write_capture(temp_dir, now)
+        manager.add(latest)
+
+        files, reclaimed = manager.expire(now=now)
+        assert (files, reclaimed) == (1, 10)
+        assert not os.path.exists(old)
+        assert os.path.exists(new) and os.path.exists(latest) and os.path.exists(other)
+        assert len(manager) == 2
+
+        # Nothing else is due yet
+        assert manager.expire(now=now) == (0, 0)
+        assert manager.expire(now=now + retention_period) == (1, 10)
+        assert manager.reclaimed_files == 2 and manager.reclaimed_bytes == 20
+    print("TEST PASSED: Retention index expires old captures only.")
+
+def test_same_second_captures_are_kept_apart():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manager = RetentionManager(temp_dir, 3600)
+        now = time.time()
+        # A motion burst and a periodic capture taken at the same time
+        for seq, size in enumerate((100, 150)):
+            path = os.path.join(temp_dir, capture_filename(now, seq))
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+            manager.add(path, now, size)
+        assert len(os.listdir(temp_dir)) == 2 and len(manager) == 2
+        assert manager.total_bytes == 250
+        assert RetentionManager(temp_dir, 3600).scan() == 2
+    print("TEST PASSED: Captures taken at the same time get their own files.")
+
+def test_retention_enforces_disk_budget():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        now = int(time.time())
+        manager = RetentionManager(temp_dir, 48 * 3600, max_bytes=250)
+        paths = [write_capture(temp_dir, now - 100 + i, size=100) for i in range(4)]
+        # Added out of order on purpose
+        for path in reversed(paths):
+            manager.add(path)
+
+        files, reclaimed = manager.expire(now=now)
+        assert files == 2 and reclaimed == 200
+        assert manager.total_bytes == 200
+        assert not os.path.exists(paths[0]) and not os.path.exists(paths[1])
+        assert os.path.exists(paths[2]) and os.path.exists(paths[3])
+    print("TEST PASSED: Retention deletes oldest captures to meet the disk budget.")
+
+if __name__ == "__main__":
+    test_parse_capture_timestamp()
+    test_same_second_captures_are_kept_apart()
+    test_retention_expires_only_old_files()
+    test_retention_enforces_disk_budget()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import numpy as np
+from image_utils import Frame
+from replay import list_captures
+from storage import SegmentStore, INDEX_RECORD, KEYFRAME, THUMBNAIL, read_frame, read_ref
+
+def make_frame(level, timestamp):
+    image = np.full((720, 1280, 3), level, dtype=np.uint8)
+    image[100:200, 100:300] = 255 - level
+    return Frame(image, timestamp=timestamp)
+
+def test_keyframes_full_resolution_skipped_as_thumbnails():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = SegmentStore(temp_dir, retention_seconds=3600)
+        store.scan()
+        key_ref = store.put(make_frame(40, 1000.0), keyframe=True)
+        skip_ref = store.put(make_frame(40, 1003.0), keyframe=False)
+
+        keyframe = read_frame(key_ref)
+        thumbnail = read_frame(skip_ref)
+        assert keyframe.shape == (720, 1280, 3)
+        assert max(thumbnail.shape[:2]) == 320
+        assert len(read_ref(skip_ref)) < len(read_ref(key_ref)) / 4
+        assert [kind for _, kind, _ in store.entries()] == [KEYFRAME, THUMBNAIL]
+
+        dropping = SegmentStore(os.path.join(temp_dir, "drop"), retention_seconds=3600, skipped="drop")
+        dropping.scan()
+        assert dropping.put(make_frame(40, 1000.0), keyframe=False) is None
+        assert dropping.stats()["dropped"] == 1
+        store.close()
+        dropping.close()
+    print("TEST PASSED: Only keyframes are kept at full resolution.")
+
+def test_retention_deletes_whole_segments():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = SegmentStore(temp_dir, retention_seconds=3600, segment_seconds=600)
+        store.scan()
+        start = 1_000_000.0
+        for i in range(1200):  # one hour at 3 s cadence -> 6 segments
+            store.put(make_frame(i % 200, start + i * 3), keyframe=(i % 100 == 0))
+        assert store.stats()["segments"] == 6
+        assert len(os.listdir(store.directory)) == 12, "One data and one index file per segment"
+
+        files, reclaimed = store.expire(now=start + 3600 + 1250)
+        assert files == 4 and reclaimed > 0, (files, reclaimed)
+        remaining = [ts for ts, _, _ in store.entries()]
+        assert remaining[0] == start + 1200 and len(remaining) == 800
+
+        store.max_bytes = store.total_bytes // 2
+        store.expire(now=start)
+        assert store.total_bytes <= store.max_bytes or store.stats()["segments"] == 1
+        store.close()
+    print("TEST PASSED: Retention removes whole segments.")
+
+def test_torn_write_is_repaired_on_restart():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = SegmentStore(temp_dir, retention_seconds=3600)
+        store.scan()
+        for i in range(3):
+            store.put(make_frame(50 * i, 1000.0 + i), keyframe=True)
+        store.close()
+        segment = store._segments[0]
+        # Crash while writing: index record for bytes that never reached the data file, plus half a record
+        with open(segment.index_path, "ab") as f:
+            f.write(INDEX_RECORD.pack(1003.0, os.path.getsize(segment.data_path), 5000, KEYFRAME))
+            f.write(b"\x00" * 7)
+
+        reopened = SegmentStore(temp_dir, retention_seconds=3600)
+        assert reopened.scan() == 3
+        assert os.path.getsize(segment.index_path) == 3 * INDEX_RECORD.size
+        reopened.put(make_frame(10, 1004.0), keyframe=True)
+        refs = [ref for _, _, ref in reopened.entries()]
+        assert len(refs) == 4 and all(read_frame(ref) is not None for ref in refs)
+        reopened.close()
+    print("TEST PASSED: Torn index records are dropped on restart.")
+
+def test_replay_lists_stored_frames():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = SegmentStore(os.path.join(temp_dir, "cam1"), retention_seconds=3600)
+        store.scan()
+        for i in range(5):
+            store.put(make_frame(30 * i, 1700000000.0 + i * 3), keyframe=(i == 2))
+        items = list_captures(temp_dir)
+        assert [item[1] for item in items] == [1] * 5
+        assert [item[0] for item in items] == [1700000000.0 + i * 3 for i in range(5)]
+        assert read_frame(items[2][2]).shape == (720, 1280, 3)
+        store.close()
+    print("TEST PASSED: Replay reads frames through the storage layer.")
+
+if __name__ == "__main__":
+    test_keyframes_full_resolution_skipped_as_thumbnails()
+    test_retention_deletes_whole_segments()
+    test_torn_write_is_repaired_on_restart()
+    test_replay_lists_stored_frames()
@@ -0,0 +1,158 @@
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from analyzer import ImageAnalyzer
+from fake_servers import FakeIngestServer, FakeOllamaServer
+from image_utils import Frame
+from ollama_backend import OllamaBackend
+from poster import Poster
+from work_queue import QueueClient, QueueServer, WorkQueue, job_frame, make_job
+from worker import AnalysisWorker
+
+def make_frame(value, timestamp):
+    return Frame(np.full((48, 64, 3), value, dtype=np.uint8), timestamp=timestamp)
+
+def test_job_round_trip():
+    job = make_job(make_frame(90, 1700000000.0), camera_id=1, score=float("inf"), source="edge-1")
+    assert job["score"] is None and job["source"] == "edge-1"
+    frame = job_frame(job)
+    assert frame.shape == (48, 64, 3) and frame.timestamp == 1700000000.0
+    assert abs(int(frame.image.mean()) - 90) <= 1
+    assert job_frame({"image": "not base64!"}) is None
+    print("TEST PASSED: Jobs carry the encoded frame and its metadata.")
+
+def test_queue_leases_with_limits_and_redelivers():
+    queue = WorkQueue(lease_seconds=0.1, max_per_worker=2)
+    ids = [queue.submit({"n": i}) for i in range(3)]
+
+    first = queue.lease("a", max_jobs=5)
+    assert [job["n"] for job in first] == [0, 1], "A worker holds at most max_per_worker jobs"
+    assert queue.lease("a", max_jobs=5) == []
+    assert [job["n"] for job in queue.lease("b", max_jobs=5, limit=1)] == [2], "The worker's own limit applies"
+
+    assert queue.ack("a", [ids[0]]) == 1
+    time.sleep(0.15)
+    # Worker a died holding job 1 and b never finished job 2: both go out again, oldest first
+    again = queue.lease("c", max_jobs=5)
+    assert [job["n"] for job in again] == [1, 2]
+    assert all(job["attempt"] == 2 for job in again)
+    assert queue.ack("a", [ids[1]]) == 1, "A late ack still finishes the job"
+    assert queue.ack("c", [ids[1], ids[2]]) == 1
+
+    stats = queue.stats()
+    assert stats["acked"] == 3 and stats["redelivered"] == 2 and stats["waiting"] == stats["leased"] == 0
+    print("TEST PASSED: Leases respect worker limits and expired jobs are delivered again.")
+
+def test_queue_drops_jobs_after_max_attempts():
+    queue = WorkQueue(max_attempts=2)
+    queue.submit({"id": "poison"})
+    for _ in range(2):
+        (job,) = queue.lease("a")
+        queue.nack("a", [job["id"]])
+    assert queue.lease("a") == []
+    assert queue.stats()["dead"] == 1
+    print("TEST PASSED: A job that keeps failing is dropped after max_attempts.")
+
+def test_queue_keeps_unfinished_jobs_across_restarts():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "queue.jsonl")
+        queue = WorkQueue(path=path)
+        done, leased, waiting = (queue.submit({"n": i}) for i in range(3))
+        queue.lease("a", max_jobs=2)
+        queue.ack("a", [done])
+
+        restarted = WorkQueue(path=path)
+        assert [job["id"] for job in restarted.lease("b", max_jobs=5)] == [leased, waiting]
+        restarted.ack("b", [leased, waiting])
+        assert os.path.getsize(path) == 0, "The log is emptied once every job is finished"
+    print("TEST PASSED: Unfinished jobs survive a restart of the queue.")
+
+def test_queue_compacts_its_log_while_busy():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "queue.jsonl")
+        queue = WorkQueue(path=path, compact_every=50)
+        image = "x" * 1000
+        held = queue.submit({"image": image})
+        queue.lease("slow", max_jobs=1)
+        for _ in range(200):
+            job_id = queue.submit({"image": image})
+            (job,) = queue.lease("fast")
+            assert job["id"] == job_id
+            queue.ack("fast", [job_id])
+        # The queue never emptied: without compaction all 201 images would still be in the log
+        assert os.path.getsize(path) < 60 * 1100, os.path.getsize(path)
+        assert [job["id"] for job in WorkQueue(path=path).lease("b")] == [held]
+    print("TEST PASSED: The log of a queue that never empties is compacted.")
+
+def test_slow_log_does_not_block_leases():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        queue = WorkQueue(path=os.path.join(temp_dir, "queue.jsonl"))
+        ready = queue.submit({"n": 0})
+        writing, release = threading.Event(), threading.Event()
+        add = queue.spool.add
+
+        def slow_add(record):
+            writing.set()
+            release.wait(5)
+            add(record)
+
+        queue.spool.add = slow_add
+        submitter = threading.Thread(target=queue.submit, args=({"n": 1},))
+        submitter.start()
+        assert writing.wait(5)
+        # The submit is stuck on the disk; other requests go on
+        assert [job["id"] for job in queue.lease("a", max_jobs=5)] == [ready]
+        assert queue.stats()["submitted"] == 1
+        release.set()
+        submitter.join()
+        assert queue.stats()["submitted"] == 2
+    print("TEST PASSED: Leases and stats do not wait for spool writes.")
+
+def test_workers_share_jobs_end_to_end():
+    with tempfile.TemporaryDirectory() as temp_dir, \
+            QueueServer(WorkQueue(max_per_worker=2), port=0, host="127.0.0.1", max_wait=1.0) as server, \
+            FakeOllamaServer(first_token_delay=0.05) as vlm, \
+            FakeOllamaServer(failure_rate=1.0) as broken_vlm, \
+            FakeIngestServer() as api:
+        poster = Poster(api_uri=api.url, spool_path=os.path.join(temp_dir, "spool.jsonl"),
+                        log_path=os.path.join(temp_dir, "log.jsonl"), batch_wait=0).start()
+        workers = []
+        for name, host in (("good", vlm.url), ("broken", broken_vlm.url)):
+            analyzer = ImageAnalyzer(model_id="fake-model", backend=OllamaBackend("fake-model", host=host, deadline=5))
+            workers.append(AnalysisWorker(QueueClient(server.url), analyzer, poster.submit, worker_id=name,
+                                          concurrency=2, wait=0.2, retry_delay=0.2).start())
+
+        edge = QueueClient(server.url)
+        for i in range(6):
+            edge.submit(make_job(make_frame(i * 40, 1700000000.0 + i), camera_id=i % 2, score=12.5, source="edge"))
+
+        deadline = time.monotonic() + 10
+        while server.queue.stats()["acked"] < 6 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        for worker in workers:
+            worker.stop()
+            worker.client.close()
+        assert poster.flush(timeout=5)
+        poster.stop()
+        edge.close()
+
+        stats = server.queue.stats()
+        assert stats["acked"] == 6 and stats["dead"] == 0, stats
+        good, broken = (worker.stats() for worker in workers)
+        assert good["processed"] == 6 and broken["processed"] == 0
+        assert stats["redelivered"] == broken["failed"], "Jobs a worker failed were handed to the other one"
+        assert len(api.received) == 6
+        assert sorted(body["inputData"]["occured_at"] for body in api.received)[0].startswith("2023-11-1"), \
+            "Posts keep the capture time"
+    print(f"TEST PASSED: Workers share the queue and failed jobs are retried elsewhere ({stats}).")
+
+if __name__ == "__main__":
+    test_job_round_trip()
+    test_queue_leases_with_limits_and_redelivers()
+    test_queue_drops_jobs_after_max_attempts()
+    test_queue_keeps_unfinished_jobs_across_restarts()
+    test_queue_compacts_its_log_while_busy()
+    test_slow_log_does_not_block_leases()
+    test_workers_share_jobs_end_to_end()
@@ -0,0 +1,418 @@
+import argparse
+import base64
+import collections
+import json
+import math
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from image_utils import Frame
+from poster import PostSpool, make_session
+
+def make_job(frame, camera_id=0, score=None, source=None):
+    """
+    Packs a frame for the work queue: the cached JPEG (base64), where it
+    came from and its change score.
+    """
+    return {
+        "id": uuid.uuid4().hex,
+        "source": source,
+        "camera_id": camera_id,
+        "timestamp": frame.timestamp,
+        # The first frame of a camera scores inf, which JSON cannot carry
+        "score": None if score is None or math.isinf(score) else score,
+        "image_path": frame.path,
+        "image": base64.b64encode(frame.jpeg()).decode("ascii"),
+    }
+
+def job_frame(job):
+    """
+    Decodes the frame of a job. Returns None if the image cannot be decoded.
+    """
+    try:
+        data = base64.b64decode(job["image"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return Frame.from_bytes(data, timestamp=job.get("timestamp"), path=job.get("image_path"))
+
+class WorkQueue:
+    """
+    Jobs waiting for analysis, shared by the edge nodes that submit them and
+    the workers that lease them.
+
+    Delivery is at least once: lease() hands a job to one worker for
+    lease_seconds, and ack() removes it. A job whose lease runs out without
+    an ack (the worker crashed or hung) is handed out again, up to
+    max_attempts deliveries. A worker never holds more than its own limit,
+    capped by max_per_worker, of jobs at a time. With a path, jobs are kept
+    in a PostSpool so unacknowledged jobs survive a restart of the queue;
+    the spool is rewritten with only the unfinished jobs every compact_every
+    acks. When maxsize jobs are waiting, the oldest waiting job is dropped.
+
+    Spool writes happen outside the condition, under their own lock, so
+    leases and stats never wait for a disk sync. A job is written before it
+    can be leased, so its ack always follows it in the file.
+    """
+
+    def __init__(self, path=None, maxsize=1000, lease_seconds=300.0, max_per_worker=4, max_attempts=5,
+                 compact_every=100):
+        self.maxsize = maxsize
+        self.lease_seconds = lease_seconds
+        self.max_per_worker = max_per_worker
+        self.max_attempts = max_attempts
+        self.compact_every = compact_every
+        self.spool = PostSpool(path) if path else None
+
+        self.submitted = 0
+        self.delivered = 0
+        self.redelivered = 0
+        self.acked = 0
+        self.dropped = 0
+        self.dead = 0
+
+        self._jobs = {}
+        self._waiting = collections.deque()
+        # job id -> (worker, monotonic expiry)
+        self._leases = {}
+        self._attempts = {}
+        self._cond = threading.Condition()
+        # Jobs removed from memory whose ack is not in the spool yet
+        self._unsynced = []
+        self._acks_since_compact = 0
+        self._write_lock = threading.Lock()
+
+        if self.spool is not None:
+            replayed = self.spool.load()
+            for job in replayed:
+                self._jobs[job["id"]] = job
+                self._waiting.append(job["id"])
+            if replayed:
+                print(f"Work queue: {len(replayed)} unfinished job(s) restored from {path}")
+
+    def __len__(self):
+        with self._cond:
+            return len(self._waiting)
+
+    def submit(self, job):
+        if not job.get("id"):
+            job = dict(job, id=uuid.uuid4().hex)
+        with self._write_lock:
+            with self._cond:
+                if job["id"] in self._jobs:
+                    # A retried submit that already arrived
+                    return job["id"]
+            if self.spool is not None:
+                self.spool.add(job)
+            with self._cond:
+                while self.maxsize and len(self._waiting) >= self.maxsize:
+                    self._remove(self._waiting.popleft())
+                    self.dropped += 1
+                self._jobs[job["id"]] = job
+                self._waiting.append(job["id"])
+                self.submitted += 1
+                self._cond.notify_all()
+        self._sync()
+        return job["id"]
+
+    def _remove(self, job_id):
+        job = self._jobs.pop(job_id, None)
+        self._leases.pop(job_id, None)
+        self._attempts.pop(job_id, None)
+        if job is not None and self.spool is not None:
+            self._unsynced.append(job)
+        return job
+
+    def _sync(self):
+        """
+        Writes the acks of removed jobs to the spool, and compacts it once
+        compact_every acks have piled up (truncating it when nothing is left).
+        """
+        if self.spool is None:
+            return
+        with self._cond:
+            if not self._unsynced:
+                return
+        with self._write_lock:
+            with self._cond:
+                removed, self._unsynced = self._unsynced, []
+                if not removed:
+                    return
+                self._acks_since_compact += len(removed)
+                pending = None
+                if not self._jobs:
+                    pending = []
+                elif self._acks_since_compact >= self.compact_every:
+                    pending = list(self._jobs.values())
+            if pending is not None:
+                # Submits also hold the write lock, so no job can be missing from pending
+                if pending:
+                    self.spool.rewrite(pending)
+                else:
+                    self.spool.truncate()
+                self._acks_since_compact = 0
+            else:
+                self.spool.ack(removed)
+
+    def _expire(self, now):
+        expired = sorted((expiry, job_id) for job_id, (_, expiry) in self._leases.items() if expiry <= now)
+        # Oldest lease last, so it ends up first in line
+        for _, job_id in reversed(expired):
+            del self._leases[job_id]
+            if self._attempts.get(job_id, 0) >= self.max_attempts:
+                print(f"Work queue: job {job_id} failed {self.max_attempts} times. Dropping it.")
+                self._remove(job_id)
+                self.dead += 1
+            else:
+                self._waiting.appendleft(job_id)
+                self.redelivered += 1
+
+    def _held(self, worker):
+        return sum(1 for owner, _ in self._leases.values() if owner == worker)
+
+    def lease(self, worker, max_jobs=1, limit=None, lease_seconds=None, wait=0.0):
+        """
+        Leases up to max_jobs waiting jobs to worker, without taking it past
+        limit (or max_per_worker) jobs held. Waits up to wait seconds for a
+        job. Returns a list of jobs, each with its delivery attempt number.
+        """
+        jobs = self._lease(worker, max_jobs, limit, lease_seconds, wait)
+        # Jobs dropped after max_attempts
+        self._sync()
+        return jobs
+
+    def _lease(self, worker, max_jobs, limit, lease_seconds, wait):
+        limit = min(limit or self.max_per_worker, self.max_per_worker)
+        lease_seconds = lease_seconds or self.lease_seconds
+        deadline = time.monotonic() + wait
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                allowed = min(max_jobs, limit - self._held(worker))
+                if allowed > 0 and self._waiting:
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    return []
+                if self._leases:
+                    # Wake up when the next lease runs out
+                    next_expiry = min(expiry for _, expiry in self._leases.values())
+                    remaining = min(remaining, max(0.01, next_expiry - now))
+                self._cond.wait(remaining)
+
+            jobs = []
+            while self._waiting and len(jobs) < allowed:
+                job_id = self._waiting.popleft()
+                self._attempts[job_id] = self._attempts.get(job_id, 0) + 1
+                self._leases[job_id] = (worker, now + lease_seconds)
+                jobs.append(dict(self._jobs[job_id], attempt=self._attempts[job_id]))
+            self.delivered += len(jobs)
+            return jobs
+
+    def ack(self, worker, ids):
+        """
+        Removes finished jobs. A late ack after the lease ran out still counts,
+        since the work was done. Returns the number of jobs removed.
+        """
+        removed = 0
+        with self._cond:
+            for job_id in ids:
+                if job_id not in self._jobs:
+                    continue
+                if job_id not in self._leases:
+                    try:
+                        self._waiting.remove(job_id)
+                    except ValueError:
+                        pass
+                self._remove(job_id)
+                removed += 1
+            self.acked += removed
+            self._cond.notify_all()
+        self._sync()
+        return removed
+
+    def nack(self, worker, ids):
+        """
+        Hands jobs the worker could not finish back for another delivery.
+        """
+        with self._cond:
+            for job_id in ids:
+                lease = self._leases.get(job_id)
+                if lease is not None and lease[0] == worker:
+                    # Expire it now; the next lease() requeues it (or drops it after max_attempts)
+                    self._leases[job_id] = (worker, 0.0)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            workers = collections.Counter(owner for owner, _ in self._leases.values())
+            return {
+                "waiting": len(self._waiting),
+                "leased": len(self._leases),
+                "workers": dict(workers),
+                "submitted": self.submitted,
+                "delivered": self.delivered,
+                "redelivered": self.redelivered,
+                "acked": self.acked,
+                "dropped": self.dropped,
+                "dead": self.dead,
+            }
+
+class _QueueHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(self.server.queue.stats())
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        queue = self.server.queue
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/jobs":
+                self._send_json({"id": queue.submit(body)})
+            elif self.path == "/lease":
+                jobs = queue.lease(body["worker"], max_jobs=int(body.get("max_jobs", 1)), limit=body.get("limit"),
+                                   lease_seconds=body.get("lease_seconds"),
+                                   wait=min(float(body.get("wait", 0)), self.server.max_wait))
+                self._send_json({"jobs": jobs})
+            elif self.path == "/ack":
+                self._send_json({"acked": queue.ack(body["worker"], body["ids"])})
+            elif self.path == "/nack":
+                queue.nack(body["worker"], body["ids"])
+                self._send_json({"ok": True})
+            else:
+                self._send_json({"error": "not found"}, status=404)
+        except (KeyError, TypeError, ValueError) as e:
+            self._send_json({"error": f"bad request: {e}"}, status=400)
+
+    def log_message(self, format, *args):
+        pass
+
+class QueueServer:
+    """
+    Serves a WorkQueue over HTTP: POST /jobs, /lease, /ack and /nack with
+    JSON bodies, and GET /stats. A lease request waits at most max_wait
+    seconds for work, so idle workers long-poll instead of spinning.
+    """
+
+    def __init__(self, queue=None, port=8765, host="0.0.0.0", max_wait=30.0):
+        self.queue = queue or WorkQueue()
+        self._httpd = ThreadingHTTPServer((host, port), _QueueHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.queue = self.queue
+        self._httpd.max_wait = max_wait
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        if host == "0.0.0.0":
+            host = "127.0.0.1"
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="work-queue", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+class QueueClient:
+    """
+    Talks to a QueueServer over a keep-alive session. Failed requests raise
+    (requests exceptions, or HTTPError for error statuses).
+    """
+
+    def __init__(self, url, timeout=10, pool_size=4):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = make_session(pool_size=self.pool_size)
+            return self._session
+
+    def _post(self, path, body, timeout=None):
+        response = self.session.post(self.url + path, json=body, timeout=timeout or self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def submit(self, job):
+        return self._post("/jobs", job)["id"]
+
+    def lease(self, worker, max_jobs=1, limit=None, lease_seconds=None, wait=0.0):
+        body = {"worker": worker, "max_jobs": max_jobs, "limit": limit, "lease_seconds": lease_seconds, "wait": wait}
+        return self._post("/lease", body, timeout=wait + self.timeout)["jobs"]
+
+    def ack(self, worker, ids):
+        return self._post("/ack", {"worker": worker, "ids": list(ids)})["acked"]
+
+    def nack(self, worker, ids):
+        self._post("/nack", {"worker": worker, "ids": list(ids)})
+
+    def stats(self):
+        response = self.session.get(self.url + "/stats", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+def queue_main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py queue",
+                                     description="Run the work queue between edge capture nodes and analysis workers")
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--path", type=str, default="work_queue.jsonl",
+                        help="File keeping unfinished jobs across restarts ('' = memory only)")
+    parser.add_argument("--maxsize", type=int, default=1000, help="Max waiting jobs; the oldest is dropped beyond it")
+    parser.add_argument("--lease-seconds", type=float, default=300.0,
+                        help="How long a worker may hold a job before it is handed to another worker")
+    parser.add_argument("--max-per-worker", type=int, default=4, help="Max jobs one worker holds at a time")
+    parser.add_argument("--max-attempts", type=int, default=5, help="Deliveries of a job before it is dropped")
+    parser.add_argument("--stats-interval", type=float, default=60.0, help="Print queue stats every N seconds")
+    args = parser.parse_args(argv)
+
+    queue = WorkQueue(path=args.path or None, maxsize=args.maxsize, lease_seconds=args.lease_seconds,
+                      max_per_worker=args.max_per_worker, max_attempts=args.max_attempts)
+    server = QueueServer(queue, port=args.port, host=args.host).start()
+    print(f"Work queue listening on {server.url}")
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            print(f"Work queue: {queue.stats()}")
+    except KeyboardInterrupt:
+        print("\nStopping work queue.")
+    finally:
+        server.stop()
+        print(f"Work queue: {queue.stats()}")
@@ -0,0 +1,194 @@
+import argparse
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from work_queue import QueueClient, job_frame
+
+class AnalysisWorker:
+    """
+    Pulls jobs from the work queue, describes their frames with the VLM and
+    hands the descriptions to post (by default Poster.submit's signature:
+    text, image_path, camera_id=, timestamp=).
+
+    At most concurrency jobs are held at a time: the worker only leases as
+    many jobs as it has free slots (up to batch_size per request), and the
+    queue enforces the same limit. A job is acknowledged once its result has
+    been handed to post; VLM errors are handed back for another worker, so
+    every frame is described at least once. After a failure the worker
+    stops leasing for retry_delay seconds, doubling while failures continue,
+    so a worker with a broken VLM does not keep taking jobs from healthy ones.
+    """
+
+    def __init__(self, client, analyzer, post, worker_id=None, concurrency=1, batch_size=4,
+                 lease_seconds=None, wait=10.0, retry_delay=1.0, max_retry_delay=30.0):
+        self.client = client
+        self.analyzer = analyzer
+        self.post = post
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.lease_seconds = lease_seconds
+        self.wait = wait
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self.processed = 0
+        self.failed = 0
+        self.queue_errors = 0
+
+        self._failure_delay = retry_delay
+        self._resume_at = 0.0
+        self._slots = threading.Semaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._executor = None
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="analysis-worker")
+        self._thread = threading.Thread(target=self._run, name="work-lease", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops leasing and waits for the jobs in progress. Jobs never started
+        are not acknowledged, so the queue hands them out again.
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.wait + (self.client.timeout or 0) + 1)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _free_slots(self):
+        free = 0
+        while free < self.batch_size and self._slots.acquire(blocking=False):
+            free += 1
+        return free
+
+    def _run(self):
+        delay = self.retry_delay
+        while not self._stop_event.is_set():
+            with self._lock:
+                pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                self._stop_event.wait(pause)
+                continue
+            if not self._slots.acquire(timeout=0.5):
+                continue
+            free = 1 + self._free_slots()
+            try:
+                jobs = self.client.lease(self.worker_id, max_jobs=free, limit=self.concurrency,
+                                         lease_seconds=self.lease_seconds, wait=self.wait)
+                delay = self.retry_delay
+            except Exception as e:
+                jobs = []
+                self.queue_errors += 1
+                print(f"Work queue unavailable ({e}). Retrying in {delay:.1f}s...")
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+            for _ in range(free - len(jobs)):
+                self._slots.release()
+            for job in jobs:
+                self._executor.submit(self._process, job)
+
+    def _process(self, job):
+        try:
+            self._handle(job)
+        except Exception as e:
+            print(f"Job {job['id']} failed: {e}")
+            with self._lock:
+                self.failed += 1
+                self._resume_at = time.monotonic() + self._failure_delay
+                self._failure_delay = min(self._failure_delay * 2, self.max_retry_delay)
+            self._nack(job)
+        finally:
+            self._slots.release()
+
+    def _handle(self, job):
+        frame = job_frame(job)
+        if frame is None:
+            # Retrying cannot fix an undecodable image
+            print(f"Job {job['id']}: could not decode the image. Dropping it.")
+            self.client.ack(self.worker_id, [job["id"]])
+            with self._lock:
+                self.failed += 1
+            return
+        camera = job.get("camera_id")
+        print(f"[{job.get('source')}/cam{camera}] Analyzing job {job['id']} (attempt {job.get('attempt', 1)})...")
+        description = self.analyzer.analyze(frame)
+        if description.startswith("Error"):
+            raise RuntimeError(description)
+        timestamp = datetime.fromtimestamp(job["timestamp"]).isoformat() if job.get("timestamp") else None
+        self.post(description, job.get("image_path"), camera_id=camera, timestamp=timestamp)
+        self.client.ack(self.worker_id, [job["id"]])
+        with self._lock:
+            self.processed += 1
+            self._failure_delay = self.retry_delay
+
+    def _nack(self, job):
+        try:
+            self.client.nack(self.worker_id, [job["id"]])
+        except Exception as e:
+            # The lease runs out and the queue hands the job out again anyway
+            print(f"Could not hand job {job['id']} back: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {"worker": self.worker_id, "processed": self.processed, "failed": self.failed,
+                    "queue_errors": self.queue_errors}
+
+def worker_main(argv=None):
+    from main import add_vlm_arguments, build_analyzer
+    from event_store import EventStore
+    from poster import Poster
+
+    parser = argparse.ArgumentParser(prog="main.py worker",
+                                     description="Analyze frames submitted by edge nodes through the work queue")
+    parser.add_argument("--queue-url", type=str, required=True, help="Work queue URL, e.g. http://server:8765")
+    add_vlm_arguments(parser)
+    parser.add_argument("--worker-id", type=str, default=None, help="Name of this worker (default: host-pid)")
+    parser.add_argument("--batch-size", type=int, default=4, help="Max jobs leased per queue request")
+    parser.add_argument("--lease-seconds", type=float, default=None,
+                        help="How long this worker may hold a job (default: the queue's setting)")
+    parser.add_argument("--post-batch-size", type=int, default=1, help="Records per API request (1 = one post per event)")
+    parser.add_argument("--spool-path", type=str, default="worker_spool.jsonl", help="File holding posts not yet delivered")
+    parser.add_argument("--events-db", type=str, default="events.db", help="SQLite file storing parsed analysis results")
+    parser.add_argument("--stats-interval", type=float, default=60.0, help="Print worker stats every N seconds")
+    args = parser.parse_args(argv)
+
+    try:
+        analyzer, preprocessor = build_analyzer(args)
+    except Exception as e:
+        print(f"CRITICAL ERROR: Failed to initialize analyzer. {e}")
+        return
+    analyzer.warm_up()
+
+    events = EventStore(args.events_db)
+    poster = Poster(spool_path=args.spool_path, batch_size=args.post_batch_size, store=events).start()
+    client = QueueClient(args.queue_url, pool_size=args.analyze_workers + 1)
+    worker = AnalysisWorker(client, analyzer, poster.submit, worker_id=args.worker_id,
+                            concurrency=args.analyze_workers, batch_size=args.batch_size,
+                            lease_seconds=args.lease_seconds).start()
+    print(f"Worker {worker.worker_id} pulling from {args.queue_url} ({args.analyze_workers} at a time)")
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            print(f"Worker: {worker.stats()}")
+    except KeyboardInterrupt:
+        print("\nStopping worker.")
+    finally:
+        worker.stop()
+        client.close()
+        poster.stop()
+        events.close()
+        print(f"Worker: {worker.stats()}")
+        print(f"VLM preprocessing: {preprocessor.stats()}")